@@ -0,0 +1,166 @@
+"""
+DB round trips and latency of register/verify: SELECT-then-write vs single statements.
+
+    python -m auth_service.bench_register [--database-url URL] [--threads 8] [--users 2000] [--bcrypt-rounds 0]
+
+By default password hashing is left out (a fixed hash is stored) so only the
+database work is measured. A share of the emails is registered twice,
+concurrently, to show the check-then-insert race of the old path.
+
+The "taken" rows register every email again. The old path rejects those on
+its SELECT, before hashing; the single statement hashes first and lets the
+INSERT find the conflict. With --bcrypt-rounds N each register really
+hashes, so that row shows what a duplicate signup costs.
+"""
+import argparse
+import functools
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from . import user_writes
+from .db import Base
+from .hashing import normalize_password, pwd
+from .models import User
+
+PW_HASH = "$2b$12$" + "x" * 53
+
+
+def legacy_register(db, email: str, hash_pw) -> int | None:
+    if db.query(User).filter(User.email == email).first():
+        return None
+    user = User(email=email, password_hash=hash_pw(), is_admin=False, is_verified=False)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user.id
+
+
+def single_register(db, email: str, hash_pw) -> int | None:
+    user_id = user_writes.create_user(db, email, hash_pw())
+    db.commit()
+    return user_id
+
+
+def legacy_verify(db, user_id: int, email: str) -> bool:
+    user = db.query(User).filter(User.id == user_id, User.email == email).first()
+    if not user:
+        return False
+    user.is_verified = True
+    db.commit()
+    return True
+
+
+def single_verify(db, user_id: int, email: str) -> bool:
+    ok = user_writes.mark_verified(db, user_id, email)
+    db.commit()
+    return ok
+
+
+class RoundTrips:
+    """Statements + commits sent to the database."""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._bump)
+        event.listen(engine, "commit", self._bump)
+
+    def _bump(self, *args, **kwargs) -> None:
+        with self._lock:
+            self.count += 1
+
+
+def run(Session, trips: RoundTrips, fn, jobs, threads: int) -> dict:
+    latencies, errors = [], []
+
+    def one(args):
+        start = time.perf_counter()
+        with Session() as db:
+            try:
+                result = fn(db, *args)
+            except IntegrityError:
+                # the race: both requests passed the SELECT, one INSERT blew up (a 500)
+                db.rollback()
+                errors.append(args)
+                result = None
+        latencies.append((time.perf_counter() - start) * 1000)
+        return result
+
+    before = trips.count
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(one, jobs))
+    elapsed = time.perf_counter() - start
+    q = statistics.quantiles(latencies, n=100)
+    return {
+        "results": results,
+        "ops/s": len(jobs) / elapsed,
+        "trips/op": (trips.count - before) / len(jobs),
+        "p50": q[49],
+        "p95": q[94],
+        "errors": len(errors),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m auth_service.bench_register", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", ""), help="default: a temporary SQLite file")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="share of emails registered twice at once")
+    parser.add_argument("--bcrypt-rounds", type=int, default=0, help="hash every password at this cost (0 = store a fixed hash)")
+    args = parser.parse_args(argv)
+
+    if args.bcrypt_rounds:
+        hasher = pwd.handler().using(rounds=args.bcrypt_rounds)
+        password = normalize_password("bench-password")
+
+        def hash_pw() -> str:
+            return hasher.hash(password)
+    else:
+        def hash_pw() -> str:
+            return PW_HASH
+
+    url = args.database_url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(url, pool_size=args.threads, max_overflow=0) if not url.startswith("sqlite") else create_engine(
+        url, connect_args={"timeout": 30}
+    )
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False, future=True)
+    trips = RoundTrips(engine)
+    run_id = uuid.uuid4().hex[:8]
+
+    print(f"{'variant':<28}{'ops/s':>10}{'trips/op':>10}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    try:
+        for name, register, verify in (("select-then-write", legacy_register, legacy_verify), ("single-statement", single_register, single_verify)):
+            emails = [f"bench-{run_id}-{name}-{i}@example.com" for i in range(args.users)]
+            dupes = emails[: int(len(emails) * args.duplicates)]
+            # each duplicate right next to its original, so both land concurrently
+            jobs = [(e,) for pair in zip(dupes, dupes) for e in pair] + [(e,) for e in emails[len(dupes) :]]
+
+            register = functools.partial(register, hash_pw=hash_pw)
+            reg = run(Session, trips, register, jobs, args.threads)
+            created = [(user_id, email) for (email,), user_id in zip(jobs, reg["results"]) if user_id is not None]
+            ver = run(Session, trips, verify, created, args.threads)
+            taken = run(Session, trips, register, [(e,) for e in emails], args.threads)
+            for op, r in (("register", reg), ("verify", ver), ("taken", taken)):
+                print(f"{name + ' ' + op:<28}{r['ops/s']:>10.0f}{r['trips/op']:>10.2f}{r['p50']:>9.2f}{r['p95']:>9.2f}{r['errors']:>8}")
+    finally:
+        with Session() as db:
+            db.query(User).filter(User.email.like(f"bench-{run_id}-%")).delete(synchronize_session=False)
+            db.commit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Admin bulk user import: NDJSON or CSV in, one NDJSON report line per row out.
+
+The upload is spooled to a temp file (spills to disk past
+IMPORT_SPOOL_BYTES) and read back in batches. Each batch is validated,
+emails that already exist are dropped before any bcrypt work, the rest
+are hashed on the hashing pool and written with a single
+INSERT ... ON CONFLICT DO NOTHING RETURNING. Only one batch is held in
+memory at a time and its report lines go out as soon as it commits.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, Iterator, List
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .hashing import PasswordHasher
+from .models import User
+from .schemas import ImportRow
+from .user_writes import insert_ignore
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_SPOOL_BYTES = int(os.getenv("IMPORT_SPOOL_BYTES", str(1 << 20)))
+
+# Content-Type -> parser
+FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json-lines": "ndjson",
+    "text/csv": "csv",
+}
+
+
+async def spool_upload(chunks: AsyncIterator[bytes]) -> BinaryIO:
+    f = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+    async for chunk in chunks:
+        f.write(chunk)
+    f.seek(0)
+    return f
+
+
+def read_rows(f: BinaryIO, fmt: str) -> Iterator[tuple[int, Dict[str, Any] | None, str | None]]:
+    """(row number from 1, fields, parse error) per record."""
+    text = io.TextIOWrapper(f, encoding="utf-8", errors="replace", newline="")
+    if fmt == "csv":
+        for n, record in enumerate(csv.DictReader(text), 1):
+            # DictReader: None key = extra columns, None value = missing ones
+            yield n, {k: v for k, v in record.items() if k and v not in (None, "")}, None
+        return
+
+    n = 0
+    for line in text:
+        if not line.strip():
+            continue
+        n += 1
+        try:
+            fields = json.loads(line)
+        except ValueError:
+            yield n, None, "Invalid JSON"
+            continue
+        if not isinstance(fields, dict):
+            yield n, None, "Expected a JSON object"
+            continue
+        yield n, fields, None
+
+
+def _existing_emails(db: Session, emails: List[str]) -> set[str]:
+    if not emails:
+        return set()
+    return set(db.scalars(select(User.email).where(User.email.in_(emails))))
+
+
+def _invalid_detail(e: ValidationError) -> str:
+    err = e.errors()[0]
+    field = ".".join(str(part) for part in err["loc"])
+    return f"{field}: {err['msg']}" if field else err["msg"]
+
+
+def _insert_batch(
+    db: Session,
+    values: List[Dict[str, Any]],
+    on_created: Callable[[Session, int, str], None] | None,
+) -> Dict[str, int]:
+    created = insert_ignore(db, values)
+    if on_created is not None:
+        for v in values:
+            if v["email"] in created and not v["is_verified"]:
+                on_created(db, created[v["email"]], v["email"])
+    db.commit()
+    return created
+
+
+async def _import_batch(
+    db: Session,
+    batch: list,
+    hasher: PasswordHasher,
+    on_created: Callable[[Session, int, str], None] | None,
+    counts: Dict[str, int],
+) -> List[Dict[str, Any]]:
+    report: Dict[int, Dict[str, Any]] = {}
+    valid: Dict[str, tuple[int, ImportRow]] = {}
+
+    for n, fields, error in batch:
+        if error is None:
+            try:
+                row = ImportRow.model_validate(fields)
+            except ValidationError as e:
+                error = _invalid_detail(e)
+        if error is not None:
+            email = fields.get("email") if fields else None
+            report[n] = {"row": n, "email": email if isinstance(email, str) else None, "status": "invalid", "detail": error}
+        elif row.email in valid:
+            report[n] = {"row": n, "email": row.email, "status": "duplicate"}
+        else:
+            valid[row.email] = (n, row)
+
+    for email in await run_in_threadpool(_existing_emails, db, list(valid)):
+        n, _ = valid.pop(email)
+        report[n] = {"row": n, "email": email, "status": "exists"}
+
+    rows = list(valid.values())
+    hashes = await hasher.hash_many([row.password for _, row in rows])
+    values = [
+        {"email": row.email, "password_hash": h, "is_admin": False, "is_verified": row.is_verified}
+        for (_, row), h in zip(rows, hashes)
+    ]
+    created = await run_in_threadpool(_insert_batch, db, values, on_created)
+
+    for n, row in rows:
+        if row.email in created:
+            report[n] = {"row": n, "email": row.email, "status": "created", "id": created[row.email]}
+        else:
+            # registered by someone else since _existing_emails
+            report[n] = {"row": n, "email": row.email, "status": "exists"}
+
+    lines = [report[n] for n in sorted(report)]
+    for line in lines:
+        counts[line["status"]] += 1
+    return lines
+
+
+async def import_users(
+    db: Session,
+    f: BinaryIO,
+    fmt: str,
+    hasher: PasswordHasher,
+    on_created: Callable[[Session, int, str], None] | None = None,
+    batch_size: int | None = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yields one report line per input row, then {"summary": counts}.
+    on_created(db, user_id, email) runs for each new unverified user inside
+    its batch's transaction (e.g. to stage a verification email event).
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    counts = {"created": 0, "exists": 0, "duplicate": 0, "invalid": 0}
+    batch = []
+    for item in read_rows(f, fmt):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            for line in await _import_batch(db, batch, hasher, on_created, counts):
+                yield line
+            batch = []
+    if batch:
+        for line in await _import_batch(db, batch, hasher, on_created, counts):
+            yield line
+    yield {"summary": counts}
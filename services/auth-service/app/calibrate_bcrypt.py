@@ -0,0 +1,61 @@
+"""
+Recommend a bcrypt cost (BCRYPT_ROUNDS) for a per-hash latency budget on this host.
+
+    python -m auth_service.calibrate_bcrypt [--target-ms 250] [--min-rounds 8] [--max-rounds 16] [--samples 5]
+
+Run it on the hardware auth-service runs on. Each extra round doubles the
+cost, so measuring stops once a cost is well past the target.
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from .hashing import BCRYPT_ROUNDS, HASH_WORKERS, normalize_password, pwd
+
+
+def time_hash(rounds: int, samples: int) -> float:
+    """Median milliseconds for one hash_password() at the given cost."""
+    handler = pwd.handler().using(rounds=rounds)
+    normalized = normalize_password("calibration-password")
+    handler.hash(normalized)  # warm up the backend
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        handler.hash(normalized)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def recommend(timings: dict[int, float], target_ms: float) -> int:
+    """Highest measured cost within target_ms (the cheapest one if none fits)."""
+    within = [rounds for rounds, ms in timings.items() if ms <= target_ms]
+    return max(within) if within else min(timings)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m auth_service.calibrate_bcrypt", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--target-ms", type=float, default=250.0, help="latency budget for one hash/verify")
+    parser.add_argument("--min-rounds", type=int, default=8)
+    parser.add_argument("--max-rounds", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=5, help="hashes timed per cost")
+    args = parser.parse_args(argv)
+
+    workers = max(1, HASH_WORKERS)
+    timings: dict[int, float] = {}
+    print(f"{'rounds':<8}{'ms/hash':>10}{f'logins/s ({workers} workers)':>28}")
+    for rounds in range(max(4, args.min_rounds), args.max_rounds + 1):
+        ms = timings[rounds] = time_hash(rounds, args.samples)
+        print(f"{rounds:<8}{ms:>10.1f}{workers * 1000 / ms:>28.1f}")
+        if ms > args.target_ms * 2:
+            break
+
+    best = recommend(timings, args.target_ms)
+    print(f"\nrecommended: BCRYPT_ROUNDS={best} for <= {args.target_ms:.0f} ms (current: {BCRYPT_ROUNDS})")
+    if best != BCRYPT_ROUNDS:
+        print("existing hashes are upgraded/downgraded on each user's next login")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
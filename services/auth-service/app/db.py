@@ -1,7 +1,9 @@
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
+from shared.migrations import use_schema
+
 # Allow tests to run without DATABASE_URL by providing a safe default.
 # In production you should set DATABASE_URL explicitly.
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+pysqlite:///:memory:")
@@ -13,6 +15,9 @@ engine = create_engine(
     future=True,
 )
 
+# Postgres: each service's tables live in its own schema (DB_SCHEMA)
+use_schema(engine, DB_SCHEMA)
+
 SessionLocal = sessionmaker(
     bind=engine,
     autoflush=False,
@@ -22,33 +27,3 @@ SessionLocal = sessionmaker(
 
 class Base(DeclarativeBase):
     pass
-
-
-def _supports_schemas() -> bool:
-    # SQLite doesn't support CREATE SCHEMA or SET search_path
-    return engine.dialect.name not in ("sqlite",)
-
-
-def init_schema() -> None:
-    """
-    Initialize DB schema/search_path for DBs that support schemas (Postgres).
-    SQLite: no-op (unit tests usually run on SQLite).
-    """
-    if not _supports_schemas():
-        return
-
-    with engine.begin() as conn:
-        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {DB_SCHEMA}"))
-        conn.execute(text(f"SET search_path TO {DB_SCHEMA}"))
-
-
-def set_search_path() -> None:
-    """
-    Set search_path for Postgres connections.
-    SQLite: no-op.
-    """
-    if not _supports_schemas():
-        return
-
-    with engine.begin() as conn:
-        conn.execute(text(f"SET search_path TO {DB_SCHEMA}"))
\ No newline at end of file
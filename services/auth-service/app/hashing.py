@@ -0,0 +1,140 @@
+import asyncio
+import base64
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+# bcrypt is CPU-bound and holds the GIL -> run it in worker processes
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+# hash/verify jobs queued or running before new ones are rejected with 503
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(max(1, HASH_WORKERS) * 4)))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "1"))
+# passwords per pool job in hash_many(); small, so logins never wait long behind an import
+HASH_CHUNK_SIZE = int(os.getenv("HASH_CHUNK_SIZE", "8"))
+
+# bcrypt cost (log2 of the rounds); 12 is passlib's default. Stored hashes at
+# any other cost are rehashed on the next successful login.
+# Pick one for this hardware with `python -m auth_service.calibrate_bcrypt`.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    # min == max: needs_update() flags both cheaper and costlier hashes
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+def normalize_password(pw: str) -> str:
+    """
+    Pre-hash password using SHA-256 → base64
+    Output is always 44 ASCII chars (safe for bcrypt).
+    """
+    digest = hashlib.sha256(pw.encode("utf-8")).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii")
+
+
+# run inside the pool workers: module-level so they pickle by reference
+def _hash(normalized: str) -> str:
+    return pwd.hash(normalized)
+
+
+def _hash_chunk(normalized: list[str]) -> list[str]:
+    return [pwd.hash(n) for n in normalized]
+
+
+def _verify(normalized: str, pw_hash: str) -> bool:
+    return pwd.verify(normalized, pw_hash)
+
+
+def _verify_and_update(normalized: str, pw_hash: str) -> tuple[bool, str | None]:
+    return pwd.verify_and_update(normalized, pw_hash)
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int = HASH_RETRY_AFTER):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    async bcrypt hash/verify on a process pool (workers=0: the event loop's
+    default thread pool, for tests/dev). At most queue_limit jobs may be
+    queued or running; beyond that calls fail fast with Overloaded instead
+    of piling up latency, and the request threadpool never waits on bcrypt.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT):
+        self._workers = workers
+        self._limit = queue_limit
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._pool is None and self._workers > 0:
+                # spawn, not fork: the parent runs threads (uvicorn, relays)
+                self._pool = ProcessPoolExecutor(self._workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self.inflight >= self._limit:
+                self.rejected += 1
+                raise Overloaded()
+            self.inflight += 1
+        try:
+            if self._workers > 0:
+                self.start()
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+    async def hash(self, pw: str) -> str:
+        return await self._run(_hash, normalize_password(pw))
+
+    async def hash_many(self, pws: list[str], chunk_size: int = HASH_CHUNK_SIZE) -> list[str]:
+        """
+        Bulk hashing (imports), in order. Keeps at most one chunk per worker
+        in flight, so interactive requests still find room in the queue, and
+        waits out Overloaded instead of failing.
+        """
+        normalized = [normalize_password(pw) for pw in pws]
+        chunks = [normalized[i : i + chunk_size] for i in range(0, len(normalized), chunk_size)]
+        slots = asyncio.Semaphore(max(1, self._workers))
+
+        async def run(chunk: list[str]) -> list[str]:
+            async with slots:
+                while True:
+                    try:
+                        return await self._run(_hash_chunk, chunk)
+                    except Overloaded as e:
+                        await asyncio.sleep(e.retry_after)
+
+        results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        return [h for chunk in results for h in chunk]
+
+    async def verify(self, pw: str, pw_hash: str) -> bool:
+        return await self._run(_verify, normalize_password(pw), pw_hash)
+
+    async def verify_and_update(self, pw: str, pw_hash: str) -> tuple[bool, str | None]:
+        """(ok, new_hash); new_hash is set when pw_hash isn't at the configured cost."""
+        return await self._run(_verify_and_update, normalize_password(pw), pw_hash)
+
+
+hasher = PasswordHasher()
@@ -1,20 +1,34 @@
+import math
 import os
 import time
+import uuid
 import hashlib
-import base64
+import hmac
+import json
+import secrets
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from jose import jwt
-from passlib.context import CryptContext
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
-from .db import Base, engine, SessionLocal, init_schema, set_search_path
-from .models import User
-from .schemas import RegisterIn, LoginIn, TokenOut, MeOut
+from . import bulk_import, user_writes
+from .db import DB_SCHEMA, engine, SessionLocal
+from .migrations import MIGRATIONS
+from .models import User, OutboxEvent, RefreshToken, RevokedToken
+from .schemas import RegisterIn, LoginIn, TokenOut, MeOut, RefreshIn, RevokeIn
 from .email_tokens import make_verify_token, decode_verify_token
-from shared.events import publish
-from shared.security import require_user
+from .profile_cache import ProfileCache
+from .hashing import Overloaded, hasher, normalize_password, pwd
+from .signing_keys import load_keyring
+from .throttle import Throttled, client_ip, make_login_throttle, make_register_throttle
+from shared import fastjwt
+from shared.migrations import migrate
+from shared.outbox import OutboxRelay, add_event
+from shared.revocation import REVOCATIONS_TOKEN, TOKEN_REVOKED, revocations, start_revocation_sync, stop_revocation_sync
+from shared.security import decode_access_token, require_admin, require_user, use_local_keys
+from shared.ttl_cache import etag_matches
 
 
 # -------------------------------------------------------------------
@@ -30,13 +44,24 @@ RABBITMQ_URL = os.getenv("RABBITMQ_URL", "")
 ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
 
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Hard limit just to prevent abuse (not bcrypt-related)
 MAX_PASSWORD_BYTES = 4096
 
-# Access token lifetime (seconds)
-ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", str(60 * 60 * 24)))  # 24h
+# Access token lifetime (seconds); clients renew via /auth/refresh
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", str(15 * 60)))  # 15m
+
+# Refresh token lifetime (seconds): how long a session lasts without the password
+REFRESH_TOKEN_TTL = int(os.getenv("REFRESH_TOKEN_TTL", str(60 * 60 * 24 * 30)))  # 30d
+
+# per-IP / per-email token buckets in front of /auth/login
+login_throttle = make_login_throttle()
+register_throttle = make_register_throttle()
+
+# /auth/me profiles (invalidate on every write to a user's profile fields)
+profile_cache = ProfileCache()
+
+# EdDSA/RS256 key ring when JWT_SIGNING_ALG is set, else None -> HS256 with JWT_SECRET
+keyring = load_keyring()
 
 
 # -------------------------------------------------------------------
@@ -54,23 +79,27 @@ def _validate_password(pw: str) -> None:
         )
 
 
-def _normalize_password(pw: str) -> str:
-    """
-    Pre-hash password using SHA-256 → base64
-    Output is always 44 ASCII chars (safe for bcrypt).
-    """
-    digest = hashlib.sha256(pw.encode("utf-8")).digest()
-    return base64.urlsafe_b64encode(digest).decode("ascii")
-
-
 def hash_password(pw: str) -> str:
     _validate_password(pw)
-    return pwd.hash(_normalize_password(pw))
+    return pwd.hash(normalize_password(pw))
 
 
 def verify_password(pw: str, pw_hash: str) -> bool:
     _validate_password(pw)
-    return pwd.verify(_normalize_password(pw), pw_hash)
+    return pwd.verify(normalize_password(pw), pw_hash)
+
+
+# Request path: bcrypt runs on the hashing pool, never on the event loop or
+# the request threadpool. Raise Overloaded (-> 503) when the pool is backed up.
+async def hash_password_async(pw: str) -> str:
+    _validate_password(pw)
+    return await hasher.hash(pw)
+
+
+async def verify_password_async(pw: str, pw_hash: str) -> tuple[bool, str | None]:
+    """(ok, new_hash): new_hash is pw rehashed at the current BCRYPT_ROUNDS, if needed."""
+    _validate_password(pw)
+    return await hasher.verify_and_update(pw, pw_hash)
 
 
 # -------------------------------------------------------------------
@@ -87,6 +116,24 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(Throttled)
+async def throttled_handler(request: Request, exc: Throttled):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many attempts, try again later"},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -121,49 +168,132 @@ def seed_admin(db: Session):
     db.commit()
 
 
+# Drains outbox_events to RabbitMQ (only when RABBITMQ_URL is set)
+outbox_relay: OutboxRelay | None = None
+
+
 @app.on_event("startup")
 def startup():
-    init_schema()
-    set_search_path()
-    Base.metadata.create_all(bind=engine)
+    global outbox_relay
+
+    # one SELECT when already at head
+    migrate(engine, MIGRATIONS, DB_SCHEMA)
 
     with SessionLocal() as db:
         seed_admin(db)
 
+    hasher.start()
+
+    if keyring is not None:
+        use_local_keys(keyring.keyset())
+
+    for item in _active_revocations():
+        revocations.revoke(item["jti"], item["exp"])
+    start_revocation_sync(RABBITMQ_URL, _active_revocations)
+
+    if RABBITMQ_URL:
+        outbox_relay = OutboxRelay(SessionLocal, OutboxEvent, RABBITMQ_URL)
+        outbox_relay.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    stop_revocation_sync()
+    hasher.shutdown()
+    if outbox_relay is not None:
+        outbox_relay.stop()
+
+
+def _active_revocations() -> list[dict]:
+    with SessionLocal() as db:
+        rows = db.query(RevokedToken).filter(RevokedToken.exp > int(time.time())).all()
+        return [{"jti": r.jti, "exp": r.exp} for r in rows]
+
 
 # -------------------------------------------------------------------
 # Routes
 # -------------------------------------------------------------------
+def _find_user(db: Session, email: str) -> User | None:
+    return db.query(User).filter(User.email == email).first()
+
+
 @app.post("/auth/register")
-def register(data: RegisterIn, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == data.email).first():
+async def register(data: RegisterIn, request: Request, db: Session = Depends(get_db)):
+    # no SELECT first: the INSERT itself detects a taken email (see _create_user),
+    # so a taken email still costs a hash. The throttle runs before it and the
+    # hasher's queue limit bounds it, like a login.
+    register_throttle.check(data.email, client_ip(request))
+    pw_hash = await hash_password_async(data.password)
+    return await run_in_threadpool(_create_user, db, data.email, pw_hash)
+
+
+def _create_user(db: Session, email: str, pw_hash: str):
+    # one INSERT ... ON CONFLICT DO NOTHING RETURNING id: no race between check and insert
+    user_id = user_writes.create_user(db, email, pw_hash)
+    if user_id is None:
+        db.rollback()
         raise HTTPException(status_code=409, detail="Email already registered")
 
-    user = User(
-        email=data.email,
-        password_hash=hash_password(data.password),
-        is_admin=False,
-        is_verified=False,
-    )
+    if RABBITMQ_URL:
+        _queue_verification(db, user_id, email)
 
-    db.add(user)
     db.commit()
-    db.refresh(user)
+    if outbox_relay is not None:
+        outbox_relay.wake()
 
-    token = make_verify_token(user.id, user.email)
+    return {"ok": True, "message": "Registered. Please verify your email."}
+
+
+def _queue_verification(db: Session, user_id: int, email: str) -> None:
+    token = make_verify_token(user_id, email)
 
     # Frontend route receives token, then frontend should call backend /auth/verify
     verify_url = f"{FRONTEND_BASE_URL}/verify?token={token}"
 
-    # Publish event for notify-service (Mailhog)
-    if RABBITMQ_URL:
-        publish(
-            RABBITMQ_URL,
-            "user.registered",
-            {"email": user.email, "verify_url": verify_url},
-        )
+    # Event for notify-service (Mailhog), committed atomically with the user row
+    add_event(
+        db,
+        OutboxEvent,
+        "user.registered",
+        {"email": email, "verify_url": verify_url},
+    )
 
-    return {"ok": True, "message": "Registered. Please verify your email."}
+
+@app.post("/admin/users/import")
+async def import_users(
+    request: Request,
+    send_verification: bool = False,
+    claims: dict = Depends(require_user),
+):
+    """
+    Body: NDJSON (application/x-ndjson) or CSV (text/csv) rows of
+    email, password[, is_verified]. Streams back one NDJSON report line per
+    row, then a summary line. send_verification=true emails new unverified
+    users a verification link (via the outbox, batch by batch).
+    """
+    require_admin(claims)
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = bulk_import.FORMATS.get(content_type)
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send application/x-ndjson or text/csv")
+
+    # fully received before the response starts: the body can't be read while streaming out
+    upload = await bulk_import.spool_upload(request.stream())
+    on_created = _queue_verification if send_verification and RABBITMQ_URL else None
+
+    async def report():
+        # own session, opened and closed here: the body streams after the endpoint returns
+        db = SessionLocal()
+        try:
+            async for line in bulk_import.import_users(db, upload, fmt, hasher, on_created):
+                yield json.dumps(line) + "\n"
+                if on_created is not None and outbox_relay is not None and line.get("status") == "created":
+                    outbox_relay.wake()  # batch already committed
+        finally:
+            upload.close()
+            db.close()
+
+    return StreamingResponse(report(), media_type="application/x-ndjson")
 
 
 @app.get("/auth/verify")
@@ -185,59 +315,204 @@ def _verify_token(token: str, db: Session):
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    user = (
-        db.query(User)
-        .filter(User.id == int(data["sub"]), User.email == data["email"])
-        .first()
-    )
-    if not user:
+    user_id = int(data["sub"])
+    # single conditional UPDATE ... RETURNING instead of SELECT + UPDATE
+    if not user_writes.mark_verified(db, user_id, data["email"]):
+        db.rollback()
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.is_verified = True
     db.commit()
+    profile_cache.invalidate(user_id)
     return {"ok": True}
 
 
 @app.post("/auth/login", response_model=TokenOut)
-def login(data: LoginIn, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
+async def login(data: LoginIn, request: Request, db: Session = Depends(get_db)):
+    # before any DB or bcrypt work: throttled attempts cost next to nothing
+    login_throttle.check(data.email, client_ip(request))
+
+    user = await run_in_threadpool(_find_user, db, data.email)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    if not verify_password(data.password, user.password_hash):
+    ok, new_hash = await verify_password_async(data.password, user.password_hash)
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     if not user.is_verified:
         raise HTTPException(status_code=403, detail="Email not verified")
 
+    return await run_in_threadpool(_start_session, db, user, new_hash)
+
+
+def _access_token(user: User) -> str:
     now = int(time.time())
-    token = jwt.encode(
-        {
-            "sub": str(user.id),
-            "email": user.email,
-            "is_admin": user.is_admin,
-            "iat": now,
-            "exp": now + ACCESS_TOKEN_TTL,
-            "typ": "access",
-        },
-        JWT_SECRET,
-        algorithm=ALGO,
+    claims = {
+        "sub": str(user.id),
+        "email": user.email,
+        "is_admin": user.is_admin,
+        "iat": now,
+        "exp": now + ACCESS_TOKEN_TTL,
+        "typ": "access",
+        "jti": uuid.uuid4().hex,
+    }
+    return keyring.sign(claims) if keyring is not None else fastjwt.encode(claims, JWT_SECRET)
+
+
+def _refresh_digest(token: str) -> str:
+    # refresh tokens are 256 random bits, so a fast digest is enough (no bcrypt)
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _issue_refresh_token(db: Session, user_id: int, family: str) -> str:
+    token = secrets.token_urlsafe(32)
+    db.add(
+        RefreshToken(
+            token_hash=_refresh_digest(token),
+            user_id=user_id,
+            family=family,
+            exp=int(time.time()) + REFRESH_TOKEN_TTL,
+        )
     )
-    return {"access_token": token}
+    return token
 
 
-@app.get("/auth/me", response_model=MeOut)
-def me(claims: dict = Depends(require_user), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == int(claims["sub"])).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+def _start_session(db: Session, user: User, new_hash: str | None = None) -> dict:
+    if new_hash:
+        # cost changed since this hash was made; skip if the password changed meanwhile
+        db.query(User).filter(User.id == user.id, User.password_hash == user.password_hash).update(
+            {"password_hash": new_hash}, synchronize_session=False
+        )
+    # drop this user's dead refresh tokens while we're here
+    db.query(RefreshToken).filter(
+        RefreshToken.user_id == user.id, RefreshToken.exp <= int(time.time())
+    ).delete(synchronize_session=False)
+    refresh_token = _issue_refresh_token(db, user.id, uuid.uuid4().hex)
+    db.commit()
+    return {"access_token": _access_token(user), "refresh_token": refresh_token, "expires_in": ACCESS_TOKEN_TTL}
 
-    return MeOut(
-        id=user.id,
-        email=user.email,
-        is_admin=user.is_admin,
-        is_verified=user.is_verified,
+
+@app.post("/auth/refresh", response_model=TokenOut)
+def refresh(body: RefreshIn, db: Session = Depends(get_db)):
+    digest = _refresh_digest(body.refresh_token)
+    row = (
+        db.query(RefreshToken, User)
+        .join(User, User.id == RefreshToken.user_id)
+        .filter(RefreshToken.token_hash == digest)
+        .first()
+    )
+    if row is None or row[0].exp <= int(time.time()):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    current, user = row
+
+    # single use: whoever flips `used` first wins, a concurrent or replayed use loses
+    claimed = (
+        db.query(RefreshToken)
+        .filter(RefreshToken.token_hash == digest, RefreshToken.used == False)  # noqa: E712
+        .update({"used": True}, synchronize_session=False)
     )
+    if not claimed:
+        # a rotated-out token came back: assume it leaked and end the session
+        db.query(RefreshToken).filter(RefreshToken.family == current.family).delete(synchronize_session=False)
+        db.commit()
+        raise HTTPException(status_code=401, detail="Refresh token reused")
+
+    refresh_token = _issue_refresh_token(db, user.id, current.family)
+    db.commit()
+    return {"access_token": _access_token(user), "refresh_token": refresh_token, "expires_in": ACCESS_TOKEN_TTL}
+
+
+def _end_session(db: Session, refresh_token: str, user_id: int) -> None:
+    current = db.get(RefreshToken, _refresh_digest(refresh_token))
+    if current is not None and current.user_id == user_id:
+        db.query(RefreshToken).filter(RefreshToken.family == current.family).delete(synchronize_session=False)
+        db.commit()
+
+
+def _revoke(db: Session, claims: dict) -> None:
+    jti, exp = claims.get("jti"), claims.get("exp")
+    if not jti or exp is None:
+        raise HTTPException(status_code=400, detail="Token cannot be revoked (no jti/exp)")
+
+    if db.get(RevokedToken, jti) is None:
+        # rows past their exp protect nothing any more
+        db.query(RevokedToken).filter(RevokedToken.exp <= int(time.time())).delete()
+        db.add(RevokedToken(jti=jti, user_id=int(claims["sub"]), exp=int(exp)))
+        # every service instance hears about it and rejects the token locally
+        if RABBITMQ_URL:
+            add_event(db, OutboxEvent, TOKEN_REVOKED, {"jti": jti, "exp": exp})
+        db.commit()
+        if outbox_relay is not None:
+            outbox_relay.wake()
+
+    revocations.revoke(jti, exp)
+
+
+@app.post("/auth/logout")
+def logout(body: RefreshIn | None = None, claims: dict = Depends(require_user), db: Session = Depends(get_db)):
+    if body is not None:
+        _end_session(db, body.refresh_token, int(claims["sub"]))
+    _revoke(db, claims)
+    return {"ok": True}
+
+
+@app.post("/auth/revoke")
+def revoke(body: RevokeIn, claims: dict = Depends(require_user), db: Session = Depends(get_db)):
+    require_admin(claims)
+    try:
+        target = decode_access_token(body.token)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid or expired token")
+    _revoke(db, target)
+    return {"ok": True, "jti": target["jti"]}
+
+
+@app.get("/auth/revocations")
+def list_revocations(request: Request, db: Session = Depends(get_db)):
+    # catch-up feed for services (REVOCATIONS_URL), not for clients: it takes
+    # the shared REVOCATIONS_TOKEN and does not exist without one
+    if not REVOCATIONS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    presented = request.headers.get("authorization", "").encode("utf-8")
+    if not hmac.compare_digest(presented, f"Bearer {REVOCATIONS_TOKEN}".encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid internal token")
+    # only still-valid tokens matter
+    rows = db.query(RevokedToken).filter(RevokedToken.exp > int(time.time())).all()
+    return [{"jti": r.jti, "exp": r.exp} for r in rows]
+
+
+@app.get("/.well-known/jwks.json")
+def jwks_document(response: Response):
+    # services refresh in the background; a short max-age keeps rotation quick
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return keyring.jwks if keyring is not None else {"keys": []}
+
+
+@app.get("/auth/me", response_model=MeOut)
+def me(request: Request, response: Response, claims: dict = Depends(require_user), db: Session = Depends(get_db)):
+    user_id = int(claims["sub"])
+    cached = profile_cache.get(user_id)
+    if cached is not None:
+        profile, etag = cached
+    else:
+        generation = profile_cache.generation()
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        profile = MeOut(
+            id=user.id,
+            email=user.email,
+            is_admin=user.is_admin,
+            is_verified=user.is_verified,
+        ).model_dump()
+        etag = profile_cache.put(user_id, profile, generation)
+
+    # per-user: browsers may keep it but must revalidate (cheap 304) each time
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return profile
 
 @app.get("/health")
 def health():
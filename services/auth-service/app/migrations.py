@@ -0,0 +1,9 @@
+from shared.migrations import Migration, create_tables
+
+from . import models  # noqa: F401  (registers the tables on Base.metadata)
+from .db import Base
+
+# Append only; never edit or renumber a step that has shipped.
+MIGRATIONS = [
+    Migration(1, "baseline", create_tables(Base.metadata, ["users", "revoked_tokens", "refresh_tokens", "outbox_events"])),
+]
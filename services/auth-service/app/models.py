@@ -1,6 +1,7 @@
-from sqlalchemy import String, Boolean
+from sqlalchemy import BigInteger, String, Boolean
 from sqlalchemy.orm import Mapped, mapped_column
 from .db import Base
+from shared.outbox import OutboxMixin
 
 class User(Base):
     __tablename__ = "users"
@@ -9,3 +10,26 @@ class User(Base):
     password_hash: Mapped[str] = mapped_column(String(255))
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False)
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False)
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    jti: Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id: Mapped[int] = mapped_column(index=True)
+    # the token's own exp (epoch seconds): rows past it can be deleted
+    exp: Mapped[int] = mapped_column(BigInteger, index=True)
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    # sha256 hex of the opaque token; the token itself is never stored
+    token_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id: Mapped[int] = mapped_column(index=True)
+    # all tokens rotated from one login share a family; reuse kills the family
+    family: Mapped[str] = mapped_column(String(32), index=True)
+    exp: Mapped[int] = mapped_column(BigInteger, index=True)
+    used: Mapped[bool] = mapped_column(Boolean, default=False)
+
+
+class OutboxEvent(OutboxMixin, Base):
+    __tablename__ = "outbox_events"
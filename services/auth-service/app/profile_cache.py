@@ -0,0 +1,23 @@
+import os
+from typing import Any, Dict
+
+from shared.ttl_cache import TTLCache, json_etag
+
+# /auth/me profiles cached per process: max entries and seconds before a re-read.
+# A write in this process invalidates at once; the TTL bounds how long other
+# replicas may serve the old profile.
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "60"))
+
+
+class ProfileCache(TTLCache):
+    """user_id -> (profile, etag). get() returns the pair, or None."""
+
+    def __init__(self, max_entries: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL):
+        super().__init__(max_entries, ttl)
+
+    def put(self, user_id: int, profile: Dict[str, Any], generation: int) -> str:
+        """Cache profile (unless invalidated since generation); returns its ETag."""
+        etag = json_etag(profile)
+        self.store(user_id, (profile, etag), generation)
+        return etag
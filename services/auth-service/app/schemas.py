@@ -33,8 +33,33 @@ class LoginIn(BaseModel):
         return _validate_password_len(v)
 
 
+class ImportRow(BaseModel):
+    """One user of an /admin/users/import file."""
+
+    email: EmailStr
+    password: str
+    is_verified: bool = False
+
+    @field_validator("password")
+    @classmethod
+    def password_len_ok(cls, v: str) -> str:
+        if not v:
+            raise ValueError("Password is required")
+        return _validate_password_len(v)
+
+
 class TokenOut(BaseModel):
     access_token: str
+    refresh_token: str | None = None
+    expires_in: int | None = None
+
+
+class RefreshIn(BaseModel):
+    refresh_token: str
+
+
+class RevokeIn(BaseModel):
+    token: str
 
 
 class MeOut(BaseModel):
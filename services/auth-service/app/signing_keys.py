@@ -0,0 +1,79 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict
+
+from shared import jwks
+
+logger = logging.getLogger("auth.signing_keys")
+
+# HS256 (shared JWT_SECRET, the default) | EdDSA | RS256
+JWT_SIGNING_ALG = os.getenv("JWT_SIGNING_ALG", "HS256")
+# Directory of <kid>.pem private keys. Every key in it is published in the
+# JWKS; JWT_ACTIVE_KID signs new tokens (required once there is more than one
+# key, so adding the next key publishes it without switching signing to it).
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR", "")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID", "")
+
+
+class KeyRing:
+    def __init__(self, private_keys: Dict[str, Any], active_kid: str):
+        if active_kid not in private_keys:
+            raise ValueError(f"Active kid {active_kid!r} not among {sorted(private_keys)}")
+        self.private_keys = private_keys
+        self.active_kid = active_kid
+        self.public_keys = {kid: key.public_key() for kid, key in private_keys.items()}
+        # served as-is by /.well-known/jwks.json
+        self.jwks = {"keys": [jwks.public_jwk(pub, kid) for kid, pub in sorted(self.public_keys.items())]}
+
+    def sign(self, claims: Dict[str, Any]) -> str:
+        return jwks.sign(claims, self.private_keys[self.active_kid], self.active_kid)
+
+    def keyset(self) -> jwks.KeySet:
+        return jwks.KeySet(self.public_keys)
+
+
+def _kid_for(public_key) -> str:
+    # RFC 7638-ish thumbprint, so ephemeral keys get stable-looking, unique kids
+    jwk = {k: v for k, v in jwks.public_jwk(public_key, "").items() if k in ("crv", "e", "kty", "n", "x")}
+    return hashlib.sha256(json.dumps(jwk, sort_keys=True, separators=(",", ":")).encode()).hexdigest()[:16]
+
+
+def generate_key(alg: str):
+    if alg == "EdDSA":
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+
+        return ed25519.Ed25519PrivateKey.generate()
+    if alg == "RS256":
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    raise ValueError(f"Unsupported signing algorithm {alg!r}")
+
+
+def load_keyring(alg: str = JWT_SIGNING_ALG, keys_dir: str = JWT_KEYS_DIR, active_kid: str = JWT_ACTIVE_KID) -> KeyRing | None:
+    """None means HS256 with JWT_SECRET (no JWKS)."""
+    if alg == "HS256":
+        return None
+
+    if not keys_dir:
+        key = generate_key(alg)
+        kid = _kid_for(key.public_key())
+        logger.warning("JWT_KEYS_DIR not set: signing with an ephemeral %s key kid=%s (dev only)", alg, kid)
+        return KeyRing({kid: key}, kid)
+
+    from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+    keys = {}
+    for name in sorted(os.listdir(keys_dir)):
+        if name.endswith(".pem"):
+            with open(os.path.join(keys_dir, name), "rb") as f:
+                keys[name[: -len(".pem")]] = load_pem_private_key(f.read(), password=None)
+    if not keys:
+        raise RuntimeError(f"No *.pem signing keys in {keys_dir}")
+    if not active_kid:
+        if len(keys) > 1:
+            raise RuntimeError(f"JWT_ACTIVE_KID must be set when {keys_dir} holds more than one key ({', '.join(sorted(keys))})")
+        active_kid = next(iter(keys))
+    return KeyRing(keys, active_kid)
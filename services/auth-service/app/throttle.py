@@ -0,0 +1,178 @@
+"""
+Token-bucket throttling for /auth/login and /auth/register, checked before
+any DB query or bcrypt work so credential stuffing or signup floods can't
+turn into CPU exhaustion.
+
+Buckets live in this process (LocalBuckets) unless THROTTLE_REDIS_URL is
+set, in which case every replica shares them through Redis (RedisBuckets,
+needs the optional `redis` package). Both answer take(key) the same way, so
+the local store doubles as the stand-in for the shared one in tests/dev.
+"""
+import os
+import threading
+import time
+
+# bucket = burst tokens, refilled at per_minute / 60 tokens per second
+LOGIN_EMAIL_BURST = float(os.getenv("LOGIN_EMAIL_BURST", "5"))
+LOGIN_EMAIL_PER_MINUTE = float(os.getenv("LOGIN_EMAIL_PER_MINUTE", "5"))
+LOGIN_IP_BURST = float(os.getenv("LOGIN_IP_BURST", "20"))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", "60"))
+# register hashes before its INSERT can tell the email is taken: keep these tight
+REGISTER_EMAIL_BURST = float(os.getenv("REGISTER_EMAIL_BURST", "3"))
+REGISTER_EMAIL_PER_MINUTE = float(os.getenv("REGISTER_EMAIL_PER_MINUTE", "1"))
+REGISTER_IP_BURST = float(os.getenv("REGISTER_IP_BURST", "10"))
+REGISTER_IP_PER_MINUTE = float(os.getenv("REGISTER_IP_PER_MINUTE", "10"))
+
+THROTTLE_SHARDS = int(os.getenv("THROTTLE_SHARDS", "16"))
+THROTTLE_EVICT_INTERVAL = float(os.getenv("THROTTLE_EVICT_INTERVAL", "60"))
+THROTTLE_REDIS_URL = os.getenv("THROTTLE_REDIS_URL", "")
+
+# Header carrying the real client IP when behind a proxy (nginx sets X-Real-IP).
+# Leave empty when clients can reach the service directly: they could forge it.
+CLIENT_IP_HEADER = os.getenv("CLIENT_IP_HEADER", "")
+
+
+class Throttled(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("Too many attempts")
+        self.retry_after = retry_after
+
+
+def _refill_rate(burst: float, per_minute: float) -> float:
+    """Tokens per second; a bucket that never refills (or never holds a token) is a config error."""
+    if per_minute <= 0:
+        raise ValueError(f"per_minute must be > 0 (LOGIN_*_PER_MINUTE), got {per_minute}")
+    if burst < 1:
+        raise ValueError(f"burst must be >= 1 (LOGIN_*_BURST), got {burst}")
+    return per_minute / 60.0
+
+
+class LocalBuckets:
+    """
+    key -> (tokens, updated_at), split over lock-striped shards so concurrent
+    logins rarely contend. Each shard drops its full (idle) buckets every
+    evict_interval, so memory tracks recently active keys only.
+    """
+
+    def __init__(self, burst: float, per_minute: float, shards: int = THROTTLE_SHARDS, evict_interval: float = THROTTLE_EVICT_INTERVAL):
+        self.rate = _refill_rate(burst, per_minute)
+        self.burst = burst
+        self._evict_interval = evict_interval
+        self._shards = [(threading.Lock(), {}) for _ in range(max(1, shards))]
+        self._next_evict = [time.monotonic() + evict_interval] * len(self._shards)
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for _, buckets in self._shards)
+
+    def take(self, key: str, now: float | None = None) -> float:
+        """Spend one token: 0.0 if allowed, else seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        i = hash(key) % len(self._shards)
+        lock, buckets = self._shards[i]
+        with lock:
+            if now >= self._next_evict[i]:
+                self._evict(i, now)
+            tokens, updated = buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1.0:
+                buckets[key] = (tokens - 1.0, now)
+                return 0.0
+            buckets[key] = (tokens, now)
+            return (1.0 - tokens) / self.rate
+
+    def evict(self, now: float | None = None) -> int:
+        now = time.monotonic() if now is None else now
+        dropped = 0
+        for i, (lock, _) in enumerate(self._shards):
+            with lock:
+                dropped += self._evict(i, now)
+        return dropped
+
+    def _evict(self, i: int, now: float) -> int:
+        # caller holds the shard lock; a bucket that has refilled is the same as no bucket
+        _, buckets = self._shards[i]
+        self._next_evict[i] = now + self._evict_interval
+        full = [k for k, (tokens, updated) in buckets.items() if tokens + (now - updated) * self.rate >= self.burst]
+        for k in full:
+            del buckets[k]
+        return len(full)
+
+
+# KEYS[1] bucket; ARGV burst, rate/s, now (s). Returns ms until a token, 0 = allowed.
+_REDIS_TAKE = """
+local b = redis.call('HMGET', KEYS[1], 't', 'u')
+local burst, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t, u = tonumber(b[1]) or burst, tonumber(b[2]) or now
+t = math.min(burst, t + math.max(0, now - u) * rate)
+local wait = 0
+if t >= 1 then t = t - 1 else wait = math.ceil((1 - t) / rate * 1000) end
+redis.call('HSET', KEYS[1], 't', t, 'u', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return wait
+"""
+
+
+class RedisBuckets:
+    """Same buckets, shared by all replicas; the refill runs atomically in Redis."""
+
+    def __init__(self, url: str, burst: float, per_minute: float, prefix: str = "throttle:"):
+        self.rate = _refill_rate(burst, per_minute)
+        self.burst = burst
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("THROTTLE_REDIS_URL needs the 'redis' package")
+        self._prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+        self._take = self._redis.register_script(_REDIS_TAKE)
+
+    def take(self, key: str, now: float | None = None) -> float:
+        now = time.time() if now is None else now
+        wait_ms = self._take(keys=[self._prefix + key], args=[self.burst, self.rate, now])
+        return int(wait_ms) / 1000.0
+
+
+class AccountThrottle:
+    """A per-IP and a per-email bucket in front of one endpoint."""
+
+    def __init__(self, by_email, by_ip):
+        self.by_email = by_email
+        self.by_ip = by_ip
+        self.rejected = 0
+
+    def check(self, email: str, ip: str | None) -> None:
+        """Raise Throttled if this IP or this account is out of attempts."""
+        # IP first: a sprayer hitting many accounts shouldn't drain their buckets too
+        wait = self.by_ip.take("ip:" + ip) if ip else 0.0
+        if not wait:
+            wait = self.by_email.take("email:" + email.strip().lower())
+        if wait:
+            self.rejected += 1
+            raise Throttled(wait)
+
+
+def client_ip(request) -> str | None:
+    if CLIENT_IP_HEADER:
+        forwarded = request.headers.get(CLIENT_IP_HEADER)
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+
+def _account_throttle(prefix: str, email_burst: float, email_per_minute: float, ip_burst: float, ip_per_minute: float) -> AccountThrottle:
+    if THROTTLE_REDIS_URL:
+        return AccountThrottle(
+            RedisBuckets(THROTTLE_REDIS_URL, email_burst, email_per_minute, prefix=prefix),
+            RedisBuckets(THROTTLE_REDIS_URL, ip_burst, ip_per_minute, prefix=prefix),
+        )
+    return AccountThrottle(LocalBuckets(email_burst, email_per_minute), LocalBuckets(ip_burst, ip_per_minute))
+
+
+def make_login_throttle() -> AccountThrottle:
+    return _account_throttle("throttle:login:", LOGIN_EMAIL_BURST, LOGIN_EMAIL_PER_MINUTE, LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE)
+
+
+def make_register_throttle() -> AccountThrottle:
+    return _account_throttle(
+        "throttle:register:", REGISTER_EMAIL_BURST, REGISTER_EMAIL_PER_MINUTE, REGISTER_IP_BURST, REGISTER_IP_PER_MINUTE
+    )
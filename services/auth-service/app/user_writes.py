@@ -0,0 +1,59 @@
+"""
+Single-statement user writes (no SELECT-then-write round trips or races).
+
+Postgres and SQLite >= 3.35 get INSERT ... ON CONFLICT DO NOTHING RETURNING
+and UPDATE ... RETURNING. Older SQLite lacks RETURNING: inserts fall back
+to one INSERT OR IGNORE per row (rowcount says whether it landed) and the
+update to its rowcount, which is still one statement each.
+"""
+from typing import Any, Dict, List
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from .models import User
+
+
+def _insert(db: Session):
+    dialect = db.get_bind().dialect
+    if dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Unsupported dialect {dialect.name!r} for ON CONFLICT inserts")
+    return dialect, insert
+
+
+def insert_ignore(db: Session, values: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Insert users, skipping emails that already exist. Returns email -> id of the rows inserted."""
+    if not values:
+        return {}
+    dialect, insert = _insert(db)
+
+    if dialect.insert_returning:
+        stmt = insert(User).values(values).on_conflict_do_nothing(index_elements=[User.email]).returning(User.id, User.email)
+        return {email: user_id for user_id, email in db.execute(stmt)}
+
+    created = {}
+    stmt = insert(User).on_conflict_do_nothing(index_elements=[User.email])
+    conn = db.connection()  # Core result: rowcount + inserted_primary_key
+    for v in values:
+        result = conn.execute(stmt, v)
+        if result.rowcount == 1:
+            created[v["email"]] = result.inserted_primary_key[0]
+    return created
+
+
+def create_user(db: Session, email: str, password_hash: str, is_admin: bool = False, is_verified: bool = False) -> int | None:
+    """New user's id, or None if the email is taken (also under concurrent signups)."""
+    values = {"email": email, "password_hash": password_hash, "is_admin": is_admin, "is_verified": is_verified}
+    return insert_ignore(db, [values]).get(email)
+
+
+def mark_verified(db: Session, user_id: int, email: str) -> bool:
+    """Set is_verified on the user matching both id and email; False if there is none."""
+    stmt = update(User).where(User.id == user_id, User.email == email).values(is_verified=True)
+    if db.get_bind().dialect.update_returning:
+        return db.execute(stmt.returning(User.id)).first() is not None
+    return db.execute(stmt).rowcount == 1
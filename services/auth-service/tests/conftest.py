@@ -52,6 +52,7 @@ def app_and_db(monkeypatch, jwt_secret, test_engine):
 
     monkeypatch.setattr(dbmod, "engine", test_engine, raising=True)
     monkeypatch.setattr(dbmod, "SessionLocal", TestingSessionLocal, raising=True)
+    monkeypatch.setattr(main, "SessionLocal", TestingSessionLocal, raising=True)
 
     # Recreate tables in the in-memory DB
     dbmod.Base.metadata.create_all(bind=test_engine)
@@ -66,6 +67,12 @@ def app_and_db(monkeypatch, jwt_secret, test_engine):
 
     main.app.dependency_overrides[main.get_db] = override_get_db
 
+    # fresh login/register buckets per test (every TestClient request comes from one IP)
+    monkeypatch.setattr(main, "login_throttle", main.make_login_throttle())
+    monkeypatch.setattr(main, "register_throttle", main.make_register_throttle())
+    # user ids get reused once tests delete their rows: no profiles carried over
+    monkeypatch.setattr(main, "profile_cache", main.ProfileCache())
+
     return main, dbmod, TestingSessionLocal
 
 
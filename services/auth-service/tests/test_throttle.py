@@ -0,0 +1,111 @@
+import pytest
+
+from auth_service.throttle import AccountThrottle, LocalBuckets, RedisBuckets, Throttled
+
+
+def test_local_buckets_refill_and_evict():
+    buckets = LocalBuckets(burst=2, per_minute=60, shards=4, evict_interval=3600)
+
+    assert buckets.take("a", now=100.0) == 0.0
+    assert buckets.take("a", now=100.0) == 0.0
+    assert buckets.take("a", now=100.0) == pytest.approx(1.0)
+    # 1 token/s
+    assert buckets.take("a", now=100.5) == pytest.approx(0.5)
+    assert buckets.take("a", now=101.0) == 0.0
+    assert buckets.take("b", now=101.0) == 0.0
+    assert len(buckets) == 2
+
+    # full again after 2s idle -> indistinguishable from a new key, so dropped
+    assert buckets.evict(now=102.5) == 1
+    assert len(buckets) == 1
+    assert buckets.evict(now=104.0) == 1
+    assert len(buckets) == 0
+
+
+def test_login_throttle_checks_ip_before_email():
+    throttle = AccountThrottle(
+        by_email=LocalBuckets(burst=2, per_minute=1),
+        by_ip=LocalBuckets(burst=3, per_minute=1),
+    )
+    throttle.check("Victim@Example.com", "10.0.0.1")
+    throttle.check("victim@example.com ", "10.0.0.2")
+    with pytest.raises(Throttled) as e:
+        throttle.check("victim@example.com", "10.0.0.3")
+    assert e.value.retry_after > 0
+
+    # a sprayer runs out of IP budget without eating other accounts' buckets
+    throttle.check("a@example.com", "10.0.0.9")
+    throttle.check("b@example.com", "10.0.0.9")
+    throttle.check("c@example.com", "10.0.0.9")
+    with pytest.raises(Throttled):
+        throttle.check("d@example.com", "10.0.0.9")
+    throttle.check("d@example.com", "10.0.0.8")
+    throttle.check("d@example.com", "10.0.0.8")
+    assert throttle.rejected == 2
+
+
+def test_login_throttled_before_db_or_hash(client, app_and_db, monkeypatch):
+    main, _, _ = app_and_db
+    from auth_service.hashing import PasswordHasher
+
+    monkeypatch.setattr(
+        main,
+        "login_throttle",
+        AccountThrottle(by_email=LocalBuckets(burst=2, per_minute=1), by_ip=LocalBuckets(burst=100, per_minute=60)),
+    )
+    busy = PasswordHasher(workers=0, queue_limit=0)
+    monkeypatch.setattr(main, "hasher", busy)
+    lookups = []
+    monkeypatch.setattr(main, "_find_user", lambda db, email: lookups.append(email))
+
+    for _ in range(2):
+        r = client.post("/auth/login", json={"email": "stuffed@example.com", "password": "guess"})
+        assert r.status_code == 401
+
+    r = client.post("/auth/login", json={"email": "stuffed@example.com", "password": "guess"})
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+    assert len(lookups) == 2
+    assert busy.rejected == 0
+
+
+def test_register_throttled_before_hash(client, app_and_db, monkeypatch):
+    main, _, TestingSessionLocal = app_and_db
+    from auth_service.models import User
+
+    monkeypatch.setattr(
+        main,
+        "register_throttle",
+        AccountThrottle(by_email=LocalBuckets(burst=2, per_minute=1), by_ip=LocalBuckets(burst=100, per_minute=60)),
+    )
+    hashed = []
+
+    async def counting_hash(pw):
+        hashed.append(pw)
+        return "x"
+
+    monkeypatch.setattr(main, "hash_password_async", counting_hash)
+    with TestingSessionLocal() as db:
+        db.add(User(email="taken@example.com", password_hash="x", is_admin=False, is_verified=False))
+        db.commit()
+
+    # a taken email still costs a hash, but only as many as the bucket allows
+    for _ in range(2):
+        r = client.post("/auth/register", json={"email": "taken@example.com", "password": "pw"})
+        assert r.status_code == 409
+    r = client.post("/auth/register", json={"email": "Taken@example.com", "password": "pw"})
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+    assert len(hashed) == 2
+
+    with TestingSessionLocal() as db:
+        db.query(User).filter(User.email == "taken@example.com").delete()
+        db.commit()
+
+
+@pytest.mark.parametrize("cls", [LocalBuckets, RedisBuckets])
+@pytest.mark.parametrize("burst,per_minute", [(5, 0), (5, -1), (0, 5)])
+def test_buckets_reject_settings_that_never_allow_or_refill(cls, burst, per_minute):
+    args = ("redis://localhost:6379/0",) if cls is RedisBuckets else ()
+    with pytest.raises(ValueError):
+        cls(*args, burst=burst, per_minute=per_minute)
@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from auth_service import user_writes
+from auth_service.db import Base
+from auth_service.models import User
+
+
+@pytest.fixture(params=["returning", "no-returning"])
+def Session(request):
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    if request.param == "no-returning":
+        # SQLite < 3.35
+        engine.dialect.insert_returning = False
+        engine.dialect.update_returning = False
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, future=True)
+    engine.dispose()
+
+
+def _statements(Session):
+    seen = []
+    event.listen(Session.kw["bind"], "before_cursor_execute", lambda conn, cur, stmt, *a: seen.append(stmt.split()[0]))
+    return seen
+
+
+def test_create_user_single_insert_and_conflict(Session):
+    statements = _statements(Session)
+    with Session() as db:
+        user_id = user_writes.create_user(db, "one@example.com", "h")
+        assert user_id is not None
+        assert user_writes.create_user(db, "one@example.com", "other") is None
+        db.commit()
+        assert db.get(User, user_id).password_hash == "h"
+    assert statements[:2] == ["INSERT", "INSERT"]
+
+    with Session() as db:
+        created = user_writes.insert_ignore(
+            db,
+            [
+                {"email": "one@example.com", "password_hash": "h", "is_admin": False, "is_verified": False},
+                {"email": "two@example.com", "password_hash": "h", "is_admin": False, "is_verified": True},
+            ],
+        )
+        assert list(created) == ["two@example.com"]
+
+
+def test_mark_verified_single_update(Session):
+    with Session() as db:
+        user_id = user_writes.create_user(db, "v@example.com", "h")
+        db.commit()
+
+    statements = _statements(Session)
+    with Session() as db:
+        assert user_writes.mark_verified(db, user_id, "v@example.com") is True
+        assert user_writes.mark_verified(db, user_id, "someone-else@example.com") is False
+        assert user_writes.mark_verified(db, user_id + 1, "v@example.com") is False
+        db.commit()
+        assert db.get(User, user_id).is_verified is True
+    assert statements[:3] == ["UPDATE", "UPDATE", "UPDATE"]
@@ -3,6 +3,7 @@ import threading
 import logging
 from fastapi import FastAPI
 from shared.events import consume
+from shared.dedup import DedupStore, SqlDedupBackend
 from .emailer import send_email
 
 logging.basicConfig(level=logging.INFO)
@@ -10,12 +11,19 @@ logger = logging.getLogger("notification-service")
 
 RABBITMQ_URL = os.environ["RABBITMQ_URL"]
 
+# SMTP sends are slow/blocking -> handle deliveries on a small thread pool
+CONSUMER_WORKERS = int(os.getenv("CONSUMER_WORKERS", "4"))
+CONSUMER_PREFETCH = int(os.getenv("CONSUMER_PREFETCH", "20"))
+
+# Optional: persist processed message ids so dedup survives restarts
+DEDUP_DATABASE_URL = os.getenv("DEDUP_DATABASE_URL", "")
+
 app = FastAPI(title="notification-service")
 
 
 def handler(event_type: str, payload: dict):
     """
-    Handle events consumed from RabbitMQ.
+    Handle events consumed from RabbitMQ. Raises on transient failures.
     Expected payload for user.registered:
       { "email": "...", "verify_url": "..." }
     """
@@ -55,9 +63,10 @@ def handler(event_type: str, payload: dict):
             logger.info("Ignoring event_type=%s payload=%s", event_type, payload)
 
     except KeyError as e:
+        # malformed payload: retrying won't help, ack and move on
         logger.exception("Missing required field %s in payload: %s", e, payload)
-    except Exception:
-        logger.exception("Handler failed for event_type=%s payload=%s", event_type, payload)
+    # anything else (SMTP down, timeouts) propagates: consume() retries it via
+    # <queue>.retry.<n> with backoff and parks it in <queue>.dlq after the last attempt
 
 
 @app.on_event("startup")
@@ -68,11 +77,16 @@ def startup():
     def run_consumer():
         try:
             logger.info("Starting RabbitMQ consumer...")
+            # redeliveries (requeue, consumer crash) must not send the same email twice
+            backend = SqlDedupBackend(DEDUP_DATABASE_URL) if DEDUP_DATABASE_URL else None
             consume(
                 rabbitmq_url=RABBITMQ_URL,
                 queue_name="notification-service",
                 bindings=["user.registered", "payment.succeeded"],
                 handler=handler,
+                prefetch_count=CONSUMER_PREFETCH,
+                workers=CONSUMER_WORKERS,
+                dedup=DedupStore(backend=backend),
             )
         except Exception:
             logger.exception("RabbitMQ consumer crashed")
@@ -0,0 +1,272 @@
+import json
+import queue
+import threading
+import types
+
+import pytest
+
+import shared.events as events
+
+
+class FakeChannel:
+    def __init__(self, conn):
+        self.conn = conn
+        self.is_open = True
+        self.prefetch = None
+        self.bindings = []
+        self.queues = {}
+        self.published = []
+        self._cb = None
+
+    def exchange_declare(self, exchange, exchange_type, durable):
+        pass
+
+    def queue_declare(self, queue, durable, arguments=None):
+        self.queues[queue] = arguments
+
+    def queue_bind(self, queue, exchange, routing_key):
+        self.bindings.append(routing_key)
+
+    def basic_qos(self, prefetch_count):
+        self.prefetch = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback):
+        self._cb = on_message_callback
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        tags = [t for t in sorted(self.conn.unacked) if t <= delivery_tag] if multiple else [delivery_tag]
+        for t in tags:
+            self.conn.unacked.discard(t)
+            self.conn.settled.append(("ack", t, threading.get_ident()))
+        self.conn.ack_calls += 1
+
+    def basic_nack(self, delivery_tag, requeue):
+        self.conn.settled.append(("nack", delivery_tag, threading.get_ident()))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published.append((exchange, routing_key, body, properties))
+
+    def start_consuming(self):
+        for tag, (rk, payload, *props) in enumerate(self.conn.messages, start=1):
+            body = payload if isinstance(payload, bytes) else json.dumps({"type": rk, "payload": payload}).encode("utf-8")
+            method = types.SimpleNamespace(routing_key=rk, delivery_tag=tag)
+            self.conn.unacked.add(tag)
+            self._cb(self, method, props[0] if props else None, body)
+
+        # queue drained -> let pending timers (batch timeouts) fire
+        for cb in list(self.conn.timers.values()):
+            cb()
+
+        # emulate pika's I/O loop: run thread-safe callbacks until everything is settled
+        while len(self.conn.settled) < len(self.conn.messages):
+            self.conn.callbacks.get(timeout=5)()
+
+
+class FakeConnection:
+    messages = []
+
+    def __init__(self, params):
+        self.messages = list(FakeConnection.messages)
+        self.settled = []
+        self.unacked = set()
+        self.ack_calls = 0
+        self.callbacks = queue.Queue()
+        self.timers = {}
+        self.channels = []
+
+    def channel(self):
+        ch = FakeChannel(self)
+        self.channels.append(ch)
+        return ch
+
+    def add_callback_threadsafe(self, cb):
+        self.callbacks.put(cb)
+
+    def call_later(self, delay, cb):
+        timer_id = object()
+        self.timers[timer_id] = cb
+        return timer_id
+
+    def remove_timeout(self, timer_id):
+        self.timers.pop(timer_id, None)
+
+
+@pytest.fixture()
+def broker(monkeypatch):
+    conns = []
+
+    def factory(params):
+        c = FakeConnection(params)
+        conns.append(c)
+        return c
+
+    monkeypatch.setattr(events.pika, "BlockingConnection", factory)
+    return conns
+
+
+def test_consume_declares_retry_topology(broker):
+    FakeConnection.messages = []
+
+    events.consume("amqp://x/", "q", ["user.registered"], lambda *a: None, max_attempts=3, retry_base_delay_ms=100)
+
+    queues = broker[0].channels[0].queues
+    assert queues["q"] is None
+    assert [queues[f"q.retry.{i}"]["x-message-ttl"] for i in (1, 2, 3)] == [100, 200, 400]
+    assert all(queues[f"q.retry.{i}"]["x-dead-letter-routing-key"] == "q" for i in (1, 2, 3))
+    assert "q.dlq" in queues
+
+
+def test_consume_failure_goes_to_next_retry_queue(broker):
+    FakeConnection.messages = [("user.registered", {"ok": True}), ("user.registered", {"ok": False})]
+
+    def handler(event_type, payload):
+        if not payload["ok"]:
+            raise RuntimeError("boom")
+
+    events.consume("amqp://x/", "q", ["user.registered"], handler)
+
+    conn = broker[0]
+    ch = conn.channels[0]
+    assert ch.prefetch == 10
+    # both acked: the failed one was moved to the delay queue, not requeued hot
+    assert [(kind, tag) for (kind, tag, _) in conn.settled] == [("ack", 1), ("ack", 2)]
+    [(exchange, rk, body, props)] = ch.published
+    assert (exchange, rk) == ("", "q.retry.1")
+    assert props.headers[events.ATTEMPT_HEADER] == 1
+    assert props.headers[events.ORIGINAL_ROUTING_KEY_HEADER] == "user.registered"
+    assert json.loads(body)["payload"] == {"ok": False}
+
+
+def test_consume_exhausted_or_poison_goes_to_dlq(broker):
+    exhausted = events.pika.BasicProperties(headers={events.ATTEMPT_HEADER: 2})
+    FakeConnection.messages = [
+        ("user.registered", {"ok": False}, exhausted),
+        ("user.registered", b"not json"),
+    ]
+
+    def handler(event_type, payload):
+        raise RuntimeError("boom")
+
+    events.consume("amqp://x/", "q", ["user.registered"], handler, max_attempts=2)
+
+    ch = broker[0].channels[0]
+    assert [rk for (_, rk, _, _) in ch.published] == ["q.dlq", "q.dlq"]
+    assert ch.published[0][3].headers[events.ATTEMPT_HEADER] == 3
+
+
+def test_consume_worker_pool_runs_handlers_in_parallel(broker):
+    FakeConnection.messages = [("payment.succeeded", {"n": i}) for i in range(4)]
+
+    # only passes if all 4 handlers are running at the same time
+    barrier = threading.Barrier(4, timeout=5)
+    handled_on = set()
+
+    def handler(event_type, payload):
+        handled_on.add(threading.get_ident())
+        barrier.wait()
+
+    events.consume("amqp://x/", "q", ["payment.succeeded"], handler, prefetch_count=8, workers=4)
+
+    conn = broker[0]
+    assert conn.channels[0].prefetch == 8
+    assert sorted(tag for (kind, tag, _) in conn.settled if kind == "ack") == [1, 2, 3, 4]
+    # handlers ran on pool threads, but every ack happened on the connection thread
+    assert threading.get_ident() not in handled_on
+    assert {tid for (_, _, tid) in conn.settled} == {threading.get_ident()}
+
+
+def test_consume_batch_acks_multiple_up_to_last_success(broker):
+    FakeConnection.messages = [("payment.succeeded", {"n": i}) for i in range(5)]
+    batches = []
+
+    def batch_handler(events_):
+        batches.append([p["n"] for (_, p) in events_])
+        # first batch: only the first 2 of 3 succeeded
+        return 2 if len(batches) == 1 else None
+
+    events.consume_batch("amqp://x/", "q", ["payment.succeeded"], batch_handler, batch_size=3)
+
+    conn = broker[0]
+    ch = conn.channels[0]
+    assert ch.prefetch == 3
+    # full batch of 3, then the 2 leftovers flushed by the timeout
+    assert batches == [[0, 1, 2], [3, 4]]
+    assert sorted(tag for (kind, tag, _) in conn.settled) == [1, 2, 3, 4, 5]
+    # 1 multiple-ack per batch + 1 single ack for the failed event moved to retry
+    assert conn.ack_calls == 3
+    [(_, rk, body, _)] = ch.published
+    assert rk == "q.retry.1"
+    assert json.loads(body)["payload"] == {"n": 2}
+
+
+def test_consume_batch_handler_raising_retries_whole_batch(broker):
+    FakeConnection.messages = [("payment.succeeded", {"n": i}) for i in range(2)]
+
+    def batch_handler(events_):
+        raise RuntimeError("db down")
+
+    events.consume_batch("amqp://x/", "q", ["payment.succeeded"], batch_handler, batch_size=10)
+
+    ch = broker[0].channels[0]
+    assert [rk for (_, rk, _, _) in ch.published] == ["q.retry.1", "q.retry.1"]
+
+
+def test_consume_skips_already_handled_message_ids(broker):
+    from shared.dedup import DedupStore
+
+    def props(mid):
+        return events.pika.BasicProperties(message_id=mid)
+
+    FakeConnection.messages = [
+        ("user.registered", {"n": 1}, props("m1")),
+        ("user.registered", {"n": 1}, props("m1")),  # redelivery
+        ("user.registered", {"n": 2}, props("m2")),
+    ]
+    calls = []
+
+    events.consume("amqp://x/", "q", ["user.registered"], lambda t, p: calls.append(p["n"]), dedup=DedupStore())
+
+    assert calls == [1, 2]
+    assert [kind for (kind, _, _) in broker[0].settled] == ["ack", "ack", "ack"]
+
+
+def test_consume_batch_drops_duplicates_within_a_batch(broker):
+    from shared.dedup import DedupStore
+
+    def props(mid):
+        return events.pika.BasicProperties(message_id=mid)
+
+    # the copy arrives before the first one is handled, so the store hasn't seen it yet
+    FakeConnection.messages = [
+        ("payment.succeeded", {"n": 1}, props("m1")),
+        ("payment.succeeded", {"n": 1}, props("m1")),
+        ("payment.succeeded", {"n": 2}, props("m2")),
+        ("payment.succeeded", {"n": 1}, props("m1")),  # next batch: the store has it
+    ]
+    batches = []
+    store = DedupStore()
+
+    def batch_handler(events_):
+        batches.append([p["n"] for (_, p) in events_])
+
+    events.consume_batch("amqp://x/", "q", ["payment.succeeded"], batch_handler, batch_size=2, dedup=store)
+
+    assert batches == [[1, 2]]
+    assert sorted(tag for (kind, tag, _) in broker[0].settled if kind == "ack") == [1, 2, 3, 4]
+    assert store.seen("m1") and store.seen("m2")
+
+
+def test_notification_smtp_failure_goes_to_retry_queue(broker, svc, monkeypatch):
+    def fake_send_email(*args, **kwargs):
+        raise RuntimeError("smtp down")
+
+    monkeypatch.setattr(svc, "send_email", fake_send_email)
+    FakeConnection.messages = [("payment.succeeded", {"email": "b@example.com", "order_id": 1, "total": 10})]
+
+    events.consume("amqp://x/", "notification-service", ["payment.succeeded"], svc.handler)
+
+    conn = broker[0]
+    [(exchange, rk, _, props)] = conn.channels[0].published
+    assert (exchange, rk) == ("", "notification-service.retry.1")
+    assert props.headers[events.ATTEMPT_HEADER] == 1
+    assert [kind for (kind, *_) in conn.settled] == ["ack"]
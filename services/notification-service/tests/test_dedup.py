@@ -0,0 +1,44 @@
+import shared.dedup as dedup
+from shared import ttl_cache
+
+
+def test_memory_store_marks_and_hits():
+    store = dedup.DedupStore(max_entries=10, ttl_seconds=60)
+    assert store.seen("m1") is False
+    store.mark("m1")
+    assert store.seen("m1") is True
+    assert (store.hits, store.misses) == (1, 1)
+
+
+def test_memory_store_is_bounded_lru():
+    store = dedup.DedupStore(max_entries=2, ttl_seconds=60)
+    store.mark("a")
+    store.mark("b")
+    assert store.seen("a") is True  # touch "a" -> "b" is now least recent
+    store.mark("c")
+
+    assert len(store) == 2
+    assert store.seen("b") is False
+    assert store.seen("a") is True
+    assert store.seen("c") is True
+
+
+def test_memory_store_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+
+    store = dedup.DedupStore(max_entries=10, ttl_seconds=30)
+    store.mark("m1")
+    now[0] += 31
+    assert store.seen("m1") is False
+    assert len(store) == 0
+
+
+def test_sql_backend_survives_a_fresh_memory_store(tmp_path):
+    url = f"sqlite+pysqlite:///{tmp_path / 'dedup.db'}"
+    dedup.DedupStore(backend=dedup.SqlDedupBackend(url)).mark("m1")
+
+    # e.g. after a consumer restart: memory is empty, the table is not
+    store = dedup.DedupStore(backend=dedup.SqlDedupBackend(url))
+    assert store.seen("m1") is True
+    assert store.seen("m2") is False
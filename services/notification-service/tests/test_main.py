@@ -1,5 +1,7 @@
 import types
 
+import pytest
+
 
 def test_health(client):
     r = client.get("/health")
@@ -77,20 +79,19 @@ def test_handler_missing_payload_fields_logged(svc, monkeypatch, caplog):
     assert any("Missing required field" in r.message for r in caplog.records)
 
 
-def test_handler_send_email_raises_is_caught(svc, monkeypatch, caplog):
+def test_handler_send_email_failure_propagates(svc, monkeypatch):
     def fake_send_email(*args, **kwargs):
         raise RuntimeError("smtp down")
 
     monkeypatch.setattr(svc, "send_email", fake_send_email)
 
-    with caplog.at_level("ERROR"):
+    # consume() turns this into a delayed retry instead of an ack
+    with pytest.raises(RuntimeError):
         svc.handler(
             "payment.succeeded",
             {"email": "b@example.com", "order_id": 1, "total": 10},
         )
 
-    assert any("Handler failed" in r.message for r in caplog.records)
-
 
 def test_startup_starts_consumer_thread_and_calls_consume(svc, monkeypatch):
     """
@@ -99,11 +100,14 @@ def test_startup_starts_consumer_thread_and_calls_consume(svc, monkeypatch):
     """
     consume_called = {}
 
-    def fake_consume(rabbitmq_url, queue_name, bindings, handler):
+    def fake_consume(rabbitmq_url, queue_name, bindings, handler, prefetch_count, workers, dedup):
         consume_called["rabbitmq_url"] = rabbitmq_url
         consume_called["queue_name"] = queue_name
         consume_called["bindings"] = bindings
         consume_called["handler"] = handler
+        consume_called["prefetch_count"] = prefetch_count
+        consume_called["workers"] = workers
+        consume_called["dedup"] = dedup
 
     monkeypatch.setattr(svc, "consume", fake_consume)
 
@@ -128,6 +132,9 @@ def test_startup_starts_consumer_thread_and_calls_consume(svc, monkeypatch):
     assert consume_called["queue_name"] == "notification-service"
     assert consume_called["bindings"] == ["user.registered", "payment.succeeded"]
     assert consume_called["handler"] == svc.handler
+    assert consume_called["prefetch_count"] == svc.CONSUMER_PREFETCH
+    assert consume_called["workers"] == svc.CONSUMER_WORKERS
+    assert isinstance(consume_called["dedup"], svc.DedupStore)
 
 
 def test_startup_consumer_crash_is_caught_and_logged(svc, monkeypatch, caplog):
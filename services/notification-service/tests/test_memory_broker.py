@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pika
+import pytest
+from pika.exceptions import ChannelClosedByBroker, UnroutableError
+
+import shared.events as events
+import shared.memory_broker as mb
+
+
+@pytest.fixture(autouse=True)
+def fresh_brokers():
+    mb.reset_brokers()
+    yield
+    mb.reset_brokers()
+
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+@pytest.mark.parametrize(
+    "pattern,key,expected",
+    [
+        ("user.registered", "user.registered", True),
+        ("user.*", "user.registered", True),
+        ("user.*", "user.registered.v2", False),
+        ("user.#", "user", True),
+        ("user.#", "user.registered.v2", True),
+        ("#", "anything.at.all", True),
+        ("*.succeeded", "payment.succeeded", True),
+        ("*.succeeded", "payment.failed", False),
+    ],
+)
+def test_topic_matching(pattern, key, expected):
+    assert mb.topic_matches(pattern, key) is expected
+
+
+def test_publish_routes_by_topic_binding():
+    conn = mb.connect("memory://t")
+    ch = conn.channel()
+    ch.exchange_declare(exchange="ex", exchange_type="topic", durable=True)
+    ch.queue_declare(queue="users", durable=True)
+    ch.queue_bind(queue="users", exchange="ex", routing_key="user.*")
+
+    ch.basic_publish(exchange="ex", routing_key="user.registered", body=b"1")
+    ch.basic_publish(exchange="ex", routing_key="order.paid", body=b"2")
+
+    assert conn.broker.message_count("users") == 1
+    with pytest.raises(UnroutableError):
+        ch.basic_publish(exchange="ex", routing_key="order.paid", body=b"3", mandatory=True)
+
+
+def test_prefetch_limits_unacked_and_close_requeues():
+    conn = mb.connect("memory://t")
+    ch = conn.channel()
+    ch.queue_declare(queue="q", durable=True)
+    for i in range(5):
+        ch.basic_publish(exchange="", routing_key="q", body=str(i).encode())
+
+    consumer = mb.connect("memory://t")
+    cch = consumer.channel()
+    cch.basic_qos(prefetch_count=2)
+    got = []
+    cch.basic_consume(queue="q", on_message_callback=lambda c, m, p, b: got.append((m, b)))
+    t = threading.Thread(target=cch.start_consuming, daemon=True)
+    t.start()
+
+    assert _wait_for(lambda: len(got) == 2)
+    time.sleep(0.05)
+    assert len(got) == 2  # nothing acked -> prefetch window stays full
+
+    consumer.close()
+    t.join(2)
+    assert conn.broker.message_count("q") == 5
+    method, _, body = ch.basic_get(queue="q", auto_ack=True)
+    assert body == b"0" and method.redelivered
+
+
+def test_nack_requeue_and_unknown_tag():
+    conn = mb.connect("memory://t")
+    ch = conn.channel()
+    ch.queue_declare(queue="q")
+    ch.basic_publish(exchange="", routing_key="q", body=b"x")
+
+    method, _, _ = ch.basic_get(queue="q")
+    ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+    method, _, body = ch.basic_get(queue="q")
+    assert body == b"x" and method.redelivered
+    ch.basic_ack(delivery_tag=method.delivery_tag)
+
+    with pytest.raises(ChannelClosedByBroker):
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+    assert not ch.is_open
+
+
+def test_restart_keeps_only_durable_queues_and_persistent_messages():
+    conn = mb.connect("memory://t")
+    broker = conn.broker
+    ch = conn.channel()
+    ch.queue_declare(queue="durable", durable=True)
+    ch.queue_declare(queue="transient", durable=False)
+    ch.basic_publish(exchange="", routing_key="durable", body=b"p", properties=pika.BasicProperties(delivery_mode=2))
+    ch.basic_publish(exchange="", routing_key="durable", body=b"t")
+
+    broker.restart()
+
+    assert not conn.is_open
+    assert set(broker.queues) == {"durable"}
+    assert broker.message_count("durable") == 1
+
+
+def test_consume_retries_through_ttl_queue_end_to_end():
+    url = "memory://e2e"
+    seen = []
+
+    def handler(event_type, payload):
+        seen.append((event_type, payload))
+        if len(seen) == 1:
+            raise RuntimeError("flaky")
+
+    t = threading.Thread(
+        target=events.consume,
+        args=(url, "svc", ["user.*"], handler),
+        kwargs={"workers": 2, "retry_base_delay_ms": 20},
+        daemon=True,
+    )
+    t.start()
+    broker = mb.get_broker("e2e")
+    assert _wait_for(lambda: "svc" in broker.queues and broker.bindings.get(events.EXCHANGE))
+
+    pub = events.Publisher(url)
+    pub.publish("user.registered", {"email": "a@example.com"})
+
+    assert _wait_for(lambda: len(seen) == 2)
+    assert seen[1] == ("user.registered", {"email": "a@example.com"})
+
+    pub.close()
+    broker.close_connections()
+    t.join(2)
+    assert broker.message_count("svc") == 0
+    assert broker.message_count(events.dead_letter_queue_name("svc")) == 0
@@ -4,11 +4,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 import httpx
 from sqlalchemy.exc import SQLAlchemyError
-from .db import Base, engine, SessionLocal, init_schema
-from .models import Order, OrderItem
+from .db import DB_SCHEMA, engine, SessionLocal
+from .migrations import MIGRATIONS
+from .models import Order, OrderItem, OutboxEvent
 from .schemas import OrderCreateIn, OrderOut, OrderItemOut
-from shared.security import require_user
-from shared.events import publish
+from shared.migrations import migrate
+from shared.security import require_user, start_key_refresh
+from shared.outbox import OutboxRelay, add_event
+from shared.revocation import start_revocation_sync, stop_revocation_sync
 
 RABBITMQ_URL = os.getenv("RABBITMQ_URL", "")
 PRODUCT_URL_INTERNAL = os.getenv("PRODUCT_URL_INTERNAL", "http://product-service:8000")  # for docker network
@@ -30,10 +33,25 @@ def get_db():
     finally:
         db.close()
 
+# Drains outbox_events to RabbitMQ (only when RABBITMQ_URL is set)
+outbox_relay: OutboxRelay | None = None
+
 @app.on_event("startup")
 def startup():
-    init_schema()
-    Base.metadata.create_all(bind=engine)
+    global outbox_relay
+    # one SELECT when already at head
+    migrate(engine, MIGRATIONS, DB_SCHEMA)
+    start_key_refresh()
+    start_revocation_sync(RABBITMQ_URL)
+    if RABBITMQ_URL:
+        outbox_relay = OutboxRelay(SessionLocal, OutboxEvent, RABBITMQ_URL)
+        outbox_relay.start()
+
+@app.on_event("shutdown")
+def shutdown():
+    stop_revocation_sync()
+    if outbox_relay is not None:
+        outbox_relay.stop()
 
 async def fetch_product_price(product_id: int) -> float:
     # Calls product-service (internal docker host). If running locally without docker, set PRODUCT_URL_INTERNAL to http://localhost:8002
@@ -140,17 +158,18 @@ def pay_order(order_id: int, claims: dict = Depends(require_user), db: Session =
     if order.status != "CREATED":
         raise HTTPException(400, f"Cannot pay in status {order.status}")
 
-    # Simulated payment success
+    # Simulated payment success; the event commits atomically with the status change
     order.status = "PAID"
-    db.commit()
-    db.refresh(order)
-
     if RABBITMQ_URL:
-        publish(
-            RABBITMQ_URL,
+        add_event(
+            db,
+            OutboxEvent,
             "payment.succeeded",
             {"email": order.user_email, "order_id": order.id, "total": float(order.total)},
         )
+    db.commit()
+    if outbox_relay is not None:
+        outbox_relay.wake()
 
     return {"ok": True, "status": "PAID"}
 
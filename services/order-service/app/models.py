@@ -1,6 +1,7 @@
 from sqlalchemy import String, Boolean, Numeric, ForeignKey, Integer
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .db import Base
+from shared.outbox import OutboxMixin
 
 class Order(Base):
     __tablename__ = "orders"
@@ -20,3 +21,7 @@ class OrderItem(Base):
     unit_price: Mapped[float] = mapped_column(Numeric(10, 2), default=0)
 
     order: Mapped[Order] = relationship(back_populates="items")
+
+
+class OutboxEvent(OutboxMixin, Base):
+    __tablename__ = "outbox_events"
@@ -0,0 +1,66 @@
+import base64
+import json
+import time
+
+import pytest
+from jose import jwt
+
+from shared import fastjwt
+
+SECRET = "test-secret"
+
+
+def _claims(**extra):
+    now = int(time.time())
+    return {"sub": "7", "email": "a@example.com", "iat": now, "exp": now + 60, "typ": "access", **extra}
+
+
+def _b64(obj):
+    return base64.urlsafe_b64encode(json.dumps(obj).encode()).rstrip(b"=").decode()
+
+
+def test_interoperates_with_jose():
+    claims = _claims()
+    token = fastjwt.encode(claims, SECRET)
+    assert token == jwt.encode(claims, SECRET, algorithm="HS256")
+    assert jwt.decode(token, SECRET, algorithms=["HS256"]) == claims
+    assert fastjwt.decode(jwt.encode(claims, SECRET, algorithm="HS256"), SECRET, typ="access") == claims
+
+
+def test_rejects_bad_signature_and_wrong_secret():
+    token = fastjwt.encode(_claims(), SECRET)
+    head, payload, sig = token.split(".")
+    forged = ".".join([head, _b64(_claims(sub="1")), sig])
+    for bad in (forged, token[:-2] + ("AA" if token[-2:] != "AA" else "BA")):
+        with pytest.raises(fastjwt.InvalidToken):
+            fastjwt.decode(bad, SECRET)
+    with pytest.raises(fastjwt.InvalidToken):
+        fastjwt.decode(token, "other-secret")
+
+
+@pytest.mark.parametrize(
+    "header",
+    [{"alg": "none", "typ": "JWT"}, {"alg": "HS512", "typ": "JWT"}, {"alg": "HS256", "kid": "x"}, {"alg": "HS256", "typ": "JWE"}],
+)
+def test_rejects_unexpected_headers(header):
+    token = jwt.encode(_claims(), SECRET, algorithm="HS256")
+    _, payload, sig = token.split(".")
+    with pytest.raises(fastjwt.InvalidToken):
+        fastjwt.decode(".".join([_b64(header), payload, sig]), SECRET)
+
+
+def test_enforces_exp_and_typ():
+    expired = fastjwt.encode(_claims(exp=int(time.time()) - 1), SECRET)
+    with pytest.raises(fastjwt.ExpiredToken):
+        fastjwt.decode(expired, SECRET)
+
+    verify = fastjwt.encode(_claims(typ="verify"), SECRET)
+    assert fastjwt.decode(verify, SECRET, typ="verify")["typ"] == "verify"
+    with pytest.raises(fastjwt.InvalidToken):
+        fastjwt.decode(verify, SECRET, typ="access")
+
+
+@pytest.mark.parametrize("token", ["", "a.b", "a.b.c.d", "ünicode.x.y", "e30.e30.@@@"])
+def test_rejects_malformed(token):
+    with pytest.raises(fastjwt.InvalidToken):
+        fastjwt.decode(token, SECRET)
@@ -0,0 +1,142 @@
+import time
+
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from jose import jwt
+
+from shared import fastjwt, jwks
+
+
+def _claims(**extra):
+    return {"sub": "1", "exp": int(time.time()) + 60, "typ": "access", **extra}
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {
+        "ed-1": ed25519.Ed25519PrivateKey.generate(),
+        "ed-2": ed25519.Ed25519PrivateKey.generate(),
+        "rsa-1": rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    }
+
+
+def _jwks_doc(keys, *kids):
+    return {"keys": [jwks.public_jwk(keys[k].public_key(), k) for k in kids]}
+
+
+def test_sign_and_verify_roundtrip_through_jwk(keys):
+    doc = _jwks_doc(keys, "ed-1", "rsa-1")
+    keyset = jwks.KeySet({j["kid"]: jwks.key_from_jwk(j) for j in doc["keys"]})
+
+    for kid in ("ed-1", "rsa-1"):
+        token = jwks.sign(_claims(), keys[kid], kid)
+        assert jwks.verify(token, keyset, typ="access")["sub"] == "1"
+
+    # RS256 tokens are standard: jose verifies them from the same JWK
+    rs = jwks.sign(_claims(), keys["rsa-1"], "rsa-1")
+    assert jwt.decode(rs, doc["keys"][1], algorithms=["RS256"])["sub"] == "1"
+
+
+def test_verify_rejects_unknown_kid_wrong_key_and_alg_confusion(keys):
+    keyset = jwks.KeySet({"ed-1": keys["ed-1"].public_key()})
+
+    with pytest.raises(fastjwt.InvalidToken):
+        jwks.verify(jwks.sign(_claims(), keys["ed-2"], "ed-2"), keyset)
+    with pytest.raises(fastjwt.InvalidToken):
+        # right kid, wrong private key
+        jwks.verify(jwks.sign(_claims(), keys["ed-2"], "ed-1"), keyset)
+    with pytest.raises(fastjwt.InvalidToken):
+        # token claims RS256 for an Ed25519 kid
+        jwks.verify(jwks.sign(_claims(), keys["rsa-1"], "ed-1"), keyset)
+    with pytest.raises(fastjwt.InvalidToken):
+        hs = jwt.encode(_claims(), "secret", algorithm="HS256", headers={"kid": "ed-1"})
+        jwks.verify(hs, keyset)
+    with pytest.raises(fastjwt.ExpiredToken):
+        jwks.verify(jwks.sign(_claims(exp=int(time.time()) - 5), keys["ed-1"], "ed-1"), keyset)
+
+
+def test_client_rotation_and_failed_refresh_keeps_keys(keys, monkeypatch):
+    docs = [_jwks_doc(keys, "ed-1")]
+    monkeypatch.setattr(jwks, "fetch_jwks", lambda url, timeout=None: docs[-1])
+
+    client = jwks.JwksClient("http://auth/.well-known/jwks.json", min_refresh_interval=0)
+    assert client.refresh()
+    assert client.kids() == ["ed-1"]
+
+    # next key is published before auth-service starts signing with it
+    docs.append(_jwks_doc(keys, "ed-1", "ed-2"))
+    client.refresh()
+    assert jwks.verify(jwks.sign(_claims(), keys["ed-2"], "ed-2"), client)["sub"] == "1"
+
+    def down(url, timeout=None):
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(jwks, "fetch_jwks", down)
+    assert client.refresh() is False
+    assert client.kids() == ["ed-1", "ed-2"]
+
+
+def test_unknown_kid_wakes_refresh_without_blocking(keys, monkeypatch):
+    fetched = []
+    monkeypatch.setattr(jwks, "fetch_jwks", lambda url, timeout=None: fetched.append(1) or _jwks_doc(keys, "ed-1", "ed-2"))
+
+    client = jwks.JwksClient("http://auth/jwks", refresh_interval=3600, min_refresh_interval=0)
+    client.start(initial_fetch=False)
+    try:
+        deadline = time.monotonic() + 5
+        while not client.kids() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert client.kids() == ["ed-1", "ed-2"]
+
+        n = len(fetched)
+        with pytest.raises(fastjwt.InvalidToken):
+            jwks.verify(jwks.sign(_claims(), keys["ed-1"], "ed-9"), client)
+        deadline = time.monotonic() + 5
+        while len(fetched) == n and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(fetched) == n + 1
+    finally:
+        client.stop()
+
+
+@pytest.mark.parametrize("doc", [None, [], "keys", {"keys": None}])
+def test_refresh_rejects_documents_that_are_not_key_sets(keys, monkeypatch, doc):
+    monkeypatch.setattr(jwks, "fetch_jwks", lambda url, timeout=None: _jwks_doc(keys, "ed-1"))
+    client = jwks.JwksClient("http://auth/jwks", min_refresh_interval=0)
+    assert client.refresh()
+
+    monkeypatch.setattr(jwks, "fetch_jwks", lambda url, timeout=None: doc)
+    assert client.refresh() is False
+    assert client.kids() == ["ed-1"]
+
+
+def test_refresh_skips_entries_that_are_not_objects(keys, monkeypatch):
+    doc = _jwks_doc(keys, "ed-1")
+    doc["keys"] += [None, "ed-2", 3]
+    monkeypatch.setattr(jwks, "fetch_jwks", lambda url, timeout=None: doc)
+    client = jwks.JwksClient("http://auth/jwks", min_refresh_interval=0)
+    assert client.refresh()
+    assert client.kids() == ["ed-1"]
+
+
+def test_refresh_thread_survives_a_failing_refresh(keys, monkeypatch):
+    calls = []
+
+    def flaky(self):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        self.replace({"ed-1": keys["ed-1"].public_key()})
+        return True
+
+    monkeypatch.setattr(jwks.JwksClient, "refresh", flaky)
+    client = jwks.JwksClient("http://auth/jwks", refresh_interval=0.01, min_refresh_interval=0)
+    client.start(initial_fetch=False)
+    try:
+        deadline = time.monotonic() + 5
+        while not client.kids() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert client.kids() == ["ed-1"]
+        assert client._thread.is_alive()
+    finally:
+        client.stop()
@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, event, inspect, text
+
+from shared.migrations import Migration, create_tables, current_version, migrate
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}", future=True)
+    yield engine
+    engine.dispose()
+
+
+def _metadata():
+    metadata = MetaData()
+    Table("widgets", metadata, Column("id", Integer, primary_key=True), Column("name", String(50)))
+    Table("gadgets", metadata, Column("id", Integer, primary_key=True))
+    return metadata
+
+
+def test_migrate_applies_pending_steps_once(engine):
+    metadata = _metadata()
+    steps = [
+        Migration(1, "baseline", create_tables(metadata, ["widgets"])),
+        Migration(2, "gadgets", create_tables(metadata, ["gadgets"])),
+        Migration(3, "widgets_name_index", "CREATE INDEX IF NOT EXISTS ix_widgets_name ON widgets (name)"),
+    ]
+    assert current_version(engine) == 0
+
+    assert migrate(engine, steps[:2]) == 2
+    assert current_version(engine) == 2
+    assert migrate(engine, steps) == 1
+    assert current_version(engine) == 3
+
+    insp = inspect(engine)
+    assert {"widgets", "gadgets", "schema_migrations"} <= set(insp.get_table_names())
+    assert [ix["name"] for ix in insp.get_indexes("widgets")] == ["ix_widgets_name"]
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT version, name FROM schema_migrations ORDER BY version")).all()
+    assert rows == [(1, "baseline"), (2, "gadgets"), (3, "widgets_name_index")]
+
+
+def test_migrate_at_head_is_a_single_query(engine):
+    steps = [Migration(1, "baseline", create_tables(_metadata(), ["widgets", "gadgets"]))]
+    migrate(engine, steps)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cur, stmt, *a: statements.append(stmt))
+    assert migrate(engine, steps) == 0
+    assert statements == ["SELECT max(version) FROM schema_migrations"]
+
+
+def test_baseline_leaves_existing_tables_alone(engine):
+    metadata = _metadata()
+    # a database created by create_all before migrations existed
+    metadata.create_all(engine, tables=[metadata.tables["widgets"]])
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO widgets (name) VALUES ('kept')"))
+
+    assert migrate(engine, [Migration(1, "baseline", create_tables(metadata, ["widgets", "gadgets"]))]) == 1
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT name FROM widgets")).scalar() == "kept"
+
+
+def test_migrate_rejects_unordered_versions(engine):
+    with pytest.raises(ValueError):
+        migrate(engine, [Migration(2, "b", "SELECT 1"), Migration(1, "a", "SELECT 1")])
+    with pytest.raises(ValueError):
+        migrate(engine, [Migration(1, "a", "SELECT 1"), Migration(1, "again", "SELECT 1")])
@@ -0,0 +1,84 @@
+import pytest
+
+import shared.outbox as outbox
+
+
+class FakePublisher:
+    def __init__(self, fail_on=None):
+        self.sent = []
+        self.message_ids = []
+        self.fail_on = fail_on
+
+    def publish(self, event_type, payload, message_id=None):
+        if payload.get("order_id") == self.fail_on:
+            raise RuntimeError("broker down")
+        self.sent.append((event_type, payload))
+        self.message_ids.append(message_id)
+
+
+@pytest.fixture()
+def relay_env(app_and_db, monkeypatch):
+    main, _, TestingSessionLocal = app_and_db
+    from order_service.models import OutboxEvent
+
+    with TestingSessionLocal() as db:
+        db.query(OutboxEvent).delete()
+        db.commit()
+
+    def make(fail_on=None, batch_size=100):
+        pub = FakePublisher(fail_on)
+        monkeypatch.setattr(outbox, "get_publisher", lambda url: pub)
+        relay = outbox.OutboxRelay(TestingSessionLocal, OutboxEvent, "amqp://x/", batch_size=batch_size)
+        return relay, pub
+
+    return make, TestingSessionLocal, OutboxEvent
+
+
+def _stage(TestingSessionLocal, OutboxEvent, n):
+    with TestingSessionLocal() as db:
+        for i in range(1, n + 1):
+            outbox.add_event(db, OutboxEvent, "payment.succeeded", {"order_id": i})
+        db.commit()
+
+
+def test_drain_publishes_in_order_and_deletes_rows(relay_env):
+    make, TestingSessionLocal, OutboxEvent = relay_env
+    _stage(TestingSessionLocal, OutboxEvent, 5)
+
+    relay, pub = make(batch_size=3)
+    assert relay.drain_once() == 3
+    assert relay.drain_once() == 2
+    assert relay.drain_once() == 0
+
+    assert [p["order_id"] for (_, p) in pub.sent] == [1, 2, 3, 4, 5]
+    assert len(set(pub.message_ids)) == 5 and None not in pub.message_ids
+    with TestingSessionLocal() as db:
+        assert db.query(OutboxEvent).count() == 0
+
+
+def test_drain_keeps_failed_and_later_rows(relay_env):
+    make, TestingSessionLocal, OutboxEvent = relay_env
+    _stage(TestingSessionLocal, OutboxEvent, 4)
+
+    relay, pub = make(fail_on=3)
+    assert relay.drain_once() == 2
+
+    with TestingSessionLocal() as db:
+        left = [e.payload["order_id"] for e in db.query(OutboxEvent).order_by(OutboxEvent.id)]
+    assert left == [3, 4]
+
+    relay, pub = make()
+    assert relay.drain_once() == 2
+    assert [p["order_id"] for (_, p) in pub.sent] == [3, 4]
+
+
+def test_rolled_back_transaction_leaves_no_event(relay_env):
+    make, TestingSessionLocal, OutboxEvent = relay_env
+
+    with TestingSessionLocal() as db:
+        outbox.add_event(db, OutboxEvent, "payment.succeeded", {"order_id": 1})
+        db.rollback()
+
+    relay, pub = make()
+    assert relay.drain_once() == 0
+    assert pub.sent == []
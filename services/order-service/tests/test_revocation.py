@@ -0,0 +1,110 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+import shared.events as events
+import shared.memory_broker as mb
+import shared.revocation as revocation
+import shared.security as security
+from shared.revocation import TOKEN_REVOKED, BloomFilter, RevocationList, RevocationListener
+
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if cond():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_revocation_list_prunes_expired_entries(monkeypatch):
+    rl = RevocationList(capacity=4)
+    now = time.time()
+    rl.revoke("old", now + 10)
+    rl.revoke("new", now + 1000)
+    rl.revoke("dead-on-arrival", now - 1)
+    assert rl.is_revoked("old") and rl.is_revoked("new")
+    assert not rl.is_revoked("dead-on-arrival") and not rl.is_revoked(None)
+
+    monkeypatch.setattr("shared.revocation.time.time", lambda: now + 100)
+    assert rl.prune() == 1
+    assert len(rl) == 1
+    assert not rl.is_revoked("old") and rl.is_revoked("new")
+
+
+def test_revocation_list_grows_past_initial_capacity():
+    rl = RevocationList(capacity=2)
+    exp = time.time() + 60
+    for i in range(50):
+        rl.revoke(f"j{i}", exp)
+    assert all(rl.is_revoked(f"j{i}") for i in range(50))
+
+
+def test_require_user_rejects_revoked_token_even_when_cached(monkeypatch):
+    rl = RevocationList()
+    monkeypatch.setattr(security, "revocations", rl)
+    security.token_cache.clear()
+    exp = int(time.time()) + 60
+    token = jwt.encode({"sub": "1", "exp": exp, "typ": "access", "jti": "abc"}, security.JWT_SECRET, algorithm="HS256")
+
+    assert security.require_user(f"Bearer {token}")["jti"] == "abc"
+    rl.revoke("abc", exp)
+    with pytest.raises(HTTPException) as e:
+        security.require_user(f"Bearer {token}")
+    assert e.value.status_code == 401
+    security.token_cache.clear()
+
+
+def test_listener_catches_up_then_follows_events():
+    mb.reset_brokers()
+    url = "memory://revocations"
+    rl = RevocationList()
+    exp = time.time() + 60
+    listener = RevocationListener(url, rl, bootstrap=lambda: [{"jti": "from-bootstrap", "exp": exp}], retry_interval=0.05)
+    listener.start()
+    try:
+        assert _wait_for(lambda: rl.is_revoked("from-bootstrap"))
+
+        pub = events.Publisher(url)
+        pub.publish(TOKEN_REVOKED, {"jti": "from-event", "exp": exp})
+        assert _wait_for(lambda: rl.is_revoked("from-event"))
+        pub.close()
+    finally:
+        listener.stop()
+        mb.reset_brokers()
+
+
+def test_fetch_revocations_presents_the_internal_token(monkeypatch):
+    seen = {}
+
+    class Resp:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def read(self):
+            return b'[{"jti": "j1", "exp": 1}]'
+
+    def fake_urlopen(req, timeout):
+        seen["url"] = req.full_url
+        seen["auth"] = req.get_header("Authorization")
+        return Resp()
+
+    monkeypatch.setattr(revocation.urllib.request, "urlopen", fake_urlopen)
+    items = revocation.fetch_revocations("http://auth:8000/auth/revocations", token="s3cret")
+    assert items == [{"jti": "j1", "exp": 1}]
+    assert seen == {"url": "http://auth:8000/auth/revocations", "auth": "Bearer s3cret"}
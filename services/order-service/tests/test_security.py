@@ -0,0 +1,96 @@
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+import shared.security as security
+from shared import fastjwt
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    security.token_cache.clear()
+    yield
+    security.token_cache.clear()
+
+
+def _token(**claims):
+    claims = {"sub": "1", "exp": int(time.time()) + 3600, "typ": "access", **claims}
+    return jwt.encode(claims, security.JWT_SECRET, algorithm=security.ALGO)
+
+
+def test_require_user_decodes_once_per_token(monkeypatch):
+    calls = []
+    real_decode = security.fastjwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(1)
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(security.fastjwt, "decode", counting_decode)
+    token = _token(email="a@example.com")
+
+    first = security.require_user(f"Bearer {token}")
+    first["is_admin"] = True  # must not leak into the cache
+    second = security.require_user(f"Bearer {token}")
+
+    assert len(calls) == 1
+    assert second["email"] == "a@example.com" and second["raw_token"] == token
+    assert "is_admin" not in second
+    assert security.token_cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+
+def test_cached_entry_expires_at_token_exp(monkeypatch):
+    token = _token(exp=int(time.time()) + 60)
+    security.require_user(f"Bearer {token}")
+    security.require_user(f"Bearer {token}")
+    assert security.token_cache.hits == 1
+
+    later = time.time() + 61
+    monkeypatch.setattr(security.time, "time", lambda: later)
+    # past exp -> the cache no longer vouches for it, the token is verified again
+    assert security.token_cache.get(security.TokenCache.key(token)) is None
+    assert len(security.token_cache) == 0
+
+
+def test_invalid_tokens_are_not_cached():
+    bad = jwt.encode({"sub": "1", "typ": "access"}, "other-secret", algorithm=security.ALGO)
+    for token in (bad, bad, _token(typ="verify")):
+        with pytest.raises(HTTPException):
+            security.require_user(f"Bearer {token}")
+    assert len(security.token_cache) == 0
+
+
+def test_cache_is_bounded_lru():
+    cache = security.TokenCache(max_entries=2)
+    exp = time.time() + 60
+    for name in ("a", "b"):
+        cache.put(cache.key(name), {"sub": name, "exp": exp})
+    cache.get(cache.key("a"))
+    cache.put(cache.key("c"), {"sub": "c", "exp": exp})
+
+    assert cache.get(cache.key("b")) is None
+    assert cache.get(cache.key("a"))["sub"] == "a"
+
+
+def test_hs256_is_chosen_from_the_parsed_header_not_its_bytes():
+    # same claims, same secret, header keys in another order
+    header = fastjwt.b64url_encode(json.dumps({"typ": "JWT", "alg": "HS256"}).encode())
+    payload = fastjwt.b64url_encode(json.dumps({"sub": "1", "exp": int(time.time()) + 60, "typ": "access"}).encode())
+    signing_input = header + b"." + payload
+    sig = hmac.new(security.JWT_SECRET.encode(), signing_input, hashlib.sha256).digest()
+    token = (signing_input + b"." + fastjwt.b64url_encode(sig)).decode()
+
+    assert security.token_algorithm(token) == "HS256"
+    assert security.decode_access_token(token)["sub"] == "1"
+
+
+@pytest.mark.parametrize("token", ["", "not-a-jwt", "e30.e30.", "!!.e30.e30"])
+def test_unparseable_headers_are_rejected(token):
+    assert security.token_algorithm(token) is None
+    with pytest.raises(fastjwt.InvalidToken):
+        security.decode_access_token(token)
@@ -0,0 +1,55 @@
+import pytest
+
+from shared import ttl_cache
+from shared.ttl_cache import TTLCache, body_etag, etag_matches, json_etag
+
+
+def test_store_across_an_invalidation_is_dropped():
+    cache = TTLCache(max_entries=10, ttl=60)
+    generation = cache.generation()
+    cache.invalidate("k")  # a write landed while the value was being loaded
+    assert cache.store("k", "stale", generation) is False
+    assert cache.get("k") is None
+
+    assert cache.store("k", "fresh", cache.generation()) is True
+    assert cache.get("k") == "fresh"
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+
+def test_entries_expire_after_ttl_or_at_their_deadline(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache(max_entries=10, ttl=30)
+    cache.store("ttl", 1)
+    cache.store("deadline", 2, expires=now[0] + 5)
+
+    now[0] += 6
+    assert cache.get("deadline") is None and cache.get("ttl") == 1
+    now[0] += 30
+    assert cache.get("ttl") is None
+    assert len(cache) == 0
+
+
+def test_bounded_lru_and_disabled_cache():
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.store("a", 1)
+    cache.store("b", 2)
+    cache.get("a")
+    cache.store("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+
+    for disabled in (TTLCache(max_entries=0, ttl=60), TTLCache(max_entries=10, ttl=0)):
+        assert disabled.store("a", 1) is False
+        assert len(disabled) == 0
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [(None, False), ("", False), ("*", True), ('"other", "tag"', True), ('W/"tag"', True), ('"other"', False)],
+)
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"tag"') is expected
+
+
+def test_json_etag_ignores_key_order():
+    assert json_etag({"a": 1, "b": 2}) == json_etag({"b": 2, "a": 1}) == body_etag(b'{"a":1,"b":2}')
@@ -1,7 +1,9 @@
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from shared.migrations import use_schema
+
 # In prod: set DATABASE_URL to Postgres.
 # In tests: if DATABASE_URL isn't set, use sqlite memory.
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+pysqlite:///:memory:")
@@ -13,6 +15,9 @@ engine = create_engine(
     pool_pre_ping=True,
 )
 
+# Postgres: each service's tables live in its own schema (DB_SCHEMA)
+use_schema(engine, DB_SCHEMA)
+
 SessionLocal = sessionmaker(
     bind=engine,
     autoflush=False,
@@ -21,32 +26,3 @@ SessionLocal = sessionmaker(
 )
 
 Base = declarative_base()
-
-
-def _is_sqlite() -> bool:
-    return engine.dialect.name == "sqlite"
-
-
-def init_schema() -> None:
-    """
-    Postgres: create schema + set search_path (each service owns its schema).
-    SQLite: no schemas/search_path -> no-op (unit tests).
-    """
-    if _is_sqlite():
-        return
-
-    with engine.begin() as conn:
-        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {DB_SCHEMA}"))
-        conn.execute(text(f"SET search_path TO {DB_SCHEMA}"))
-
-
-def set_search_path() -> None:
-    """
-    Useful if you want to call it per-connection in some flows.
-    SQLite: no-op.
-    """
-    if _is_sqlite():
-        return
-
-    with engine.begin() as conn:
-        conn.execute(text(f"SET search_path TO {DB_SCHEMA}"))
\ No newline at end of file
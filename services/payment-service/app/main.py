@@ -6,11 +6,14 @@ from sqlalchemy.exc import SQLAlchemyError
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List
 
-from .db import Base, engine, SessionLocal, init_schema
-from .models import Payment
+from .db import DB_SCHEMA, engine, SessionLocal
+from .migrations import MIGRATIONS
+from .models import Payment, OutboxEvent
 from .schemas import PaymentCreateOut, PaymentOut, PaymentCreateIn
-from shared.security import require_user
-from shared.events import publish
+from shared.migrations import migrate
+from shared.security import require_user, start_key_refresh
+from shared.outbox import OutboxRelay, add_event
+from shared.revocation import start_revocation_sync, stop_revocation_sync
 
 
 RABBITMQ_URL = os.getenv("RABBITMQ_URL", "")
@@ -41,10 +44,27 @@ def get_db():
 # -------------------------
 # Startup
 # -------------------------
+# Drains outbox_events to RabbitMQ (only when RABBITMQ_URL is set)
+outbox_relay: OutboxRelay | None = None
+
+
 @app.on_event("startup")
 def startup():
-    init_schema()
-    Base.metadata.create_all(bind=engine)
+    global outbox_relay
+    # one SELECT when already at head
+    migrate(engine, MIGRATIONS, DB_SCHEMA)
+    start_key_refresh()
+    start_revocation_sync(RABBITMQ_URL)
+    if RABBITMQ_URL:
+        outbox_relay = OutboxRelay(SessionLocal, OutboxEvent, RABBITMQ_URL)
+        outbox_relay.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    stop_revocation_sync()
+    if outbox_relay is not None:
+        outbox_relay.stop()
 
 
 # -------------------------
@@ -150,7 +170,7 @@ async def pay(
             400, f"Cannot pay order in status {order.get('status')}"
         )
 
-    # Create payment
+    # Create payment (+ outbox event in the same transaction)
     try:
         payment = Payment(
             order_id=order_id,
@@ -159,6 +179,19 @@ async def pay(
             status="SUCCESS",
         )
         db.add(payment)
+        if RABBITMQ_URL:
+            add_event(
+                db,
+                OutboxEvent,
+                "payment.succeeded",
+                {
+                    "order_id": order_id,
+                    "user_id": user_id,
+                    "amount": order["total"],
+                    "shipping_address": payload.shipping_address,
+                    "phone_number": payload.phone_number,
+                },
+            )
         db.commit()
         db.refresh(payment)
 
@@ -166,19 +199,8 @@ async def pay(
         db.rollback()
         raise HTTPException(500, "Failed to create payment")
 
-    # Publish event
-    if RABBITMQ_URL:
-        publish(
-            RABBITMQ_URL,
-            "payment.succeeded",
-            {
-                "order_id": order_id,
-                "user_id": user_id,
-                "amount": order["total"],
-                "shipping_address": payload.shipping_address,
-                "phone_number": payload.phone_number,
-            },
-        )
+    if outbox_relay is not None:
+        outbox_relay.wake()
 
     # Best-effort mark order as paid
     await mark_order_paid_if_supported(order_id, token)
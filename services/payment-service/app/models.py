@@ -1,6 +1,7 @@
 from sqlalchemy import String, Float, Integer
 from sqlalchemy.orm import Mapped, mapped_column
 from .db import Base
+from shared.outbox import OutboxMixin
 
 class Payment(Base):
     __tablename__ = "payments"
@@ -9,4 +10,8 @@ class Payment(Base):
     order_id: Mapped[int] = mapped_column(index=True)
     user_id: Mapped[int] = mapped_column(index=True)
     amount: Mapped[float] = mapped_column(Float)
-    status: Mapped[str] = mapped_column(String(50))  # PENDING | SUCCESS | FAILED
\ No newline at end of file
+    status: Mapped[str] = mapped_column(String(50))  # PENDING | SUCCESS | FAILED
+
+
+class OutboxEvent(OutboxMixin, Base):
+    __tablename__ = "outbox_events"
@@ -1,7 +1,9 @@
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
+from shared.migrations import use_schema
+
 # In production: set DATABASE_URL to Postgres.
 # In tests: fallback to sqlite in-memory.
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+pysqlite:///:memory:")
@@ -13,6 +15,9 @@ engine = create_engine(
     future=True,
 )
 
+# Postgres: each service's tables live in its own schema (DB_SCHEMA)
+use_schema(engine, DB_SCHEMA)
+
 SessionLocal = sessionmaker(
     bind=engine,
     autoflush=False,
@@ -22,36 +27,3 @@ SessionLocal = sessionmaker(
 
 class Base(DeclarativeBase):
     pass
-
-
-def _is_sqlite() -> bool:
-    return engine.dialect.name == "sqlite"
-
-
-def init_schema() -> None:
-    """
-    Postgres:
-        - Create schema if not exists
-        - Set search_path so tables live inside service schema
-
-    SQLite:
-        - No schema support -> no-op
-    """
-    if _is_sqlite():
-        return
-
-    with engine.begin() as conn:
-        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {DB_SCHEMA}"))
-        conn.execute(text(f"SET search_path TO {DB_SCHEMA}"))
-
-
-def set_search_path() -> None:
-    """
-    Optional helper if you ever need to reset search_path.
-    SQLite: no-op.
-    """
-    if _is_sqlite():
-        return
-
-    with engine.begin() as conn:
-        conn.execute(text(f"SET search_path TO {DB_SCHEMA}"))
\ No newline at end of file
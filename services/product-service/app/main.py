@@ -2,23 +2,36 @@ from pathlib import Path
 import uuid
 import os
 import logging
+from typing import Callable
+from urllib.parse import urlencode
 
 import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 
-from .db import Base, engine, SessionLocal, init_schema
+from .db import DB_SCHEMA, engine, SessionLocal
+from .migrations import MIGRATIONS
 from .models import Product
+from .pagination import decode_cursor, decode_search_cursor, encode_cursor, encode_search_cursor, parse_fields
+from .response_cache import ResponseCache
 from .schemas import ProductOut, ProductCreate, ProductUpdate
-from shared.security import require_user, require_admin
+from .search import search
+from shared.migrations import migrate
+from shared.security import require_user, require_admin, start_key_refresh
+from shared.ttl_cache import etag_matches
+from shared.revocation import start_revocation_sync, stop_revocation_sync
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("product-service")
 
+# Only used to hear about revoked tokens (token.revoked events)
+RABBITMQ_URL = os.getenv("RABBITMQ_URL", "")
+
 # =========================
 # Storage config
 # =========================
@@ -47,6 +60,13 @@ if STORAGE_BACKEND == "s3":
         raise RuntimeError("Missing required env var: S3_BUCKET (when STORAGE_BACKEND=s3)")
     s3 = boto3.client("s3", region_name=AWS_REGION)
 
+# Listings are pages of this many products (keyset on id, newest first)
+PRODUCTS_PAGE_SIZE = int(os.getenv("PRODUCTS_PAGE_SIZE", "50"))
+PRODUCTS_MAX_PAGE_SIZE = int(os.getenv("PRODUCTS_MAX_PAGE_SIZE", "200"))
+
+# /products and /products/{id} bodies, until the next admin write
+catalog_cache = ResponseCache()
+
 ALLOWED_EXT = {".png", ".jpg", ".jpeg", ".webp"}
 ALLOWED_MIME = {"image/png", "image/jpeg", "image/webp"}
 
@@ -68,6 +88,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "ETag"],
 )
 
 
@@ -81,14 +102,21 @@ def get_db():
 
 @app.on_event("startup")
 def startup():
-    init_schema()
-    Base.metadata.create_all(bind=engine)
+    # one SELECT when already at head
+    migrate(engine, MIGRATIONS, DB_SCHEMA)
+    start_key_refresh()
+    start_revocation_sync(RABBITMQ_URL)
     if STORAGE_BACKEND == "local":
         logger.info("Storage backend=local; UPLOAD_DIR=%s; serving at /static/*", str(UPLOAD_DIR))
     else:
         logger.info("Storage backend=s3; bucket=%s region=%s public_base=%s", S3_BUCKET, AWS_REGION, PUBLIC_BASE_URL or "(none)")
 
 
+@app.on_event("shutdown")
+def shutdown():
+    stop_revocation_sync()
+
+
 # -------------------------
 # Helpers
 # -------------------------
@@ -138,31 +166,154 @@ def to_out(p: Product) -> ProductOut:
     )
 
 
+def to_fields(p: Product, fields: tuple[str, ...]) -> dict:
+    """Sparse to_out(): only the requested (and loaded) columns."""
+    out = {}
+    for f in fields:
+        value = getattr(p, f)
+        if f == "price":
+            value = float(value)
+        elif f == "image_url":
+            value = normalize_image_url(value)
+        out[f] = value
+    return out
+
+
+def list_page(
+    request: Request,
+    db: Session,
+    published_only: bool,
+    limit: int | None,
+    cursor: str | None,
+    fields: str | None,
+) -> JSONResponse:
+    """
+    One page, newest first: WHERE id < cursor ORDER BY id DESC LIMIT n+1,
+    an index range scan on (published, id) / the primary key. The body stays
+    a plain list; the next page's cursor is in X-Next-Cursor (and Link),
+    absent on the last page.
+    """
+    wanted = parse_fields(fields)
+    limit = min(limit or PRODUCTS_PAGE_SIZE, PRODUCTS_MAX_PAGE_SIZE)
+
+    q = db.query(Product)
+    if published_only:
+        q = q.filter(Product.published == True)
+    if cursor:
+        q = q.filter(Product.id < decode_cursor(cursor))
+    if wanted is not None:
+        q = q.options(load_only(Product.id, *[getattr(Product, f) for f in wanted]))
+    rows = q.order_by(Product.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+
+    if wanted is None:
+        items = [to_out(r).model_dump() for r in rows]
+    else:
+        items = [to_fields(r, wanted) for r in rows]
+    return JSONResponse(items, headers=page_headers(request, next_cursor))
+
+
+def page_headers(request: Request, next_cursor: str | None) -> dict:
+    if next_cursor is None:
+        return {}
+    return {
+        "X-Next-Cursor": next_cursor,
+        "Link": f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"',
+    }
+
+
+CACHED_HEADERS = ("X-Next-Cursor", "Link")
+
+
+def serve_cached(request: Request, render: Callable[[], Response]) -> Response:
+    """
+    Public catalog reads: the rendered bytes and a strong ETag per URL are
+    kept until the next admin write, so repeat hits skip the database and
+    serialization, and a matching If-None-Match gets an empty 304.
+    Errors raised by render() (400/404) are not cached.
+    """
+    query = urlencode(sorted(request.query_params.multi_items()))
+    key = str(request.url.replace(query=query))
+    cached = catalog_cache.get(key)
+    if cached is None:
+        version = catalog_cache.version()
+        response = render()
+        headers = {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers}
+        cached = catalog_cache.put(key, response.body, headers, version)
+
+    # shared by everyone; caches may keep it but must revalidate (cheap 304)
+    headers = {"ETag": cached.etag, "Cache-Control": "public, no-cache", **cached.headers}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type="application/json", headers=headers)
+
+
 # -------------------------
 # Public endpoints
 # -------------------------
 @app.get("/products", response_model=list[ProductOut])
-def list_published(db: Session = Depends(get_db)):
-    rows = db.query(Product).filter(Product.published == True).order_by(Product.id.desc()).all()
-    return [to_out(r) for r in rows]
+def list_published(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=PRODUCTS_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = Query(None, description="comma-separated subset of ProductOut fields"),
+    db: Session = Depends(get_db),
+):
+    return serve_cached(request, lambda: list_page(request, db, True, limit, cursor, fields))
+
+
+@app.get("/products/search", response_model=list[ProductOut])
+def search_products(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int | None = Query(None, ge=1, le=PRODUCTS_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+):
+    """Published products matching every word of q, best match first (see search.py)."""
+
+    def render() -> Response:
+        n = min(limit or PRODUCTS_PAGE_SIZE, PRODUCTS_MAX_PAGE_SIZE)
+        hits = search(db, q, n + 1, decode_search_cursor(cursor) if cursor else None)
+        next_cursor = None
+        if len(hits) > n:
+            hits = hits[:n]
+            last, score = hits[-1]
+            next_cursor = encode_search_cursor(score, last.id)
+        return JSONResponse([to_out(p).model_dump() for p, _ in hits], headers=page_headers(request, next_cursor))
+
+    return serve_cached(request, render)
 
 
 @app.get("/products/{product_id}", response_model=ProductOut)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    r = db.query(Product).filter(Product.id == product_id, Product.published == True).first()
-    if not r:
-        raise HTTPException(404, "Not found")
-    return to_out(r)
+def get_product(product_id: int, request: Request, db: Session = Depends(get_db)):
+    def render() -> Response:
+        r = db.query(Product).filter(Product.id == product_id, Product.published == True).first()
+        if not r:
+            raise HTTPException(404, "Not found")
+        return JSONResponse(to_out(r).model_dump())
+
+    return serve_cached(request, render)
 
 
 # -------------------------
 # Admin endpoints
 # -------------------------
 @app.get("/admin/products", response_model=list[ProductOut])
-def admin_list(claims: dict = Depends(require_user), db: Session = Depends(get_db)):
+def admin_list(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=PRODUCTS_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = Query(None, description="comma-separated subset of ProductOut fields"),
+    claims: dict = Depends(require_user),
+    db: Session = Depends(get_db),
+):
     require_admin(claims)
-    rows = db.query(Product).order_by(Product.id.desc()).all()
-    return [to_out(r) for r in rows]
+    return list_page(request, db, False, limit, cursor, fields)
 
 
 @app.post("/admin/products", response_model=ProductOut)
@@ -177,6 +328,7 @@ def admin_create(payload: ProductCreate, claims: dict = Depends(require_user), d
     )
     db.add(p)
     db.commit()
+    catalog_cache.bump()
     db.refresh(p)
     return to_out(p)
 
@@ -200,6 +352,7 @@ def admin_update(product_id: int, payload: ProductUpdate, claims: dict = Depends
         p.image_url = payload.image_url
 
     db.commit()
+    catalog_cache.bump()
     db.refresh(p)
     return to_out(p)
 
@@ -212,6 +365,7 @@ def admin_delete(product_id: int, claims: dict = Depends(require_user), db: Sess
         raise HTTPException(404, "Not found")
     db.delete(p)
     db.commit()
+    catalog_cache.bump()
     return {"ok": True}
 
 
@@ -259,6 +413,7 @@ async def upload_product_image(
         # Always store correct local URL
         p.image_url = f"/static/{out_name}"
         db.commit()
+        catalog_cache.bump()
         db.refresh(p)
         return to_out(p)
 
@@ -304,6 +459,7 @@ async def upload_product_image(
 
         p.image_url = image_url
         db.commit()
+        catalog_cache.bump()
         db.refresh(p)
         return to_out(p)
 
@@ -0,0 +1,12 @@
+from shared.migrations import Migration, create_tables
+
+from . import models  # noqa: F401  (registers the tables on Base.metadata)
+from .db import Base
+from .search import create_search_index
+
+# Append only; never edit or renumber a step that has shipped.
+MIGRATIONS = [
+    Migration(1, "baseline", create_tables(Base.metadata, ["products"])),
+    Migration(2, "products_published_id_index", "CREATE INDEX IF NOT EXISTS ix_products_published_id ON products (published, id)"),
+    Migration(3, "products_search_index", create_search_index),
+]
@@ -1,9 +1,11 @@
-from sqlalchemy import String, Text, Boolean, Numeric
+from sqlalchemy import Index, String, Text, Boolean, Numeric
 from sqlalchemy.orm import Mapped, mapped_column
 from .db import Base
 
 class Product(Base):
     __tablename__ = "products"
+    # public listing pages: WHERE published AND id < :cursor ORDER BY id DESC
+    __table_args__ = (Index("ix_products_published_id", "published", "id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(200), index=True)
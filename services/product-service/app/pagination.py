@@ -0,0 +1,75 @@
+import base64
+import json
+import math
+
+from fastapi import HTTPException
+
+from .schemas import ProductOut
+
+PRODUCT_FIELDS = tuple(ProductOut.model_fields)
+
+
+def _encode(state: dict) -> str:
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> dict:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(state, dict):
+        raise HTTPException(400, "Invalid cursor")
+    return state
+
+
+def _check(value, *types):
+    if not isinstance(value, types) or isinstance(value, bool):
+        raise HTTPException(400, "Invalid cursor")
+    return value
+
+
+def _check_id(value) -> int:
+    # ids are BIGINT at most; anything else would reach the driver and 500
+    value = _check(value, int)
+    if not 0 <= value < 2**63:
+        raise HTTPException(400, "Invalid cursor")
+    return value
+
+
+def encode_cursor(last_id: int) -> str:
+    """Opaque to clients: they only hand it back."""
+    return _encode({"after": last_id})
+
+
+def decode_cursor(cursor: str) -> int:
+    return _check_id(_decode(cursor).get("after"))
+
+
+def encode_search_cursor(score: float, last_id: int) -> str:
+    return _encode({"score": score, "after": last_id})
+
+
+def decode_search_cursor(cursor: str) -> tuple[float, int]:
+    state = _decode(cursor)
+    try:
+        score = float(_check(state.get("score"), int, float))
+    except OverflowError:
+        raise HTTPException(400, "Invalid cursor")
+    if not math.isfinite(score):
+        raise HTTPException(400, "Invalid cursor")
+    return score, _check_id(state.get("after"))
+
+
+def parse_fields(fields: str | None) -> tuple[str, ...] | None:
+    """fields=id,name,price -> ("id", "name", "price"); None = every field."""
+    if not fields:
+        return None
+    wanted = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    if not wanted:
+        raise HTTPException(400, f"No fields given; choose from {', '.join(PRODUCT_FIELDS)}")
+    unknown = [f for f in wanted if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}; choose from {', '.join(PRODUCT_FIELDS)}")
+    return wanted
@@ -0,0 +1,44 @@
+import os
+from typing import Dict
+
+from shared.ttl_cache import TTLCache, body_etag
+
+# Rendered public catalog pages: how many to keep, and for how many seconds.
+# Admin writes clear this replica's cache; other replicas catch up within the TTL.
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "1000"))
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "30"))
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "headers")
+
+    def __init__(self, body: bytes, etag: str, headers: Dict[str, str]):
+        self.body = body
+        self.etag = etag
+        self.headers = headers
+
+
+class ResponseCache(TTLCache):
+    """
+    key -> CachedResponse (serialized body + ETag). The generation is the
+    catalog version: bump() (any admin write) moves it on and drops every
+    entry.
+    """
+
+    def __init__(self, max_entries: int = CATALOG_CACHE_SIZE, ttl: float = CATALOG_CACHE_TTL):
+        super().__init__(max_entries, ttl)
+
+    def version(self) -> int:
+        return self.generation()
+
+    def put(self, key: str, body: bytes, headers: Dict[str, str], version: int) -> CachedResponse:
+        """Cache the response unless bump() ran since version; returns it either way."""
+        cached = CachedResponse(body, body_etag(body), headers)
+        self.store(key, cached, version)
+        return cached
+
+    def bump(self) -> None:
+        self.invalidate_all()
+
+    def stats(self) -> dict:
+        return {"version": self.version(), **super().stats()}
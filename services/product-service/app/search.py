@@ -0,0 +1,111 @@
+"""
+Ranked full-text search over product name + description.
+
+Postgres: a GIN index on the weighted tsvector expression below (name
+counts as 'A', description as 'B'); queries repeat the exact expression so
+the planner uses the index, and ts_rank orders the matches.
+
+SQLite (local mode): an external-content FTS5 table over products, kept in
+sync by triggers, ranked with bm25 (name weighted 10x).
+
+Either way the index follows every write to products, admin endpoints
+included, with no application code involved. Pages are keyset on
+(score DESC, id DESC).
+"""
+import re
+from typing import List, Tuple
+
+from sqlalchemy import column, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .models import Product
+
+TS_CONFIG = "english"
+PG_DOCUMENT = (
+    f"setweight(to_tsvector('{TS_CONFIG}', coalesce(name, '')), 'A') || "
+    f"setweight(to_tsvector('{TS_CONFIG}', coalesce(description, '')), 'B')"
+)
+
+PG_STEPS = [f"CREATE INDEX IF NOT EXISTS ix_products_search ON products USING GIN (({PG_DOCUMENT}))"]
+
+SQLITE_STEPS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "name, description, content='products', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO products_fts (rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    # index the rows that existed before the table did
+    "INSERT INTO products_fts (products_fts) VALUES ('rebuild')",
+]
+
+
+def create_search_index(conn: Connection) -> None:
+    """Migration step: the search index for this dialect."""
+    if conn.dialect.name == "postgresql":
+        steps = PG_STEPS
+    elif conn.dialect.name == "sqlite":
+        steps = SQLITE_STEPS
+    else:
+        raise RuntimeError(f"Unsupported dialect {conn.dialect.name!r} for product search")
+    for sql in steps:
+        conn.execute(text(sql))
+
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def terms(q: str) -> List[str]:
+    return _WORD.findall(q.lower())
+
+
+def _page_filter(after: Tuple[float, int] | None) -> str:
+    if after is None:
+        return ""
+    return " AND (score < :score OR (score = :score AND id < :after))"
+
+
+def search(db: Session, q: str, limit: int, after: Tuple[float, int] | None = None) -> List[Tuple[Product, float]]:
+    """
+    Up to limit (product, score) pairs for published products matching
+    every word of q, best first; after = (score, id) of the previous page's
+    last row. An empty list when q has no words.
+    """
+    words = terms(q)
+    if not words:
+        return []
+    params = {"limit": limit}
+    if after is not None:
+        params["score"], params["after"] = after
+
+    if db.get_bind().dialect.name == "postgresql":
+        # plainto_tsquery: user input is never parsed as query syntax
+        params["q"] = " ".join(words)
+        sql = (
+            "SELECT * FROM ("
+            f"SELECT products.*, ts_rank({PG_DOCUMENT}, query) AS score "
+            f"FROM products, plainto_tsquery('{TS_CONFIG}', :q) AS query "
+            f"WHERE ({PG_DOCUMENT}) @@ query AND published"
+            ") AS hits WHERE true" + _page_filter(after)
+        )
+    else:
+        # each word quoted (no FTS5 syntax from users), last one as a prefix for type-ahead
+        params["q"] = " ".join(f'"{w}"' for w in words) + "*"
+        sql = (
+            "SELECT * FROM ("
+            "SELECT products.*, -bm25(products_fts, 10.0, 1.0) AS score "
+            "FROM products_fts JOIN products ON products.id = products_fts.rowid "
+            "WHERE products_fts MATCH :q AND products.published"
+            ") AS hits WHERE 1" + _page_filter(after)
+        )
+    sql += " ORDER BY score DESC, id DESC LIMIT :limit"
+
+    stmt = text(sql).columns(*Product.__table__.columns, column("score"))
+    rows = db.execute(select(Product, column("score")).from_statement(stmt), params)
+    return [(p, float(score)) for p, score in rows]
@@ -31,6 +31,8 @@ def local_app_and_db(monkeypatch, tmp_path, test_engine):
 
     import product_service.main as main
     import product_service.db as dbmod
+    from product_service.migrations import MIGRATIONS
+    from shared.migrations import migrate
 
     TestingSessionLocal = sessionmaker(
         autocommit=False,
@@ -42,8 +44,9 @@ def local_app_and_db(monkeypatch, tmp_path, test_engine):
     monkeypatch.setattr(dbmod, "engine", test_engine, raising=True)
     monkeypatch.setattr(dbmod, "SessionLocal", TestingSessionLocal, raising=True)
 
-    # Create tables for tests
+    # Create tables for tests (migrations add the search index)
     dbmod.Base.metadata.create_all(bind=test_engine)
+    migrate(test_engine, MIGRATIONS)
 
     def override_get_db():
         db = TestingSessionLocal()
@@ -54,6 +57,9 @@ def local_app_and_db(monkeypatch, tmp_path, test_engine):
 
     main.app.dependency_overrides[main.get_db] = override_get_db
 
+    # rows are seeded straight into the DB, which never bumps the catalog version
+    main.catalog_cache.clear()
+
     # Default auth user
     main.app.dependency_overrides[main.require_user] = lambda: {
         "sub": "1",
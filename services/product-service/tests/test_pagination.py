@@ -0,0 +1,121 @@
+import base64
+import json
+
+import pytest
+
+from product_service.pagination import decode_cursor, encode_cursor
+
+
+@pytest.fixture()
+def seeded(local_app_and_db):
+    _, _, TestingSessionLocal = local_app_and_db
+    from product_service.models import Product
+
+    with TestingSessionLocal() as db:
+        rows = [
+            Product(name=f"page-{i}", description="desc", price=i + 0.5, published=i % 2 == 0, image_url=f"prod_{i}.jpg")
+            for i in range(7)
+        ]
+        db.add_all(rows)
+        db.commit()
+        ids = [p.id for p in rows]
+    yield ids
+    with TestingSessionLocal() as db:
+        db.query(Product).filter(Product.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+
+
+def _walk(client, url, limit):
+    items, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get(url, params=params)
+        assert r.status_code == 200
+        assert len(r.json()) <= limit
+        items += r.json()
+        pages += 1
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            assert "Link" not in r.headers
+            return items, pages
+        assert r.headers["Link"].endswith('; rel="next"')
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(42)) == 42
+
+
+def _raw_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "nope",
+        encode_cursor(1)[:-2] + "!!",
+        "eyJhZnRlciI6IngifQ",
+        _raw_cursor({"after": 10**24}),
+        _raw_cursor({"after": 2**63}),
+        _raw_cursor({"after": -1}),
+        _raw_cursor([1]),
+    ],
+)
+def test_invalid_cursor_is_400(local_client, cursor):
+    r = local_client.get("/products", params={"cursor": cursor})
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Invalid cursor"
+
+
+def test_admin_pages_cover_everything_once(local_client, seeded):
+    items, pages = _walk(local_client, "/admin/products", limit=2)
+    ids = [p["id"] for p in items]
+    assert ids == sorted(ids, reverse=True)
+    assert len(ids) == len(set(ids))
+    assert set(seeded) <= set(ids)
+    assert pages == -(-len(ids) // 2)
+
+
+def test_public_pages_only_published(local_client, seeded):
+    items, _ = _walk(local_client, "/products", limit=1)
+    assert all(p["published"] for p in items)
+    mine = [p["name"] for p in items if p["id"] in seeded]
+    assert mine == ["page-6", "page-4", "page-2", "page-0"]
+
+
+def test_last_page_has_no_cursor(local_client, seeded):
+    r = local_client.get("/admin/products", params={"limit": 200})
+    assert r.status_code == 200
+    assert "X-Next-Cursor" not in r.headers
+
+
+def test_limit_is_bounded(local_client):
+    assert local_client.get("/products", params={"limit": 0}).status_code == 422
+    assert local_client.get("/products", params={"limit": 201}).status_code == 422
+
+
+def test_sparse_fields(local_client, seeded):
+    r = local_client.get("/admin/products", params={"fields": "name,price,image_url", "limit": 200})
+    assert r.status_code == 200
+    row = next(p for p in r.json() if p["name"] == "page-3")
+    assert row == {"name": "page-3", "price": 3.5, "image_url": "/static/prod_3.jpg"}
+
+
+@pytest.mark.parametrize("fields", [",", " , ,"])
+def test_empty_field_list_is_400(local_client, fields):
+    r = local_client.get("/products", params={"fields": fields})
+    assert r.status_code == 400
+    assert r.json()["detail"].startswith("No fields given")
+
+
+def test_unknown_field_is_400(local_client):
+    r = local_client.get("/products", params={"fields": "name,password"})
+    assert r.status_code == 400
+    assert "password" in r.json()["detail"]
+
+
+def test_next_cursor_header_is_exposed_to_the_browser(local_client):
+    r = local_client.get("/products", headers={"Origin": "http://localhost:3000"})
+    assert "X-Next-Cursor" in r.headers["access-control-expose-headers"]
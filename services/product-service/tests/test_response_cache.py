@@ -0,0 +1,123 @@
+import pytest
+from sqlalchemy import event
+
+from product_service.response_cache import ResponseCache, body_etag
+
+
+@pytest.fixture()
+def product(local_app_and_db):
+    _, _, TestingSessionLocal = local_app_and_db
+    from product_service.models import Product
+
+    with TestingSessionLocal() as db:
+        p = Product(name="cached", description="desc", price=5, published=True)
+        db.add(p)
+        db.commit()
+        product_id = p.id
+    yield product_id
+    with TestingSessionLocal() as db:
+        db.query(Product).filter(Product.id == product_id).delete()
+        db.commit()
+
+
+@pytest.fixture()
+def statements(test_engine):
+    seen = []
+
+    def record(conn, cursor, statement, *args):
+        seen.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(test_engine, "before_cursor_execute", record)
+
+
+def test_repeat_reads_skip_the_database(local_client, product, statements):
+    first = local_client.get(f"/products/{product}")
+    assert first.status_code == 200
+    assert statements
+
+    statements.clear()
+    again = local_client.get(f"/products/{product}")
+    assert again.status_code == 200
+    assert again.content == first.content
+    assert again.headers["etag"] == first.headers["etag"] == body_etag(first.content)
+    assert statements == []
+
+
+def test_if_none_match_gets_304(local_client, product):
+    etag = local_client.get("/products").headers["etag"]
+
+    r = local_client.get("/products", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == etag
+
+    assert local_client.get("/products", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_query_order_does_not_matter(local_client, product, statements):
+    local_client.get("/products", params=[("limit", "5"), ("fields", "id,name")])
+    statements.clear()
+    r = local_client.get("/products", params=[("fields", "id,name"), ("limit", "5")])
+    assert r.status_code == 200
+    assert statements == []
+
+
+def test_page_headers_are_replayed_from_cache(local_client, product, local_app_and_db):
+    _, _, TestingSessionLocal = local_app_and_db
+    from product_service.models import Product
+
+    with TestingSessionLocal() as db:
+        db.add(Product(name="cached-2", description="desc", price=6, published=True))
+        db.commit()
+    try:
+        first = local_client.get("/products", params={"limit": 1})
+        again = local_client.get("/products", params={"limit": 1})
+        assert again.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+        assert again.headers["link"] == first.headers["link"]
+    finally:
+        with TestingSessionLocal() as db:
+            db.query(Product).filter(Product.name == "cached-2").delete()
+            db.commit()
+
+
+def test_admin_write_invalidates(local_client, product):
+    before = local_client.get(f"/products/{product}")
+    assert local_client.patch(f"/admin/products/{product}", json={"name": "renamed"}).status_code == 200
+
+    r = local_client.get(f"/products/{product}", headers={"If-None-Match": before.headers["etag"]})
+    assert r.status_code == 200
+    assert r.json()["name"] == "renamed"
+    assert r.headers["etag"] != before.headers["etag"]
+
+    assert local_client.patch(f"/admin/products/{product}", json={"published": False}).status_code == 200
+    assert local_client.get(f"/products/{product}").status_code == 404
+
+
+def test_errors_are_not_cached(local_client, local_app_and_db):
+    main, _, _ = local_app_and_db
+    assert local_client.get("/products/999999").status_code == 404
+    assert local_client.get("/products", params={"cursor": "nope"}).status_code == 400
+    assert len(main.catalog_cache) == 0
+
+
+def test_put_after_bump_is_not_cached():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    version = cache.version()
+    cache.bump()  # an admin write landed while the response was being rendered
+    cached = cache.put("k", b"[]", {}, version)
+    assert cached.etag == body_etag(b"[]")
+    assert cache.get("k") is None
+
+    cache.put("k", b"[]", {}, cache.version())
+    assert cache.get("k").body == b"[]"
+
+
+def test_lru_bound():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.encode(), {}, cache.version())
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("c").body == b"c"
@@ -0,0 +1,105 @@
+import base64
+import json
+
+import pytest
+from sqlalchemy import text
+
+from product_service.search import terms
+
+
+@pytest.fixture()
+def catalog(local_app_and_db):
+    _, _, TestingSessionLocal = local_app_and_db
+    from product_service.models import Product
+
+    specs = [
+        ("Red running shoes", "Lightweight trainers", True),
+        ("Blue kettle", "Boils water; pairs well with red mugs", True),
+        ("Red mug", "Ceramic, 300ml", True),
+        ("Red scarf", "Wool", False),
+        ("Garden hose", "Twenty metres", True),
+    ]
+    with TestingSessionLocal() as db:
+        rows = [Product(name=n, description=d, price=1, published=pub) for n, d, pub in specs]
+        db.add_all(rows)
+        db.commit()
+        ids = {p.name: p.id for p in rows}
+    yield ids
+    with TestingSessionLocal() as db:
+        db.query(Product).filter(Product.id.in_(ids.values())).delete(synchronize_session=False)
+        db.commit()
+
+
+def _names(r):
+    assert r.status_code == 200
+    return [p["name"] for p in r.json()]
+
+
+def test_terms_drop_query_syntax():
+    assert terms('Red "mug" OR kettle*') == ["red", "mug", "or", "kettle"]
+    assert terms("  -- ") == []
+
+
+def test_ranked_published_matches(local_client, catalog):
+    names = _names(local_client.get("/products/search", params={"q": "red"}))
+    # a name match outranks a description match; unpublished never shows
+    assert set(names) == {"Red running shoes", "Red mug", "Blue kettle"}
+    assert names[-1] == "Blue kettle"
+
+
+def test_all_words_must_match_and_last_is_a_prefix(local_client, catalog):
+    assert _names(local_client.get("/products/search", params={"q": "red run"})) == ["Red running shoes"]
+    assert _names(local_client.get("/products/search", params={"q": "running"})) == ["Red running shoes"]
+    assert _names(local_client.get("/products/search", params={"q": "red hose"})) == []
+
+
+def test_user_input_is_not_query_syntax(local_client, catalog):
+    for q in ['"', "red OR", "NEAR(red mug)", "name:red", "*", "'; DROP TABLE products; --"]:
+        assert local_client.get("/products/search", params={"q": q}).status_code == 200
+
+
+def test_search_pages(local_client, catalog):
+    seen, cursor = [], None
+    while True:
+        params = {"q": "red", "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        r = local_client.get("/products/search", params=params)
+        seen += _names(r)
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == _names(local_client.get("/products/search", params={"q": "red"}))
+
+
+def test_index_follows_admin_writes(local_client, catalog):
+    kettle = catalog["Blue kettle"]
+    assert local_client.patch(f"/admin/products/{kettle}", json={"name": "Copper kettle", "description": "Stovetop"}).status_code == 200
+    assert "Copper kettle" not in _names(local_client.get("/products/search", params={"q": "red"}))
+    assert _names(local_client.get("/products/search", params={"q": "copper"})) == ["Copper kettle"]
+
+    assert local_client.delete(f"/admin/products/{kettle}").status_code == 200
+    assert _names(local_client.get("/products/search", params={"q": "copper"})) == []
+
+    r = local_client.post("/admin/products", json={"name": "Copper pan", "description": "", "price": 3, "published": True})
+    assert r.status_code == 200
+    try:
+        assert _names(local_client.get("/products/search", params={"q": "copper"})) == ["Copper pan"]
+    finally:
+        local_client.delete(f"/admin/products/{r.json()['id']}")
+
+
+def test_search_uses_the_fts_index(local_app_and_db):
+    _, _, TestingSessionLocal = local_app_and_db
+    with TestingSessionLocal() as db:
+        plan = db.execute(text("EXPLAIN QUERY PLAN SELECT rowid FROM products_fts WHERE products_fts MATCH 'red'")).all()
+    assert any("VIRTUAL TABLE INDEX" in row[-1] for row in plan)
+
+
+def test_bad_search_requests(local_client):
+    assert local_client.get("/products/search").status_code == 422
+    assert local_client.get("/products/search", params={"q": ""}).status_code == 422
+    assert local_client.get("/products/search", params={"q": "red", "cursor": "nope"}).status_code == 400
+    for state in ({"score": 1.0, "after": 10**24}, {"score": 10**400, "after": 1}, {"score": "x", "after": 1}):
+        cursor = base64.urlsafe_b64encode(json.dumps(state).encode()).decode().rstrip("=")
+        assert local_client.get("/products/search", params={"q": "red", "cursor": cursor}).status_code == 400
@@ -0,0 +1,125 @@
+"""
+Publish/consume throughput and end-to-end latency of shared.events.
+
+    python -m shared.bench_events [--messages 20000] [--workers 1,4,16]
+                                  [--codecs application/json,application/msgpack]
+                                  [--payload-bytes 256] [--work-ms 0] [--url memory://bench]
+
+Runs every codec x consumer-workers combination against the in-process broker
+by default; pass --url amqp://... to measure a real RabbitMQ instead (each run
+uses its own queue). Latency is publish() call -> handler start.
+"""
+import argparse
+import sys
+import threading
+import time
+import uuid
+
+from shared import events, memory_broker
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def run_once(url: str, content_type: str, workers: int, messages: int, payload_bytes: int, work_ms: float) -> dict:
+    queue_name = f"bench-{uuid.uuid4().hex[:8]}"
+    routing_key = "bench.event"
+    if url.startswith("memory://"):
+        url = f"{url.rstrip('/')}-{queue_name}"
+
+    # declare + bind up front so nothing published before the consumer attaches is lost
+    conn = events.connect(url)
+    ch = conn.channel()
+    ch.exchange_declare(exchange=events.EXCHANGE, exchange_type="topic", durable=True)
+    ch.queue_declare(queue=queue_name, durable=True)
+    ch.queue_bind(queue=queue_name, exchange=events.EXCHANGE, routing_key=routing_key)
+    conn.close()
+
+    latencies: list[float] = []
+    lock = threading.Lock()
+    done = threading.Event()
+    last = [0.0]
+
+    def handler(event_type, payload):
+        now = time.perf_counter()
+        if work_ms:
+            time.sleep(work_ms / 1000.0)
+        with lock:
+            latencies.append(now - payload["t"])
+            last[0] = time.perf_counter()
+            if len(latencies) >= messages:
+                done.set()
+
+    consumer = threading.Thread(
+        target=events.consume,
+        args=(url, queue_name, [routing_key], handler),
+        kwargs={"workers": workers, "prefetch_count": max(10, 2 * workers)},
+        daemon=True,
+    )
+    consumer.start()
+
+    publisher = events.Publisher(url, content_type=content_type)
+    filler = "x" * payload_bytes
+    start = time.perf_counter()
+    for i in range(messages):
+        publisher.publish(routing_key, {"i": i, "t": time.perf_counter(), "data": filler})
+    published = time.perf_counter()
+
+    finished = done.wait(timeout=max(60.0, messages * work_ms / 1000.0 * 2))
+    publisher.close()
+    if url.startswith("memory://"):
+        memory_broker.get_broker(url.split("://", 1)[1]).close_connections()
+        consumer.join(5)
+
+    lat = sorted(latencies)
+    body, _ = events.encode_event(routing_key, {"i": 0, "t": 0.0, "data": filler}, content_type)
+    return {
+        "codec": content_type,
+        "workers": workers,
+        "messages": len(lat),
+        "body_bytes": len(body),
+        "publish_per_s": messages / (published - start),
+        "consume_per_s": len(lat) / ((last[0] or published) - start),
+        "p50_ms": percentile(lat, 50) * 1000,
+        "p95_ms": percentile(lat, 95) * 1000,
+        "p99_ms": percentile(lat, 99) * 1000,
+        "complete": finished,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m shared.bench_events", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--url", default="memory://bench")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--workers", default="1,4,16", help="comma-separated consumer worker counts")
+    parser.add_argument("--codecs", default=",".join(events.CODECS), help="comma-separated content types")
+    parser.add_argument("--payload-bytes", type=int, default=256)
+    parser.add_argument("--work-ms", type=float, default=0.0, help="simulated handler work per event")
+    args = parser.parse_args(argv)
+
+    codecs = [c for c in args.codecs.split(",") if c]
+    unknown = [c for c in codecs if c not in events.CODECS]
+    if unknown:
+        parser.error(f"unknown codec(s): {', '.join(unknown)} (available: {', '.join(events.CODECS)})")
+
+    header = f"{'codec':<22}{'workers':>8}{'msgs':>8}{'body B':>8}{'pub/s':>10}{'cons/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for content_type in codecs:
+        for workers in (int(w) for w in args.workers.split(",") if w):
+            r = run_once(args.url, content_type, workers, args.messages, args.payload_bytes, args.work_ms)
+            print(
+                f"{r['codec']:<22}{r['workers']:>8}{r['messages']:>8}{r['body_bytes']:>8}"
+                f"{r['publish_per_s']:>10.0f}{r['consume_per_s']:>10.0f}"
+                f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+                + ("" if r["complete"] else "  (timed out)")
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
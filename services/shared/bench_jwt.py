@@ -0,0 +1,58 @@
+"""
+ops/sec of shared.fastjwt vs python-jose for our access-token shape.
+
+    python -m shared.bench_jwt [--seconds 1.0]
+"""
+import argparse
+import sys
+import time
+
+from jose import jwt
+
+from shared import fastjwt
+
+SECRET = "bench-secret-0123456789abcdef"
+
+
+def _claims() -> dict:
+    now = int(time.time())
+    return {"sub": "42", "email": "user@example.com", "is_admin": False, "iat": now, "exp": now + 3600, "typ": "access"}
+
+
+def ops_per_sec(fn, seconds: float) -> float:
+    n = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        for _ in range(100):
+            fn()
+        n += 100
+        now = time.perf_counter()
+        if now >= deadline:
+            return n / (now - start)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m shared.bench_jwt", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--seconds", type=float, default=1.0, help="time per measurement")
+    args = parser.parse_args(argv)
+
+    claims = _claims()
+    token = jwt.encode(claims, SECRET, algorithm=fastjwt.ALGO)
+    assert fastjwt.encode(claims, SECRET) == token, "fastjwt and jose produce different tokens"
+    assert fastjwt.decode(token, SECRET) == jwt.decode(token, SECRET, algorithms=[fastjwt.ALGO])
+
+    cases = [
+        ("encode", lambda: jwt.encode(claims, SECRET, algorithm=fastjwt.ALGO), lambda: fastjwt.encode(claims, SECRET)),
+        ("decode", lambda: jwt.decode(token, SECRET, algorithms=[fastjwt.ALGO]), lambda: fastjwt.decode(token, SECRET, typ="access")),
+    ]
+    print(f"{'op':<8}{'jose ops/s':>14}{'fastjwt ops/s':>16}{'speedup':>10}")
+    for name, jose_fn, fast_fn in cases:
+        slow = ops_per_sec(jose_fn, args.seconds)
+        fast = ops_per_sec(fast_fn, args.seconds)
+        print(f"{name:<8}{slow:>14.0f}{fast:>16.0f}{fast / slow:>9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
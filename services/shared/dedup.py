@@ -0,0 +1,100 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from shared.ttl_cache import TTLCache
+
+logger = logging.getLogger("shared.dedup")
+
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "100000"))
+DEDUP_TTL_SECONDS = int(os.getenv("DEDUP_TTL_SECONDS", str(24 * 60 * 60)))
+
+
+class SqlDedupBackend:
+    """
+    Durable record of processed message ids in a small table, so dedup
+    survives consumer restarts and is shared between replicas. SQLAlchemy is
+    imported lazily: services that only use the in-memory store don't need it.
+    """
+
+    def __init__(self, database_url: str, table_name: str = "processed_messages", ttl_seconds: int = DEDUP_TTL_SECONDS):
+        from sqlalchemy import Column, DateTime, MetaData, String, Table, create_engine
+
+        self._engine = create_engine(database_url, pool_pre_ping=True, future=True)
+        self._table = Table(
+            table_name,
+            MetaData(),
+            Column("message_id", String(64), primary_key=True),
+            Column("processed_at", DateTime(timezone=True), nullable=False, index=True),
+        )
+        self._table.metadata.create_all(self._engine)
+        self._ttl = ttl_seconds
+        self._marks = 0
+
+    def seen(self, message_id: str) -> bool:
+        from sqlalchemy import select
+
+        with self._engine.connect() as conn:
+            row = conn.execute(select(self._table.c.message_id).where(self._table.c.message_id == message_id)).first()
+        return row is not None
+
+    def mark(self, message_id: str) -> None:
+        from sqlalchemy.exc import IntegrityError
+
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(self._table.insert().values(message_id=message_id, processed_at=datetime.now(timezone.utc)))
+        except IntegrityError:
+            pass  # another replica got there first
+
+        self._marks += 1
+        if self._marks % 1000 == 0:
+            self.prune()
+
+    def prune(self) -> None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self._ttl)
+        with self._engine.begin() as conn:
+            conn.execute(self._table.delete().where(self._table.c.processed_at < cutoff))
+
+
+class DedupStore(TTLCache):
+    """
+    Remembers which message ids were already handled so broker redeliveries
+    become no-ops. In memory, optionally in front of a durable backend
+    (e.g. SqlDedupBackend) that is consulted on a memory miss. Thread-safe,
+    for consume(workers > 1).
+    """
+
+    def __init__(self, max_entries: int = DEDUP_MAX_ENTRIES, ttl_seconds: int = DEDUP_TTL_SECONDS, backend=None):
+        super().__init__(max_entries, ttl_seconds)
+        self._backend = backend
+
+    def seen(self, message_id: str) -> bool:
+        now = self._now()
+        with self._lock:
+            found = self._lookup(message_id, now) is not None
+
+        if not found and self._backend is not None:
+            try:
+                found = self._backend.seen(message_id)
+            except Exception:
+                # fail open: a rare duplicate beats dropping the event
+                logger.exception("Dedup backend lookup failed for message_id=%s", message_id)
+                found = False
+            if found:
+                self.store(message_id, True)
+
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def mark(self, message_id: str) -> None:
+        self.store(message_id, True)
+        if self._backend is not None:
+            try:
+                self._backend.mark(message_id)
+            except Exception:
+                logger.exception("Dedup backend write failed for message_id=%s", message_id)
@@ -0,0 +1,96 @@
+"""
+Inspect / replay dead-lettered events.
+
+    python -m shared.dlq list   --queue notification-service [--limit 20]
+    python -m shared.dlq replay --queue notification-service [--limit 100]
+
+RABBITMQ_URL is read from the environment unless --url is given.
+`list` never removes anything: messages are fetched without ack and go back
+to the DLQ when the connection closes. `replay` moves messages back onto the
+original queue with a fresh retry budget.
+"""
+import argparse
+import json
+import os
+import sys
+
+from shared.events import ATTEMPT_HEADER, ORIGINAL_ROUTING_KEY_HEADER, connect, dead_letter_queue_name, decode_event
+
+
+def _open(url: str):
+    conn = connect(url)
+    return conn, conn.channel()
+
+
+def list_dead_letters(url: str, queue_name: str, limit: int) -> list[dict]:
+    conn, ch = _open(url)
+    out = []
+    try:
+        for _ in range(limit):
+            method, props, body = ch.basic_get(queue=dead_letter_queue_name(queue_name), auto_ack=False)
+            if method is None:
+                break
+            headers = props.headers or {}
+            routing_key = headers.get(ORIGINAL_ROUTING_KEY_HEADER)
+            try:
+                event_type, payload = decode_event(routing_key, props, body)
+            except Exception:
+                event_type, payload = None, body.decode("utf-8", errors="replace")
+            out.append(
+                {
+                    "message_id": props.message_id,
+                    "routing_key": routing_key,
+                    "event_type": event_type,
+                    "attempts": headers.get(ATTEMPT_HEADER),
+                    "payload": payload,
+                }
+            )
+    finally:
+        # unacked -> returned to the DLQ
+        conn.close()
+    return out
+
+
+def replay_dead_letters(url: str, queue_name: str, limit: int) -> int:
+    conn, ch = _open(url)
+    replayed = 0
+    try:
+        for _ in range(limit):
+            method, props, body = ch.basic_get(queue=dead_letter_queue_name(queue_name), auto_ack=False)
+            if method is None:
+                break
+            headers = dict(props.headers or {})
+            headers.pop(ATTEMPT_HEADER, None)
+            props.headers = headers
+            # straight to the consumer's queue, not the topic exchange, so
+            # other services bound to the same routing key don't see it twice
+            ch.basic_publish(exchange="", routing_key=queue_name, body=body, properties=props)
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            replayed += 1
+    finally:
+        conn.close()
+    return replayed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m shared.dlq", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("command", choices=["list", "replay"])
+    parser.add_argument("--queue", required=True, help="consumer queue name, e.g. notification-service")
+    parser.add_argument("--url", default=os.getenv("RABBITMQ_URL", ""))
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    if not args.url:
+        parser.error("--url or RABBITMQ_URL is required")
+
+    if args.command == "list":
+        for item in list_dead_letters(args.url, args.queue, args.limit):
+            print(json.dumps(item, default=str))
+    else:
+        n = replay_dead_letters(args.url, args.queue, args.limit)
+        print(f"replayed {n} message(s) to {args.queue}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
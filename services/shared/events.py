@@ -1,40 +1,502 @@
+import functools
 import json
+import logging
+import os
+import threading
+import time
+import uuid
 import pika
+from concurrent.futures import ThreadPoolExecutor
+from pika.exceptions import AMQPChannelError, AMQPConnectionError, NackError, UnroutableError
 from typing import Any, Callable, Dict
 
+from shared import memory_broker
+
 EXCHANGE = "microshop.events"
 
+# Failed deliveries are retried via TTL delay queues: base, 2*base, 4*base, ...
+# (capped at RETRY_MAX_DELAY_MS), then parked in <queue>.dlq
+RETRY_MAX_ATTEMPTS = int(os.getenv("EVENTS_RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY_MS = int(os.getenv("EVENTS_RETRY_BASE_DELAY_MS", "1000"))
+RETRY_MAX_DELAY_MS = int(os.getenv("EVENTS_RETRY_MAX_DELAY_MS", str(5 * 60 * 1000)))
+
+ATTEMPT_HEADER = "x-retry-attempt"
+ORIGINAL_ROUTING_KEY_HEADER = "x-original-routing-key"
+
+# Envelope lives in AMQP properties (message_id, timestamp, type, content_type)
+# plus this header; the body is just the encoded payload.
+SCHEMA_VERSION = 1
+SCHEMA_VERSION_HEADER = "x-schema-version"
+
+logger = logging.getLogger("shared.events")
+
+
+# -------------------------
+# Codecs
+# -------------------------
+class Codec:
+    content_type = ""
+
+    def encode(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    content_type = "application/json"
+
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+CODECS: Dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    CODECS[codec.content_type] = codec
+
+
+register_codec(JsonCodec())
+
+try:
+    import msgpack
+except ImportError:  # optional: consumers only need it if a producer opts in
+    msgpack = None
+
+if msgpack is not None:
+    class MsgpackCodec(Codec):
+        content_type = "application/msgpack"
+
+        def encode(self, obj: Any) -> bytes:
+            return msgpack.packb(obj, use_bin_type=True)
+
+        def decode(self, data: bytes) -> Any:
+            return msgpack.unpackb(data, raw=False)
+
+    register_codec(MsgpackCodec())
+
+DEFAULT_CONTENT_TYPE = os.getenv("EVENTS_CONTENT_TYPE", JsonCodec.content_type)
+if DEFAULT_CONTENT_TYPE not in CODECS:
+    # fail at startup, not with a KeyError on the first publish
+    raise RuntimeError(
+        f"EVENTS_CONTENT_TYPE={DEFAULT_CONTENT_TYPE!r} has no registered codec "
+        f"(available: {', '.join(sorted(CODECS))}; application/msgpack needs the 'msgpack' package)"
+    )
+
+
+# -------------------------
+# Transports
+# -------------------------
+# URL scheme -> factory returning a pika BlockingConnection-compatible object.
+# memory:// is the in-process broker (tests, local dev, benchmarks).
+TRANSPORTS: Dict[str, Callable[[str], Any]] = {}
+
+
+def register_transport(scheme: str, factory: Callable[[str], Any]) -> None:
+    TRANSPORTS[scheme] = factory
+
+
+def _pika_connect(url: str):
+    return pika.BlockingConnection(pika.URLParameters(url))
+
+
+register_transport("amqp", _pika_connect)
+register_transport("amqps", _pika_connect)
+register_transport("memory", memory_broker.connect)
+
+
+def connect(rabbitmq_url: str):
+    scheme = rabbitmq_url.split("://", 1)[0] if "://" in rabbitmq_url else "amqp"
+    factory = TRANSPORTS.get(scheme)
+    if factory is None:
+        raise ValueError(f"Unsupported broker URL scheme {scheme!r}")
+    return factory(rabbitmq_url)
+
+
+def encode_event(
+    event_type: str,
+    payload: Dict[str, Any],
+    content_type: str | None = None,
+    message_id: str | None = None,
+) -> tuple[bytes, pika.BasicProperties]:
+    codec = CODECS[content_type or DEFAULT_CONTENT_TYPE]
+    props = pika.BasicProperties(
+        content_type=codec.content_type,
+        delivery_mode=2,
+        message_id=message_id or uuid.uuid4().hex,
+        timestamp=int(time.time()),
+        type=event_type,
+        headers={SCHEMA_VERSION_HEADER: SCHEMA_VERSION},
+    )
+    return codec.encode(payload), props
+
+
+def decode_event(routing_key: str, props, body: bytes) -> tuple[str, Dict[str, Any]]:
+    """
+    Returns (event_type, payload). Messages without a `type` property are the
+    legacy format: a JSON body of {"type": ..., "payload": ...}.
+    """
+    if props is None or not props.type:
+        msg = json.loads(body.decode("utf-8"))
+        return msg.get("type", routing_key), msg.get("payload", {})
+
+    codec = CODECS.get(props.content_type or JsonCodec.content_type)
+    if codec is None:
+        raise ValueError(f"Unsupported content_type {props.content_type!r}")
+    return props.type, codec.decode(body)
+
+
+class Publisher:
+    """
+    Long-lived publisher: one connection + one confirm-mode channel, reused by
+    every thread of the process. The exchange is declared once per connection.
+    On a dropped connection/channel we reconnect and retry the publish once.
+    """
+
+    def __init__(self, rabbitmq_url: str, exchange: str = EXCHANGE, content_type: str | None = None):
+        self._url = rabbitmq_url
+        self._exchange = exchange
+        self._content_type = content_type
+        # BlockingConnection is not thread-safe -> serialize all channel access
+        self._lock = threading.Lock()
+        self._conn = None
+        self._ch = None
+
+    def _channel(self):
+        if self._ch is not None and self._ch.is_open and self._conn.is_open:
+            return self._ch
+
+        self._reset()
+        conn = connect(self._url)
+        ch = conn.channel()
+        ch.exchange_declare(exchange=self._exchange, exchange_type="topic", durable=True)
+        # basic_publish now blocks until the broker acks (raises NackError otherwise)
+        ch.confirm_delivery()
+        self._conn, self._ch = conn, ch
+        return ch
+
+    def _reset(self) -> None:
+        conn, self._conn, self._ch = self._conn, None, None
+        if conn is not None and conn.is_open:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def publish(self, event_type: str, payload: Dict[str, Any], message_id: str | None = None) -> None:
+        body, props = encode_event(event_type, payload, self._content_type, message_id)
+
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    self._channel().basic_publish(
+                        exchange=self._exchange,
+                        routing_key=event_type,
+                        body=body,
+                        properties=props,
+                    )
+                    return
+                except (NackError, UnroutableError):
+                    # broker refused the message; the channel itself is fine
+                    raise
+                except (AMQPConnectionError, AMQPChannelError):
+                    # stale connection (broker restart, missed heartbeats, ...)
+                    self._reset()
+                    if attempt == 2:
+                        raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._reset()
+
+
+_publishers: Dict[str, Publisher] = {}
+_publishers_pid = os.getpid()
+_publishers_lock = threading.Lock()
+
+
+def get_publisher(rabbitmq_url: str) -> Publisher:
+    """
+    Process-wide Publisher for rabbitmq_url. A forked child (gunicorn/uvicorn
+    workers) gets its own publishers instead of sharing the parent's socket.
+    """
+    global _publishers_pid
+    with _publishers_lock:
+        if _publishers_pid != os.getpid():
+            _publishers.clear()
+            _publishers_pid = os.getpid()
+
+        pub = _publishers.get(rabbitmq_url)
+        if pub is None:
+            pub = _publishers[rabbitmq_url] = Publisher(rabbitmq_url)
+        return pub
+
+
+def close_publishers() -> None:
+    with _publishers_lock:
+        pubs = list(_publishers.values())
+        _publishers.clear()
+    for pub in pubs:
+        pub.close()
+
+
 def publish(rabbitmq_url: str, event_type: str, payload: Dict[str, Any]) -> None:
-    conn = pika.BlockingConnection(pika.URLParameters(rabbitmq_url))
+    get_publisher(rabbitmq_url).publish(event_type, payload)
+
+
+def retry_queue_name(queue_name: str, attempt: int) -> str:
+    return f"{queue_name}.retry.{attempt}"
+
+
+def dead_letter_queue_name(queue_name: str) -> str:
+    return f"{queue_name}.dlq"
+
+
+def retry_delay_ms(attempt: int, base_delay_ms: int = RETRY_BASE_DELAY_MS) -> int:
+    return min(base_delay_ms * 2 ** (attempt - 1), RETRY_MAX_DELAY_MS)
+
+
+def declare_retry_topology(ch, queue_name: str, max_attempts: int, base_delay_ms: int) -> None:
+    """
+    One delay queue per attempt. Messages sit there for their TTL, then the
+    broker dead-letters them back onto queue_name through the default exchange.
+    Nothing consumes the delay queues directly.
+    """
+    for attempt in range(1, max_attempts + 1):
+        ch.queue_declare(
+            queue=retry_queue_name(queue_name, attempt),
+            durable=True,
+            arguments={
+                "x-message-ttl": retry_delay_ms(attempt, base_delay_ms),
+                "x-dead-letter-exchange": "",
+                "x-dead-letter-routing-key": queue_name,
+            },
+        )
+    ch.queue_declare(queue=dead_letter_queue_name(queue_name), durable=True)
+
+
+def _republish(chx, target_queue: str, body: bytes, props, headers: Dict[str, Any]) -> None:
+    props = props or pika.BasicProperties(delivery_mode=2)
+    chx.basic_publish(
+        exchange="",
+        routing_key=target_queue,
+        body=body,
+        properties=pika.BasicProperties(
+            content_type=props.content_type,
+            content_encoding=props.content_encoding,
+            delivery_mode=2,
+            message_id=props.message_id,
+            timestamp=props.timestamp,
+            type=props.type,
+            headers=headers,
+        ),
+    )
+
+
+def _retry_later(chx, queue_name: str, method, props, body: bytes, max_attempts: int, dead: bool = False) -> None:
+    """Move a failed delivery to its next delay queue (or the DLQ) and ack it."""
+    headers = dict((props.headers if props else None) or {})
+    attempt = int(headers.get(ATTEMPT_HEADER, 0)) + 1
+    headers[ATTEMPT_HEADER] = attempt
+    headers.setdefault(ORIGINAL_ROUTING_KEY_HEADER, method.routing_key)
+
+    if not dead and attempt <= max_attempts:
+        target = retry_queue_name(queue_name, attempt)
+    else:
+        target = dead_letter_queue_name(queue_name)
+        logger.error("Dead-lettering delivery on queue=%s after %d attempt(s)", queue_name, attempt)
+    _republish(chx, target, body, props, headers)
+    chx.basic_ack(delivery_tag=method.delivery_tag)
+
+
+def _open_consumer(rabbitmq_url: str, queue_name: str, bindings: list[str], max_attempts: int, retry_base_delay_ms: int):
+    conn = connect(rabbitmq_url)
     ch = conn.channel()
     ch.exchange_declare(exchange=EXCHANGE, exchange_type="topic", durable=True)
-    body = json.dumps({"type": event_type, "payload": payload}).encode("utf-8")
-    ch.basic_publish(exchange=EXCHANGE, routing_key=event_type, body=body, properties=pika.BasicProperties(delivery_mode=2))
-    conn.close()
+    ch.queue_declare(queue=queue_name, durable=True)
+
+    for rk in bindings:
+        ch.queue_bind(queue=queue_name, exchange=EXCHANGE, routing_key=rk)
+
+    declare_retry_topology(ch, queue_name, max_attempts, retry_base_delay_ms)
+    return conn, ch
+
 
 def consume(
     rabbitmq_url: str,
     queue_name: str,
     bindings: list[str],
     handler: Callable[[str, Dict[str, Any]], None],
+    prefetch_count: int = 10,
+    workers: int = 1,
+    max_attempts: int = RETRY_MAX_ATTEMPTS,
+    retry_base_delay_ms: int = RETRY_BASE_DELAY_MS,
+    dedup=None,
 ) -> None:
-    conn = pika.BlockingConnection(pika.URLParameters(rabbitmq_url))
-    ch = conn.channel()
-    ch.exchange_declare(exchange=EXCHANGE, exchange_type="topic", durable=True)
-    ch.queue_declare(queue=queue_name, durable=True)
+    """
+    Consume queue_name until the connection dies.
 
-    for rk in bindings:
-        ch.queue_bind(queue=queue_name, exchange=EXCHANGE, routing_key=rk)
+    With a dedup store (shared.dedup.DedupStore), a delivery whose message_id
+    was already handled successfully is acked without calling the handler.
 
-    def _cb(chx, method, props, body: bytes):
+    A failed delivery is acked and re-published to <queue>.retry.<n> (TTL
+    delay queue, exponential backoff) with an x-retry-attempt header; after
+    max_attempts retries, or if the body can't be decoded at all, it goes to
+    <queue>.dlq instead. See shared/dlq.py to inspect/replay those.
+
+    workers <= 1: the handler runs inline on the pika I/O thread.
+    workers > 1:  deliveries are handed to a thread pool so a slow handler
+                  doesn't stall the queue. pika channels are not thread-safe,
+                  so acks/re-publishes are marshalled back onto the connection thread
+                  with add_callback_threadsafe. Keep prefetch_count >= workers
+                  or the extra workers just idle.
+    """
+    conn, ch = _open_consumer(rabbitmq_url, queue_name, bindings, max_attempts, retry_base_delay_ms)
+
+    def _handle(routing_key: str, props, body: bytes) -> str:
+        """Returns "ack", "retry" or "dead"."""
+        message_id = props.message_id if (props is not None and dedup is not None) else None
+        if message_id and dedup.seen(message_id):
+            logger.info("Skipping duplicate message_id=%s on queue=%s", message_id, queue_name)
+            return "ack"
         try:
-            msg = json.loads(body.decode("utf-8"))
-            handler(msg.get("type", method.routing_key), msg.get("payload", {}))
+            event_type, payload = decode_event(routing_key, props, body)
+        except Exception:
+            logger.exception("Undecodable message on queue=%s routing_key=%s", queue_name, routing_key)
+            return "dead"
+        try:
+            handler(event_type, payload)
+            if message_id:
+                dedup.mark(message_id)
+            return "ack"
+        except Exception:
+            logger.exception("Handler failed on queue=%s routing_key=%s", queue_name, routing_key)
+            return "retry"
+
+    def _settle(chx, method, props, body: bytes, outcome: str) -> None:
+        if not chx.is_open:
+            # unacked deliveries are redelivered by the broker anyway
+            return
+        if outcome == "ack":
+            chx.basic_ack(delivery_tag=method.delivery_tag)
+        else:
+            _retry_later(chx, queue_name, method, props, body, max_attempts, dead=outcome == "dead")
+
+    pool = None
+    if workers > 1:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{queue_name}-worker")
+
+        def _cb(chx, method, props, body: bytes):
+            def _work():
+                outcome = _handle(method.routing_key, props, body)
+                try:
+                    conn.add_callback_threadsafe(functools.partial(_settle, chx, method, props, body, outcome))
+                except Exception:
+                    logger.warning("Connection gone; delivery %s will be redelivered", method.delivery_tag)
+
+            pool.submit(_work)
+    else:
+        def _cb(chx, method, props, body: bytes):
+            _settle(chx, method, props, body, _handle(method.routing_key, props, body))
+
+    ch.basic_qos(prefetch_count=prefetch_count)
+    ch.basic_consume(queue=queue_name, on_message_callback=_cb)
+    try:
+        ch.start_consuming()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+def consume_batch(
+    rabbitmq_url: str,
+    queue_name: str,
+    bindings: list[str],
+    batch_handler: Callable[[list[tuple[str, Dict[str, Any]]]], int | None],
+    batch_size: int = 100,
+    batch_timeout_ms: int = 200,
+    prefetch_count: int | None = None,
+    max_attempts: int = RETRY_MAX_ATTEMPTS,
+    retry_base_delay_ms: int = RETRY_BASE_DELAY_MS,
+    dedup=None,
+) -> None:
+    """
+    Like consume(), but batch_handler gets a list of (event_type, payload) of
+    up to batch_size events, or whatever arrived within batch_timeout_ms of
+    the first one, so it can do one bulk insert / one SMTP session per batch.
+
+    batch_handler returns how many leading events it handled (None = all).
+    Those are acked with a single basic_ack(multiple=True) on the last
+    successful tag; the rest, or the whole batch if it raises, go through
+    the usual retry/DLQ path one by one. dedup works as in consume(), and
+    also drops a message whose id is already waiting in the current batch.
+    """
+    conn, ch = _open_consumer(rabbitmq_url, queue_name, bindings, max_attempts, retry_base_delay_ms)
+
+    buffer: list[tuple[Any, Any, bytes, tuple[str, Dict[str, Any]]]] = []
+    # message ids in buffer: not marked in dedup until the batch is handled
+    buffered_ids: set[str] = set()
+    timer = [None]
+
+    def _flush() -> None:
+        if timer[0] is not None:
+            conn.remove_timeout(timer[0])
+            timer[0] = None
+        if not buffer:
+            return
+
+        batch = buffer[:]
+        buffer.clear()
+        buffered_ids.clear()
+        try:
+            done = batch_handler([event for (*_, event) in batch])
+            done = len(batch) if done is None else max(0, min(int(done), len(batch)))
+        except Exception:
+            logger.exception("Batch handler failed on queue=%s (%d events)", queue_name, len(batch))
+            done = 0
+
+        if dedup is not None:
+            for _, props, _, _ in batch[:done]:
+                if props is not None and props.message_id:
+                    dedup.mark(props.message_id)
+
+        if not ch.is_open:
+            return
+        if done:
+            ch.basic_ack(delivery_tag=batch[done - 1][0].delivery_tag, multiple=True)
+        for method, props, body, _ in batch[done:]:
+            _retry_later(ch, queue_name, method, props, body, max_attempts)
+
+    def _on_timer() -> None:
+        timer[0] = None
+        _flush()
+
+    def _cb(chx, method, props, body: bytes):
+        message_id = props.message_id if dedup is not None and props is not None else None
+        if message_id and (message_id in buffered_ids or dedup.seen(message_id)):
+            # the buffered copy is either handled or retried on its own
             chx.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        try:
+            event = decode_event(method.routing_key, props, body)
         except Exception:
-            # if handler fails, requeue for retry
-            chx.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            logger.exception("Undecodable message on queue=%s routing_key=%s", queue_name, method.routing_key)
+            _retry_later(chx, queue_name, method, props, body, max_attempts, dead=True)
+            return
+
+        buffer.append((method, props, body, event))
+        if message_id:
+            buffered_ids.add(message_id)
+        if len(buffer) >= batch_size:
+            _flush()
+        elif timer[0] is None:
+            timer[0] = conn.call_later(batch_timeout_ms / 1000.0, _on_timer)
 
-    ch.basic_qos(prefetch_count=10)
+    ch.basic_qos(prefetch_count=prefetch_count or batch_size)
     ch.basic_consume(queue=queue_name, on_message_callback=_cb)
     ch.start_consuming()
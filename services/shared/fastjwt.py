@@ -0,0 +1,125 @@
+"""
+Minimal HS256-only JWT encode/decode for the per-request hot path.
+
+Byte-for-byte compatible with python-jose for our tokens (same header,
+same JSON separators), so tokens from either side verify on the other.
+Deliberately strict: the header must be exactly {"alg": "HS256"} plus an
+optional "typ": "JWT" (no kid/jku/crit, no alg negotiation), base64url
+must be canonical and unpadded, the signature is compared in constant
+time, and exp/nbf are enforced. Benchmark: python -m shared.bench_jwt
+"""
+import base64
+import functools
+import hashlib
+import hmac
+import json
+import time
+from typing import Any, Dict
+
+ALGO = "HS256"
+
+_HEADER = {"alg": ALGO, "typ": "JWT"}
+HEADER_B64 = base64.urlsafe_b64encode(json.dumps(_HEADER, separators=(",", ":"), sort_keys=True).encode()).rstrip(b"=")
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class ExpiredToken(InvalidToken):
+    pass
+
+
+def b64url_encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64url_decode(data: bytes) -> bytes:
+    if len(data) % 4 == 1:
+        raise InvalidToken("Invalid base64url segment")
+    try:
+        raw = base64.b64decode(data + b"=" * (-len(data) % 4), altchars=b"-_", validate=True)
+    except ValueError:
+        raise InvalidToken("Invalid base64url segment")
+    if b64url_encode(raw) != data:
+        # non-canonical trailing bits -> same bytes, different token string
+        raise InvalidToken("Invalid base64url segment")
+    return raw
+
+
+@functools.lru_cache(maxsize=8)
+def _mac(secret: str):
+    # keyed once per secret; .copy() per token skips re-deriving the pads
+    return hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+
+
+def _sign(signing_input: bytes, secret: str) -> bytes:
+    mac = _mac(secret).copy()
+    mac.update(signing_input)
+    return mac.digest()
+
+
+def encode(claims: Dict[str, Any], secret: str) -> str:
+    payload = b64url_encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    signing_input = HEADER_B64 + b"." + payload
+    return (signing_input + b"." + b64url_encode(_sign(signing_input, secret))).decode("ascii")
+
+
+def decode(token: str, secret: str, typ: str | None = None, leeway: int = 0) -> Dict[str, Any]:
+    """
+    Verify token and return its claims. typ, when given, must match the
+    "typ" claim ("access", "verify", ...). Raises InvalidToken/ExpiredToken.
+    """
+    try:
+        raw = token.encode("ascii")
+    except (UnicodeEncodeError, AttributeError):
+        raise InvalidToken("Token must be ASCII text")
+
+    parts = raw.split(b".")
+    if len(parts) != 3:
+        raise InvalidToken("Token must have three segments")
+    header_b64, payload_b64, sig_b64 = parts
+
+    if header_b64 != HEADER_B64:
+        # the common case is a byte compare; anything else is parsed and checked
+        try:
+            header = json.loads(b64url_decode(header_b64))
+        except ValueError:
+            raise InvalidToken("Invalid header")
+        if not isinstance(header, dict) or header.get("alg") != ALGO or set(header) - {"alg", "typ"}:
+            raise InvalidToken("Unsupported header")
+        if header.get("typ", "JWT") != "JWT":
+            raise InvalidToken("Unsupported header")
+
+    expected = _sign(header_b64 + b"." + payload_b64, secret)
+    if not hmac.compare_digest(expected, b64url_decode(sig_b64)):
+        raise InvalidToken("Signature verification failed")
+
+    try:
+        claims = json.loads(b64url_decode(payload_b64))
+    except ValueError:
+        raise InvalidToken("Invalid payload")
+    if not isinstance(claims, dict):
+        raise InvalidToken("Invalid payload")
+
+    validate_claims(claims, typ, leeway)
+    return claims
+
+
+def validate_claims(claims: Dict[str, Any], typ: str | None = None, leeway: int = 0) -> None:
+    now = time.time()
+    exp = claims.get("exp")
+    if exp is not None:
+        if isinstance(exp, bool) or not isinstance(exp, (int, float)):
+            raise InvalidToken("exp must be a number")
+        if now > exp + leeway:
+            raise ExpiredToken("Token has expired")
+    nbf = claims.get("nbf")
+    if nbf is not None:
+        if isinstance(nbf, bool) or not isinstance(nbf, (int, float)):
+            raise InvalidToken("nbf must be a number")
+        if now < nbf - leeway:
+            raise InvalidToken("Token not yet valid")
+
+    if typ is not None and claims.get("typ") != typ:
+        raise InvalidToken("Invalid token type")
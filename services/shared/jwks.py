@@ -0,0 +1,255 @@
+"""
+Asymmetric (EdDSA / RS256) JWT signing and verification against a JWKS.
+
+auth-service signs with a private key whose `kid` is in the token header
+and publishes the public halves at /.well-known/jwks.json. Other services
+keep those keys in a local KeySet (JwksClient refreshes it in the
+background), so verifying a token is a dict lookup plus a signature check,
+never a call to auth-service. Rotation: publish the next key in the JWKS
+first, switch signing to it once every client has refreshed, and drop the
+old one after its last token expired.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from typing import Any, Dict
+
+from shared.fastjwt import InvalidToken, b64url_decode, b64url_encode, validate_claims
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import ed25519, padding, rsa
+except ImportError:  # optional: only needed once asymmetric tokens are enabled
+    ed25519 = None
+
+logger = logging.getLogger("shared.jwks")
+
+JWKS_REFRESH_INTERVAL = float(os.getenv("JWKS_REFRESH_INTERVAL", "300"))
+# unknown kid -> refresh early, but at most this often (random kids can't hammer auth-service)
+JWKS_MIN_REFRESH_INTERVAL = float(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "30"))
+JWKS_FETCH_TIMEOUT = float(os.getenv("JWKS_FETCH_TIMEOUT", "5"))
+
+ALGORITHMS = ("EdDSA", "RS256")
+
+
+def _require_crypto() -> None:
+    if ed25519 is None:
+        raise RuntimeError("EdDSA/RS256 tokens need the 'cryptography' package")
+
+
+def key_algorithm(key) -> str:
+    _require_crypto()
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "EdDSA"
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "RS256"
+    raise ValueError(f"Unsupported key type {type(key).__name__}")
+
+
+def _int_b64(n: int) -> str:
+    return b64url_encode(n.to_bytes((n.bit_length() + 7) // 8, "big")).decode("ascii")
+
+
+def _b64_int(s: str) -> int:
+    return int.from_bytes(b64url_decode(s.encode("ascii")), "big")
+
+
+def public_jwk(public_key, kid: str) -> Dict[str, Any]:
+    alg = key_algorithm(public_key)
+    if alg == "EdDSA":
+        from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+        x = public_key.public_bytes(Encoding.Raw, PublicFormat.Raw)
+        return {"kty": "OKP", "crv": "Ed25519", "x": b64url_encode(x).decode("ascii"), "alg": alg, "use": "sig", "kid": kid}
+    numbers = public_key.public_numbers()
+    return {"kty": "RSA", "n": _int_b64(numbers.n), "e": _int_b64(numbers.e), "alg": alg, "use": "sig", "kid": kid}
+
+
+def key_from_jwk(jwk: Dict[str, Any]):
+    _require_crypto()
+    kty = jwk.get("kty")
+    if kty == "OKP" and jwk.get("crv") == "Ed25519":
+        return ed25519.Ed25519PublicKey.from_public_bytes(b64url_decode(jwk["x"].encode("ascii")))
+    if kty == "RSA":
+        return rsa.RSAPublicNumbers(_b64_int(jwk["e"]), _b64_int(jwk["n"])).public_key()
+    raise ValueError(f"Unsupported JWK kty={kty!r} crv={jwk.get('crv')!r}")
+
+
+def sign(claims: Dict[str, Any], private_key, kid: str) -> str:
+    alg = key_algorithm(private_key)
+    header = b64url_encode(json.dumps({"alg": alg, "kid": kid, "typ": "JWT"}, separators=(",", ":"), sort_keys=True).encode())
+    payload = b64url_encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    signing_input = header + b"." + payload
+    if alg == "EdDSA":
+        sig = private_key.sign(signing_input)
+    else:
+        sig = private_key.sign(signing_input, padding.PKCS1v15(), hashes.SHA256())
+    return (signing_input + b"." + b64url_encode(sig)).decode("ascii")
+
+
+class KeySet:
+    """
+    kid -> (alg, public key). Lookups read a dict that is swapped wholesale
+    on replace(), so they never wait on a refresh in progress.
+    """
+
+    def __init__(self, keys: Dict[str, Any] | None = None):
+        self._keys: Dict[str, tuple[str, Any]] = {}
+        if keys:
+            self.replace(keys)
+
+    def replace(self, keys: Dict[str, Any]) -> None:
+        self._keys = {kid: (key_algorithm(key), key) for kid, key in keys.items()}
+
+    def kids(self) -> list[str]:
+        return sorted(self._keys)
+
+    def get(self, kid: str) -> tuple[str, Any] | None:
+        entry = self._keys.get(kid)
+        if entry is None:
+            self.on_miss(kid)
+        return entry
+
+    def on_miss(self, kid: str) -> None:
+        pass
+
+
+def verify(token: str, keys: KeySet, typ: str | None = None, leeway: int = 0) -> Dict[str, Any]:
+    """Verify an EdDSA/RS256 token against keys. Raises shared.fastjwt.InvalidToken."""
+    try:
+        raw = token.encode("ascii")
+    except (UnicodeEncodeError, AttributeError):
+        raise InvalidToken("Token must be ASCII text")
+    parts = raw.split(b".")
+    if len(parts) != 3:
+        raise InvalidToken("Token must have three segments")
+    header_b64, payload_b64, sig_b64 = parts
+
+    try:
+        header = json.loads(b64url_decode(header_b64))
+    except ValueError:
+        raise InvalidToken("Invalid header")
+    if not isinstance(header, dict) or set(header) - {"alg", "kid", "typ"} or header.get("typ", "JWT") != "JWT":
+        raise InvalidToken("Unsupported header")
+    kid, alg = header.get("kid"), header.get("alg")
+    if not isinstance(kid, str) or alg not in ALGORITHMS:
+        raise InvalidToken("Unsupported header")
+
+    entry = keys.get(kid)
+    if entry is None:
+        raise InvalidToken("Unknown key id")
+    key_alg, public_key = entry
+    if alg != key_alg:
+        # the key decides the algorithm, never the token
+        raise InvalidToken("Algorithm does not match key")
+
+    sig = b64url_decode(sig_b64)
+    signing_input = header_b64 + b"." + payload_b64
+    try:
+        if alg == "EdDSA":
+            public_key.verify(sig, signing_input)
+        else:
+            public_key.verify(sig, signing_input, padding.PKCS1v15(), hashes.SHA256())
+    except InvalidSignature:
+        raise InvalidToken("Signature verification failed")
+
+    try:
+        claims = json.loads(b64url_decode(payload_b64))
+    except ValueError:
+        raise InvalidToken("Invalid payload")
+    if not isinstance(claims, dict):
+        raise InvalidToken("Invalid payload")
+    validate_claims(claims, typ, leeway)
+    return claims
+
+
+def fetch_jwks(url: str, timeout: float = JWKS_FETCH_TIMEOUT) -> Dict[str, Any]:
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+
+class JwksClient(KeySet):
+    """
+    KeySet kept in sync with a JWKS URL by a daemon thread. A failed fetch
+    keeps the last good keys. A token with an unknown kid wakes the thread
+    early (rate-limited) instead of fetching on the request path.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        refresh_interval: float = JWKS_REFRESH_INTERVAL,
+        min_refresh_interval: float = JWKS_MIN_REFRESH_INTERVAL,
+    ):
+        super().__init__()
+        self._url = url
+        self._refresh_interval = refresh_interval
+        self._min_refresh_interval = min_refresh_interval
+        self._last_fetch = float("-inf")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def refresh(self) -> bool:
+        self._last_fetch = time.monotonic()
+        try:
+            doc = fetch_jwks(self._url)
+        except Exception as e:
+            logger.warning("JWKS fetch from %s failed, keeping %d known key(s): %s", self._url, len(self._keys), e)
+            return False
+
+        if not isinstance(doc, dict) or not isinstance(doc.get("keys", []), list):
+            logger.warning("JWKS from %s is not a key set, keeping %d known key(s)", self._url, len(self._keys))
+            return False
+
+        keys = {}
+        for jwk in doc.get("keys", []):
+            if not isinstance(jwk, dict):
+                logger.warning("Skipping JWK that is not an object: %r", jwk)
+                continue
+            try:
+                keys[jwk["kid"]] = key_from_jwk(jwk)
+            except Exception as e:
+                logger.warning("Skipping unusable JWK kid=%s: %s", jwk.get("kid"), e)
+        self.replace(keys)
+        return True
+
+    def on_miss(self, kid: str) -> None:
+        if time.monotonic() - self._last_fetch >= self._min_refresh_interval:
+            self._wake.set()
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self._refresh_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                if time.monotonic() - self._last_fetch >= self._min_refresh_interval:
+                    self.refresh()
+            except Exception:
+                # never let one bad refresh end the thread: rotations would stop being picked up
+                logger.exception("JWKS refresh from %s failed", self._url)
+
+    def start(self, initial_fetch: bool = True) -> None:
+        """initial_fetch: load keys once before returning (call from startup)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if initial_fetch:
+            self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="jwks-refresh", daemon=True)
+        self._thread.start()
+        if not initial_fetch:
+            self._wake.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
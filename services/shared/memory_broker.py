@@ -0,0 +1,504 @@
+"""
+In-process stand-in for RabbitMQ, selected with a memory://<name> broker URL
+(e.g. RABBITMQ_URL=memory://local). It implements the subset of pika's
+BlockingConnection / BlockingChannel API that shared.events uses, with the
+same semantics where they matter:
+
+- topic exchanges ("*" = one word, "#" = zero or more) and the default
+  exchange ("" routes straight to the queue named by the routing key)
+- durable queues and persistent (delivery_mode=2) messages survive
+  MemoryBroker.restart(); everything else is dropped
+- per-channel prefetch, ack/nack (multiple, requeue), redelivery of unacked
+  messages when a connection closes
+- server-named ("") and exclusive queues (deleted with their connection)
+- x-message-ttl + x-dead-letter-exchange/-routing-key (retry delay queues)
+- add_callback_threadsafe / call_later for the consumer I/O loop
+
+All connections with the same name share one MemoryBroker per process.
+"""
+import functools
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from types import SimpleNamespace
+
+import pika
+from pika.exceptions import ChannelClosedByBroker, ChannelWrongStateError, ConnectionWrongStateError, UnroutableError
+
+
+@functools.lru_cache(maxsize=4096)
+def topic_matches(pattern: str, routing_key: str) -> bool:
+    p = pattern.split(".")
+    k = routing_key.split(".")
+
+    def match(i: int, j: int) -> bool:
+        if i == len(p):
+            return j == len(k)
+        if p[i] == "#":
+            return any(match(i + 1, jj) for jj in range(j, len(k) + 1))
+        if j == len(k):
+            return False
+        return (p[i] == "*" or p[i] == k[j]) and match(i + 1, j + 1)
+
+    return match(0, 0)
+
+
+class _Message:
+    __slots__ = ("exchange", "routing_key", "body", "properties", "redelivered")
+
+    def __init__(self, exchange: str, routing_key: str, body: bytes, properties):
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.body = body
+        self.properties = properties or pika.BasicProperties()
+        self.redelivered = False
+
+    @property
+    def persistent(self) -> bool:
+        return self.properties.delivery_mode == 2
+
+
+class _Queue:
+    def __init__(self, name: str, durable: bool, arguments: dict | None):
+        self.name = name
+        self.durable = durable
+        self.arguments = dict(arguments or {})
+        self.messages: deque[_Message] = deque()
+        # exclusive queues: the declaring connection; deleted when it closes
+        self.owner = None
+
+
+class MemoryBroker:
+    def __init__(self, name: str):
+        self.name = name
+        # one lock for all broker state; also used to wake consumer loops
+        self.cond = threading.Condition(threading.RLock())
+        self.exchanges: dict[str, tuple[str, bool]] = {"": ("direct", True)}
+        self.queues: dict[str, _Queue] = {}
+        self.bindings: dict[str, list[tuple[str, str]]] = {}
+        self.connections: set["MemoryConnection"] = set()
+
+    # ---- topology -----------------------------------------------------
+    def declare_exchange(self, name: str, exchange_type: str, durable: bool) -> None:
+        with self.cond:
+            existing = self.exchanges.get(name)
+            if existing is not None and existing[0] != exchange_type:
+                raise ChannelClosedByBroker(406, f"PRECONDITION_FAILED - inequivalent arg 'type' for exchange '{name}'")
+            self.exchanges.setdefault(name, (exchange_type, durable))
+
+    def declare_queue(self, name: str, durable: bool, arguments: dict | None, owner=None) -> _Queue:
+        with self.cond:
+            if not name:
+                name = f"amq.gen-{uuid.uuid4().hex}"
+            q = self.queues.get(name)
+            if q is None:
+                q = self.queues[name] = _Queue(name, durable, arguments)
+                q.owner = owner
+            elif (arguments or {}) != q.arguments:
+                raise ChannelClosedByBroker(406, f"PRECONDITION_FAILED - inequivalent arg for queue '{name}'")
+            return q
+
+    def bind(self, queue: str, exchange: str, routing_key: str) -> None:
+        with self.cond:
+            if exchange not in self.exchanges:
+                raise ChannelClosedByBroker(404, f"NOT_FOUND - no exchange '{exchange}'")
+            if queue not in self.queues:
+                raise ChannelClosedByBroker(404, f"NOT_FOUND - no queue '{queue}'")
+            pairs = self.bindings.setdefault(exchange, [])
+            if (routing_key, queue) not in pairs:
+                pairs.append((routing_key, queue))
+
+    # ---- messages -----------------------------------------------------
+    def route(self, exchange: str, routing_key: str, body: bytes, properties) -> int:
+        with self.cond:
+            if exchange not in self.exchanges:
+                raise ChannelClosedByBroker(404, f"NOT_FOUND - no exchange '{exchange}'")
+
+            if exchange == "":
+                targets = [routing_key] if routing_key in self.queues else []
+            else:
+                kind = self.exchanges[exchange][0]
+                targets = []
+                for pattern, qname in self.bindings.get(exchange, []):
+                    hit = topic_matches(pattern, routing_key) if kind == "topic" else pattern == routing_key
+                    if kind == "fanout" or hit:
+                        if qname not in targets:
+                            targets.append(qname)
+
+            for qname in targets:
+                self._enqueue(self.queues[qname], _Message(exchange, routing_key, body, properties))
+            if targets:
+                self.cond.notify_all()
+            return len(targets)
+
+    def _enqueue(self, q: _Queue, msg: _Message) -> None:
+        q.messages.append(msg)
+        ttl = q.arguments.get("x-message-ttl")
+        if ttl is not None:
+            t = threading.Timer(ttl / 1000.0, self._expire, (q, msg))
+            t.daemon = True
+            t.start()
+
+    def _expire(self, q: _Queue, msg: _Message) -> None:
+        with self.cond:
+            for i, m in enumerate(q.messages):
+                if m is msg:
+                    del q.messages[i]
+                    break
+            else:
+                return  # already consumed
+
+            dlx = q.arguments.get("x-dead-letter-exchange")
+            if dlx is not None:
+                rk = q.arguments.get("x-dead-letter-routing-key", msg.routing_key)
+                self.route(dlx, rk, msg.body, msg.properties)
+
+    def requeue(self, qname: str, msgs: list[_Message]) -> None:
+        with self.cond:
+            q = self.queues.get(qname)
+            if q is None:
+                return
+            # back at the head, original order, like RabbitMQ
+            for msg in reversed(msgs):
+                msg.redelivered = True
+                q.messages.appendleft(msg)
+            self.cond.notify_all()
+
+    def restart(self) -> None:
+        """Simulate a broker restart: connections drop, only durable state survives."""
+        with self.cond:
+            for conn in list(self.connections):
+                conn.close()
+            self.exchanges = {k: v for k, v in self.exchanges.items() if v[1]}
+            self.queues = {k: q for k, q in self.queues.items() if q.durable}
+            for q in self.queues.values():
+                q.messages = deque(m for m in q.messages if m.persistent)
+            self.bindings = {
+                ex: [(rk, qn) for (rk, qn) in pairs if qn in self.queues]
+                for ex, pairs in self.bindings.items()
+                if ex in self.exchanges
+            }
+
+    def delete_queues(self, predicate) -> None:
+        with self.cond:
+            gone = {name for name, q in self.queues.items() if predicate(q)}
+            for name in gone:
+                del self.queues[name]
+            if gone:
+                for ex, pairs in self.bindings.items():
+                    self.bindings[ex] = [(rk, qn) for (rk, qn) in pairs if qn not in gone]
+
+    def close_connections(self) -> None:
+        with self.cond:
+            for conn in list(self.connections):
+                conn.close()
+
+    def message_count(self, queue: str) -> int:
+        with self.cond:
+            q = self.queues.get(queue)
+            return len(q.messages) if q else 0
+
+
+class MemoryChannel:
+    def __init__(self, conn: "MemoryConnection", number: int):
+        self.connection = conn
+        self.channel_number = number
+        self.is_open = True
+        self._broker = conn.broker
+        self._prefetch = 0
+        self._tags = itertools.count(1)
+        self._unacked: "OrderedDict[int, tuple[str, _Message]]" = OrderedDict()
+        self._consumers: "OrderedDict[str, tuple[str, object, bool]]" = OrderedDict()
+        self._consuming = False
+
+    @property
+    def is_closed(self) -> bool:
+        return not self.is_open
+
+    def _check(self) -> None:
+        if not self.is_open:
+            raise ChannelWrongStateError("Channel is closed.")
+
+    def _fail(self, exc: Exception):
+        # a broker-side channel error closes the channel, as in RabbitMQ
+        self._close(requeue=True)
+        raise exc
+
+    # ---- topology -----------------------------------------------------
+    def exchange_declare(self, exchange: str, exchange_type: str = "direct", durable: bool = False, **_):
+        self._check()
+        try:
+            self._broker.declare_exchange(exchange, str(exchange_type), durable)
+        except ChannelClosedByBroker as e:
+            self._fail(e)
+
+    def queue_declare(
+        self, queue: str, durable: bool = False, exclusive: bool = False, arguments: dict | None = None, **_
+    ):
+        self._check()
+        try:
+            q = self._broker.declare_queue(queue, durable, arguments, owner=self.connection if exclusive else None)
+        except ChannelClosedByBroker as e:
+            self._fail(e)
+        return SimpleNamespace(method=SimpleNamespace(queue=q.name, message_count=len(q.messages), consumer_count=0))
+
+    def queue_bind(self, queue: str, exchange: str, routing_key: str | None = None, **_):
+        self._check()
+        try:
+            self._broker.bind(queue, exchange, routing_key if routing_key is not None else queue)
+        except ChannelClosedByBroker as e:
+            self._fail(e)
+
+    def basic_qos(self, prefetch_size: int = 0, prefetch_count: int = 0, global_qos: bool = False):
+        self._check()
+        self._prefetch = prefetch_count
+
+    def confirm_delivery(self):
+        # routing is synchronous, so every publish is already "confirmed"
+        self._check()
+
+    # ---- publish ------------------------------------------------------
+    def basic_publish(self, exchange: str, routing_key: str, body: bytes, properties=None, mandatory: bool = False):
+        self._check()
+        try:
+            routed = self._broker.route(exchange, routing_key, body, properties)
+        except ChannelClosedByBroker as e:
+            self._fail(e)
+        if mandatory and not routed:
+            raise UnroutableError([SimpleNamespace(body=body, properties=properties)])
+
+    # ---- consume ------------------------------------------------------
+    def basic_consume(self, queue: str, on_message_callback, auto_ack: bool = False, consumer_tag: str | None = None, **_):
+        self._check()
+        with self._broker.cond:
+            if queue not in self._broker.queues:
+                self._fail(ChannelClosedByBroker(404, f"NOT_FOUND - no queue '{queue}'"))
+            tag = consumer_tag or f"ctag{self.channel_number}.{len(self._consumers) + 1}"
+            self._consumers[tag] = (queue, on_message_callback, auto_ack)
+            self._broker.cond.notify_all()
+        return tag
+
+    def basic_cancel(self, consumer_tag: str):
+        with self._broker.cond:
+            self._consumers.pop(consumer_tag, None)
+
+    def _take(self, qname: str, auto_ack: bool):
+        """Pop the next message of qname as a delivery. Caller holds cond."""
+        q = self._broker.queues.get(qname)
+        if q is None or not q.messages:
+            return None
+        msg = q.messages.popleft()
+        tag = next(self._tags)
+        if not auto_ack:
+            self._unacked[tag] = (qname, msg)
+        method = pika.spec.Basic.Deliver(
+            delivery_tag=tag, redelivered=msg.redelivered, exchange=msg.exchange, routing_key=msg.routing_key
+        )
+        return method, msg
+
+    def basic_get(self, queue: str, auto_ack: bool = False):
+        self._check()
+        with self._broker.cond:
+            got = self._take(queue, auto_ack)
+        if got is None:
+            return None, None, None
+        method, msg = got
+        return method, msg.properties, msg.body
+
+    def _settle(self, delivery_tag: int, multiple: bool) -> list[tuple[str, _Message]]:
+        if multiple:
+            tags = [t for t in self._unacked if t <= delivery_tag] if delivery_tag else list(self._unacked)
+        else:
+            tags = [delivery_tag]
+        if not tags or any(t not in self._unacked for t in tags):
+            self._fail(ChannelClosedByBroker(406, f"PRECONDITION_FAILED - unknown delivery tag {delivery_tag}"))
+        return [self._unacked.pop(t) for t in tags]
+
+    def basic_ack(self, delivery_tag: int = 0, multiple: bool = False):
+        self._check()
+        with self._broker.cond:
+            self._settle(delivery_tag, multiple)
+            self._broker.cond.notify_all()
+
+    def basic_nack(self, delivery_tag: int = 0, multiple: bool = False, requeue: bool = True):
+        self._check()
+        with self._broker.cond:
+            settled = self._settle(delivery_tag, multiple)
+            if requeue:
+                by_queue: dict[str, list[_Message]] = {}
+                for qname, msg in settled:
+                    by_queue.setdefault(qname, []).append(msg)
+                for qname, msgs in by_queue.items():
+                    self._broker.requeue(qname, msgs)
+            self._broker.cond.notify_all()
+
+    def basic_reject(self, delivery_tag: int, requeue: bool = True):
+        self.basic_nack(delivery_tag, multiple=False, requeue=requeue)
+
+    def _deliveries(self) -> list:
+        """Deliveries allowed by prefetch, round-robin over consumers. Caller holds cond."""
+        out = []
+        progress = True
+        while progress:
+            progress = False
+            for qname, cb, auto_ack in list(self._consumers.values()):
+                if self._prefetch and len(self._unacked) >= self._prefetch:
+                    return out
+                got = self._take(qname, auto_ack)
+                if got is not None:
+                    method, msg = got
+                    out.append(functools.partial(cb, self, method, msg.properties, msg.body))
+                    progress = True
+        return out
+
+    def start_consuming(self):
+        self._check()
+        conn = self.connection
+        cond = self._broker.cond
+        self._consuming = True
+        while self._consuming and self.is_open and conn.is_open:
+            with cond:
+                work = conn._pop_ready()
+                work += self._deliveries()
+                if not work:
+                    cond.wait(conn._next_timer_in())
+                    continue
+            for fn in work:
+                if not (self.is_open and conn.is_open):
+                    break
+                fn()
+
+    def stop_consuming(self, consumer_tag: str | None = None):
+        self._consuming = False
+        with self._broker.cond:
+            self._broker.cond.notify_all()
+
+    # ---- lifecycle ----------------------------------------------------
+    def _close(self, requeue: bool) -> None:
+        with self._broker.cond:
+            if not self.is_open:
+                return
+            self.is_open = False
+            self._consuming = False
+            self._consumers.clear()
+            pending: dict[str, list[_Message]] = {}
+            for qname, msg in self._unacked.values():
+                pending.setdefault(qname, []).append(msg)
+            self._unacked.clear()
+            if requeue:
+                for qname, msgs in pending.items():
+                    self._broker.requeue(qname, msgs)
+            self._broker.cond.notify_all()
+
+    def close(self, reply_code: int = 0, reply_text: str = "Normal shutdown"):
+        self._close(requeue=True)
+
+
+class MemoryConnection:
+    def __init__(self, broker: MemoryBroker):
+        self.broker = broker
+        self.is_open = True
+        self._channels: list[MemoryChannel] = []
+        self._callbacks: deque = deque()
+        self._timers: list = []
+        self._timer_ids = itertools.count(1)
+        self._cancelled: set[int] = set()
+        with broker.cond:
+            broker.connections.add(self)
+
+    @property
+    def is_closed(self) -> bool:
+        return not self.is_open
+
+    def channel(self, channel_number: int | None = None) -> MemoryChannel:
+        if not self.is_open:
+            raise ConnectionWrongStateError("Connection is closed.")
+        ch = MemoryChannel(self, channel_number or len(self._channels) + 1)
+        self._channels.append(ch)
+        return ch
+
+    def add_callback_threadsafe(self, callback) -> None:
+        with self.broker.cond:
+            if not self.is_open:
+                raise ConnectionWrongStateError("Connection is closed.")
+            self._callbacks.append(callback)
+            self.broker.cond.notify_all()
+
+    def call_later(self, delay: float, callback) -> int:
+        with self.broker.cond:
+            timer_id = next(self._timer_ids)
+            heapq.heappush(self._timers, (time.monotonic() + delay, timer_id, callback))
+            self.broker.cond.notify_all()
+            return timer_id
+
+    def remove_timeout(self, timeout_id: int) -> None:
+        with self.broker.cond:
+            self._cancelled.add(timeout_id)
+
+    def _pop_ready(self) -> list:
+        """Thread-safe callbacks and due timers. Caller holds cond."""
+        ready = list(self._callbacks)
+        self._callbacks.clear()
+        now = time.monotonic()
+        while self._timers and self._timers[0][0] <= now:
+            _, timer_id, cb = heapq.heappop(self._timers)
+            if timer_id in self._cancelled:
+                self._cancelled.discard(timer_id)
+            else:
+                ready.append(cb)
+        return ready
+
+    def _next_timer_in(self) -> float:
+        # bounded so a lost wakeup can never hang the loop
+        if not self._timers:
+            return 1.0
+        return max(0.0, min(1.0, self._timers[0][0] - time.monotonic()))
+
+    def process_data_events(self, time_limit: float = 0) -> None:
+        with self.broker.cond:
+            work = self._pop_ready()
+        for fn in work:
+            fn()
+
+    def sleep(self, duration: float) -> None:
+        time.sleep(duration)
+
+    def close(self, reply_code: int = 200, reply_text: str = "Normal shutdown") -> None:
+        with self.broker.cond:
+            if not self.is_open:
+                return
+            for ch in self._channels:
+                ch._close(requeue=True)
+            self.is_open = False
+            self.broker.connections.discard(self)
+            self.broker.delete_queues(lambda q: q.owner is self)
+            self.broker.cond.notify_all()
+
+
+_brokers: dict[str, MemoryBroker] = {}
+_brokers_lock = threading.Lock()
+
+
+def get_broker(name: str) -> MemoryBroker:
+    with _brokers_lock:
+        broker = _brokers.get(name)
+        if broker is None:
+            broker = _brokers[name] = MemoryBroker(name)
+        return broker
+
+
+def reset_brokers() -> None:
+    with _brokers_lock:
+        brokers = list(_brokers.values())
+        _brokers.clear()
+    for broker in brokers:
+        broker.close_connections()
+
+
+def connect(url: str) -> MemoryConnection:
+    """memory://<name>[/...] -> a new connection to the named in-process broker."""
+    name = url.split("://", 1)[1].split("/", 1)[0] or "default"
+    return MemoryConnection(get_broker(name))
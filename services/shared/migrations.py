@@ -0,0 +1,128 @@
+"""
+Versioned schema migrations, run at startup instead of create_all.
+
+Each service lists its steps in app/migrations.py:
+
+    MIGRATIONS = [
+        Migration(1, "baseline", create_tables(Base.metadata, ["users", ...])),
+        Migration(2, "users_created_at", "ALTER TABLE users ADD COLUMN IF NOT EXISTS created_at TIMESTAMP"),
+    ]
+
+and startup calls migrate(engine, MIGRATIONS, DB_SCHEMA). When the database
+is already at head that is one SELECT. Otherwise, on Postgres, the steps run
+in a single transaction under an advisory lock, so replicas booting
+together apply them once: the others wait, then find nothing left to do.
+
+The baseline creates the listed tables from the *current* models
+(checkfirst, so databases that predate migrations are left as they are).
+Later steps may therefore find their change already present on a fresh
+database and must be written to tolerate that (IF NOT EXISTS).
+"""
+import logging
+from typing import Callable, Sequence
+
+from sqlalchemy import MetaData, event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger("shared.migrations")
+
+VERSION_TABLE = "schema_migrations"
+
+
+class Migration:
+    """step: SQL string, list of SQL strings, or fn(conn)."""
+
+    def __init__(self, version: int, name: str, step: str | Sequence[str] | Callable[[Connection], None]):
+        self.version = version
+        self.name = name
+        self.step = step
+
+    def apply(self, conn: Connection) -> None:
+        if callable(self.step):
+            self.step(conn)
+            return
+        for sql in [self.step] if isinstance(self.step, str) else self.step:
+            conn.execute(text(sql))
+
+
+def create_tables(metadata: MetaData, names: Sequence[str]) -> Callable[[Connection], None]:
+    def step(conn: Connection) -> None:
+        metadata.create_all(conn, tables=[metadata.tables[name] for name in names], checkfirst=True)
+
+    return step
+
+
+def use_schema(engine: Engine, schema: str) -> None:
+    """Postgres: every new pooled connection gets search_path = schema."""
+    if engine.dialect.name != "postgresql" or not schema:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_search_path(dbapi_conn, connection_record):
+        # outside a transaction, or the pool's reset-on-return rollback would undo it
+        autocommit = dbapi_conn.autocommit
+        dbapi_conn.autocommit = True
+        cursor = dbapi_conn.cursor()
+        cursor.execute(f'SET search_path TO "{schema}"')
+        cursor.close()
+        dbapi_conn.autocommit = autocommit
+
+
+def _version_table(engine: Engine, schema: str | None) -> str:
+    if engine.dialect.name == "postgresql" and schema:
+        return f'"{schema}".{VERSION_TABLE}'
+    return VERSION_TABLE
+
+
+def current_version(engine: Engine, schema: str | None = None) -> int:
+    """Highest applied version; 0 if nothing (or no version table) yet."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text(f"SELECT max(version) FROM {_version_table(engine, schema)}")).scalar() or 0
+    except DBAPIError:
+        return 0
+
+
+def _check_order(migrations: Sequence[Migration]) -> None:
+    versions = [m.version for m in migrations]
+    if any(v <= 0 for v in versions) or versions != sorted(set(versions)):
+        raise ValueError(f"Migration versions must be positive and strictly increasing, got {versions}")
+
+
+def migrate(engine: Engine, migrations: Sequence[Migration], schema: str | None = None) -> int:
+    """Bring the database to the last migration. Returns how many steps were applied."""
+    _check_order(migrations)
+    head = migrations[-1].version if migrations else 0
+
+    current = current_version(engine, schema)
+    if current >= head:
+        if current > head:
+            logger.warning("Schema %s is at version %d, newer than this build's head %d", schema, current, head)
+        return 0
+
+    table = _version_table(engine, schema)
+    applied = 0
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # lock first: concurrent CREATE SCHEMA IF NOT EXISTS can itself fail
+            conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"{VERSION_TABLE}:{schema}"})
+            if schema:
+                conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+                conn.execute(text(f'SET LOCAL search_path TO "{schema}"'))
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "version INTEGER PRIMARY KEY, name VARCHAR(200) NOT NULL, "
+                "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+            )
+        )
+        done = set(conn.execute(text(f"SELECT version FROM {table}")).scalars())
+        for m in migrations:
+            if m.version in done:
+                continue
+            logger.info("Applying migration %d_%s to %s", m.version, m.name, schema or "default schema")
+            m.apply(conn)
+            conn.execute(text(f"INSERT INTO {table} (version, name) VALUES (:v, :n)"), {"v": m.version, "n": m.name})
+            applied += 1
+    return applied
@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+
+from sqlalchemy import JSON, DateTime, String, select
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from shared.events import get_publisher
+
+logger = logging.getLogger("shared.outbox")
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+
+
+class OutboxMixin:
+    """
+    Columns of the transactional outbox table. Each service maps it onto its
+    own Base so the table lives in the service schema and is created with the
+    rest of its models:
+
+        class OutboxEvent(OutboxMixin, Base):
+            __tablename__ = "outbox_events"
+    """
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # stable across relay retries so consumers can de-duplicate redeliveries
+    message_id: Mapped[str] = mapped_column(String(64), default=lambda: uuid.uuid4().hex)
+    event_type: Mapped[str] = mapped_column(String(100))
+    payload: Mapped[Dict[str, Any]] = mapped_column(JSON)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+
+def add_event(db: Session, model: type, event_type: str, payload: Dict[str, Any]) -> None:
+    """
+    Stage an event in the caller's transaction. It only becomes visible to
+    the relay (and thus the broker) if that transaction commits.
+    """
+    db.add(model(event_type=event_type, payload=payload))
+
+
+class OutboxRelay:
+    """
+    Background worker that drains the outbox to RabbitMQ in id order.
+
+    Postgres: rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any
+    number of replicas can relay concurrently without double-sending.
+    SQLite (local/tests): a process-wide lock serializes drains instead.
+
+    Delivery is at-least-once: a crash between publish and commit resends
+    the batch on the next drain.
+    """
+
+    _sqlite_lock = threading.Lock()
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        model: type,
+        rabbitmq_url: str,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+    ):
+        self._session_factory = session_factory
+        self._model = model
+        self._rabbitmq_url = rabbitmq_url
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def drain_once(self) -> int:
+        """Relay one batch. Returns the number of events published."""
+        with self._session_factory() as db:
+            if db.get_bind().dialect.name == "postgresql":
+                return self._drain(db, skip_locked=True)
+            with self._sqlite_lock:
+                return self._drain(db, skip_locked=False)
+
+    def _drain(self, db: Session, skip_locked: bool) -> int:
+        q = select(self._model).order_by(self._model.id).limit(self._batch_size)
+        if skip_locked:
+            q = q.with_for_update(skip_locked=True)
+
+        publisher = get_publisher(self._rabbitmq_url)
+        sent = 0
+        with db.begin():
+            for row in db.scalars(q).all():
+                try:
+                    publisher.publish(row.event_type, row.payload, message_id=row.message_id)
+                except Exception:
+                    # keep this row (and everything after it) for the next drain
+                    logger.exception("Outbox relay failed on event id=%s type=%s", row.id, row.event_type)
+                    break
+                db.delete(row)
+                sent += 1
+        return sent
+
+    def wake(self) -> None:
+        """Hint that new rows were committed, so the relay skips its poll wait."""
+        self._wake.set()
+
+    def run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                sent = self.drain_once()
+            except Exception:
+                logger.exception("Outbox relay drain failed")
+                sent = 0
+
+            # full batch -> there is probably more; drain again right away
+            if sent < self._batch_size:
+                self._wake.wait(self._poll_interval)
+                self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="outbox-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
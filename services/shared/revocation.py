@@ -0,0 +1,237 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger("shared.revocation")
+
+TOKEN_REVOKED = "token.revoked"
+
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+REVOCATION_PRUNE_INTERVAL = float(os.getenv("REVOCATION_PRUNE_INTERVAL", "60"))
+# auth-service's list of currently revoked jtis, fetched on (re)connect to catch up
+REVOCATIONS_URL = os.getenv("REVOCATIONS_URL", "")
+# Shared secret for that feed (sent as a Bearer token); auth-service serves
+# the feed only when it is set, to callers that present it
+REVOCATIONS_TOKEN = os.getenv("REVOCATIONS_TOKEN", "")
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (blake2b + double hashing)."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationList:
+    """
+    Revoked token ids (jti) with their exp. A Bloom filter answers the
+    common "not revoked" case without touching the exact map; a hit is
+    confirmed against the exact jti -> exp map. Entries past exp are pruned
+    and the filter is rebuilt from what is left (Bloom filters can't delete),
+    so memory tracks the number of revoked tokens that are still valid.
+    """
+
+    def __init__(
+        self,
+        capacity: int = REVOCATION_BLOOM_CAPACITY,
+        error_rate: float = REVOCATION_BLOOM_ERROR_RATE,
+        prune_interval: float = REVOCATION_PRUNE_INTERVAL,
+    ):
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._exact: Dict[str, float] = {}
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._next_prune = time.monotonic() + prune_interval
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def revoke(self, jti: str, exp: float) -> None:
+        if exp <= time.time():
+            return  # already unusable
+        with self._lock:
+            if len(self._exact) >= self._bloom.capacity:
+                self._rebuild(self._bloom.capacity * 2)
+            self._bloom.add(jti)
+            self._exact[jti] = exp
+        self.maybe_prune()
+
+    def is_revoked(self, jti: str | None) -> bool:
+        if not jti or not self._exact:
+            return False
+        if jti not in self._bloom:
+            return False
+        return jti in self._exact
+
+    def maybe_prune(self) -> None:
+        if time.monotonic() >= self._next_prune:
+            self.prune()
+
+    def prune(self) -> int:
+        now = time.time()
+        with self._lock:
+            self._next_prune = time.monotonic() + self._prune_interval
+            expired = [jti for jti, exp in self._exact.items() if exp <= now]
+            for jti in expired:
+                del self._exact[jti]
+            if expired:
+                self._rebuild(max(self._capacity, len(self._exact) * 2))
+        return len(expired)
+
+    def _rebuild(self, capacity: int) -> None:
+        # caller holds the lock; readers keep using the old filter until the swap
+        bloom = BloomFilter(capacity, self._error_rate)
+        for jti in self._exact:
+            bloom.add(jti)
+        self._bloom = bloom
+
+
+class RevocationListener:
+    """
+    Keeps a RevocationList current from token.revoked events. Every process
+    gets its own exclusive, auto-deleted queue (each replica must see every
+    revocation). On each (re)connect it binds first, then catches up via
+    bootstrap() (-> [{"jti", "exp"}, ...]), then consumes, so nothing
+    published in between is lost.
+    """
+
+    def __init__(
+        self,
+        rabbitmq_url: str,
+        revocations: RevocationList,
+        bootstrap: Callable[[], List[Dict[str, Any]]] | None = None,
+        retry_interval: float = 5.0,
+    ):
+        self._rabbitmq_url = rabbitmq_url
+        self._revocations = revocations
+        self._bootstrap = bootstrap
+        self._retry_interval = retry_interval
+        self._stop = threading.Event()
+        self._conn = None
+        self._ch = None
+        self._thread: threading.Thread | None = None
+
+    def catch_up(self) -> int:
+        if self._bootstrap is None:
+            return 0
+        items = self._bootstrap()
+        for item in items:
+            self._revocations.revoke(item["jti"], item["exp"])
+        return len(items)
+
+    def _on_message(self, ch, method, props, body: bytes) -> None:
+        from shared import events
+
+        try:
+            _, payload = events.decode_event(method.routing_key, props, body)
+            self._revocations.revoke(payload["jti"], payload["exp"])
+        except Exception:
+            logger.exception("Bad %s event", TOKEN_REVOKED)
+        self._revocations.maybe_prune()
+
+    def run(self) -> None:
+        # imported here so require_user (and its RevocationList) doesn't need pika
+        from shared import events
+
+        while not self._stop.is_set():
+            try:
+                conn = self._conn = events.connect(self._rabbitmq_url)
+                ch = self._ch = conn.channel()
+                ch.exchange_declare(exchange=events.EXCHANGE, exchange_type="topic", durable=True)
+                queue = ch.queue_declare(queue="", exclusive=True, auto_delete=True).method.queue
+                ch.queue_bind(queue=queue, exchange=events.EXCHANGE, routing_key=TOKEN_REVOKED)
+                try:
+                    self.catch_up()
+                except Exception as e:
+                    # stale until the next reconnect beats not hearing new revocations at all
+                    logger.warning("Revocation catch-up failed: %s", e)
+                ch.basic_consume(queue=queue, on_message_callback=self._on_message, auto_ack=True)
+                ch.start_consuming()
+            except Exception:
+                if not self._stop.is_set():
+                    logger.exception("Revocation listener disconnected; retrying in %.0fs", self._retry_interval)
+            finally:
+                conn, self._conn, self._ch = self._conn, None, None
+                if conn is not None and conn.is_open:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stop.wait(self._retry_interval)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="revocation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        conn, ch = self._conn, self._ch
+        if conn is not None and ch is not None:
+            try:
+                conn.add_callback_threadsafe(ch.stop_consuming)
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+revocations = RevocationList()
+_listener: RevocationListener | None = None
+
+
+def fetch_revocations(url: str = REVOCATIONS_URL, token: str = REVOCATIONS_TOKEN) -> List[Dict[str, Any]]:
+    req = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
+    with urllib.request.urlopen(req, timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def start_revocation_sync(rabbitmq_url: str, bootstrap: Callable[[], List[Dict[str, Any]]] | None = None) -> None:
+    """
+    Call from startup; no-op without a broker. bootstrap defaults to
+    fetching REVOCATIONS_URL (when set).
+    """
+    global _listener
+    if not rabbitmq_url or _listener is not None:
+        return
+    if bootstrap is None and REVOCATIONS_URL:
+        bootstrap = fetch_revocations
+    _listener = RevocationListener(rabbitmq_url, revocations, bootstrap)
+    _listener.start()
+
+
+def stop_revocation_sync() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
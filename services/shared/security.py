@@ -1,9 +1,117 @@
+import hashlib
+import json
 import os
+import threading
+import time
 from fastapi import Header, HTTPException
-from jose import jwt
 
-JWT_SECRET = os.environ["JWT_SECRET"]
+from shared import fastjwt, jwks
+from shared.revocation import revocations
+from shared.ttl_cache import TTLCache
+
+# HS256 shared secret (legacy / transition); empty = only JWKS-signed tokens are accepted
+JWT_SECRET = os.getenv("JWT_SECRET", "")
 ALGO = "HS256"
+# auth-service JWKS, e.g. http://auth-service:8000/.well-known/jwks.json
+JWKS_URL = os.getenv("JWKS_URL", "")
+
+# Verified-claims cache: max entries, and lifetime for tokens without "exp"
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_NO_EXP_TTL = int(os.getenv("TOKEN_CACHE_NO_EXP_TTL", "300"))
+
+
+class TokenCache(TTLCache):
+    """
+    Verified JWT claims keyed by sha256(token), so a token reused across
+    requests is only decoded/HMAC-checked once. Entries expire at the
+    token's exp (wall clock). Only successfully verified tokens are cached.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE, no_exp_ttl: int = TOKEN_CACHE_NO_EXP_TTL):
+        super().__init__(max_entries, no_exp_ttl)
+
+    @staticmethod
+    def _now() -> float:
+        return time.time()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def put(self, key: bytes, claims: dict) -> None:
+        exp = claims.get("exp")
+        self.store(key, claims, expires=float(exp) if isinstance(exp, (int, float)) else None)
+
+
+token_cache = TokenCache()
+
+_HS256_HEADER = fastjwt.HEADER_B64.decode("ascii")
+
+_keys: jwks.KeySet | None = None
+_keys_lock = threading.Lock()
+
+
+def verification_keys() -> jwks.KeySet:
+    """
+    Keys for EdDSA/RS256 tokens: whatever use_local_keys() installed, else a
+    JwksClient for JWKS_URL (refreshing in the background), else empty.
+    """
+    global _keys
+    if _keys is None:
+        with _keys_lock:
+            if _keys is None:
+                if JWKS_URL:
+                    client = jwks.JwksClient(JWKS_URL)
+                    client.start(initial_fetch=False)
+                    _keys = client
+                else:
+                    _keys = jwks.KeySet()
+    return _keys
+
+
+def start_key_refresh() -> None:
+    """Call from startup: load the JWKS before the first request arrives."""
+    global _keys
+    if not JWKS_URL:
+        return
+    with _keys_lock:
+        if _keys is None:
+            client = jwks.JwksClient(JWKS_URL)
+            client.start(initial_fetch=True)
+            _keys = client
+
+
+def use_local_keys(keys: jwks.KeySet) -> None:
+    """auth-service verifies its own tokens against its key ring directly."""
+    global _keys
+    with _keys_lock:
+        _keys = keys
+
+
+def token_algorithm(token: str) -> str | None:
+    """The header's "alg", or None when the header doesn't parse. Not verified."""
+    head = token.split(".", 1)[0]
+    if head == _HS256_HEADER:
+        return ALGO
+    try:
+        header = json.loads(fastjwt.b64url_decode(head.encode("ascii")))
+    except (ValueError, UnicodeEncodeError):
+        return None
+    return header.get("alg") if isinstance(header, dict) else None
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Verify an access token (no cache, no revocation check). HS256 goes to
+    fastjwt, anything else to the JWKS keys by kid; each verifier checks
+    the rest of the header. Raises fastjwt.InvalidToken.
+    """
+    if token_algorithm(token) == ALGO:
+        if not JWT_SECRET:
+            raise fastjwt.InvalidToken("HS256 tokens are not accepted")
+        return fastjwt.decode(token, JWT_SECRET, typ="access")
+    return jwks.verify(token, verification_keys(), typ="access")
+
 
 def require_user(authorization: str = Header(None)) -> dict:
     if not authorization or not authorization.startswith("Bearer "):
@@ -13,15 +121,24 @@ def require_user(authorization: str = Header(None)) -> dict:
     if not token:
         raise HTTPException(401, "Missing bearer token")
 
-    try:
-        claims = jwt.decode(token, JWT_SECRET, algorithms=[ALGO])
-        # Attach raw token so downstream services can forward it
-        claims["raw_token"] = token
-        return claims
-    except Exception:
-        raise HTTPException(401, "Invalid token")
+    key = TokenCache.key(token)
+    claims = token_cache.get(key)
+    if claims is None:
+        try:
+            claims = decode_access_token(token)
+        except fastjwt.InvalidToken:
+            raise HTTPException(401, "Invalid token")
+        token_cache.put(key, claims)
+
+    # checked on every request, cached or not: revocation must win immediately
+    if revocations.is_revoked(claims.get("jti")):
+        raise HTTPException(401, "Token revoked")
+
+    # copy: callers may mutate their claims dict
+    # Attach raw token so downstream services can forward it
+    return {**claims, "raw_token": token}
 
 def require_admin(claims: dict) -> dict:
     if not claims.get("is_admin"):
         raise HTTPException(403, "Admin only")
-    return claims
\ No newline at end of file
+    return claims
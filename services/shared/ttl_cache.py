@@ -0,0 +1,117 @@
+"""
+The in-process cache behind the token, dedup, profile and catalog caches:
+a bounded, thread-safe LRU whose entries expire, plus strong-ETag helpers
+for the HTTP caches built on it.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag: same bytes, same tag, on every replica."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def json_etag(value: Any) -> str:
+    return body_etag(json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class TTLCache:
+    """
+    Bounded LRU of key -> value; each entry expires ttl seconds after it is
+    stored, or at an explicit deadline. Every invalidation moves a
+    generation counter on: read generation() *before* loading a value and
+    pass it to store(), and a value loaded across an invalidation is not
+    cached. max_entries <= 0 disables caching.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._max = max_entries
+        self._ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _now() -> float:
+        return time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def generation(self) -> int:
+        return self._generation
+
+    def _lookup(self, key: Hashable, now: float) -> Any | None:
+        # caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable) -> Any | None:
+        now = self._now()
+        with self._lock:
+            value = self._lookup(key, now)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def store(self, key: Hashable, value: Any, generation: int | None = None, expires: float | None = None) -> bool:
+        """Cache value until expires (default: now + ttl). False when it wasn't cached."""
+        if expires is None:
+            if self._ttl <= 0:
+                return False
+            expires = self._now() + self._ttl
+        if self._max <= 0:
+            return False
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max:
+                self._entries.popitem(last=False)
+        return True
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def invalidate_all(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def clear(self) -> None:
+        """invalidate_all() and reset the hit/miss counters."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
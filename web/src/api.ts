@@ -47,9 +47,68 @@ function createApi(getBaseURL: () => string | undefined): AxiosInstance {
     return config;
   });
 
+  // Access tokens are short-lived: on 401, renew once with the refresh token and retry
+  api.interceptors.response.use(undefined, async (error) => {
+    const config = error?.config;
+    if (error?.response?.status !== 401 || !config || config._retried || config.url === "/auth/refresh") {
+      throw error;
+    }
+    const token = await refreshAccessToken();
+    if (!token) throw error;
+    config._retried = true;
+    return api(config);
+  });
+
   return api;
 }
 
+let refreshing: Promise<string | null> | null = null;
+
+/** One /auth/refresh at a time; concurrent 401s share its result. */
+function refreshAccessToken(): Promise<string | null> {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) return Promise.resolve(null);
+  if (!refreshing) {
+    refreshing = authApi
+      .post("/auth/refresh", { refresh_token: refreshToken })
+      .then((res) => {
+        storeTokens(res.data);
+        return res.data.access_token as string;
+      })
+      .catch(() => {
+        clearTokens();
+        return null;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+}
+
+export function storeTokens(data: { access_token: string; refresh_token?: string | null }) {
+  localStorage.setItem("token", data.access_token);
+  if (data.refresh_token) localStorage.setItem("refresh_token", data.refresh_token);
+}
+
+export function clearTokens() {
+  localStorage.removeItem("token");
+  localStorage.removeItem("refresh_token");
+}
+
+export type Page<T> = { items: T[]; nextCursor?: string };
+
+/** One page of a product listing; pass nextCursor back in for the page after it (absent on the last page). */
+export async function getPage<T>(
+  api: AxiosInstance,
+  url: string,
+  params: Record<string, string> = {},
+  cursor?: string
+): Promise<Page<T>> {
+  const res = await api.get<T[]>(url, { params: cursor ? { ...params, cursor } : params });
+  return { items: res.data, nextCursor: res.headers["x-next-cursor"] || undefined };
+}
+
 // Build-time fallbacks (dev)
 const AUTH_FALLBACK = import.meta.env.VITE_AUTH_URL as string | undefined;
 const PRODUCT_FALLBACK = import.meta.env.VITE_PRODUCT_URL as string | undefined;
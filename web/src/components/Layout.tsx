@@ -1,4 +1,5 @@
 import { Link, useNavigate } from "react-router-dom";
+import { authApi, clearTokens } from "../api";
 
 export default function Layout({ children }: { children: React.ReactNode }) {
   const nav = useNavigate();
@@ -33,7 +34,18 @@ export default function Layout({ children }: { children: React.ReactNode }) {
             ) : (
               <button
                 className="candy-btn-outline"
-                onClick={() => { localStorage.removeItem("token"); nav("/"); }}
+                onClick={() => {
+                  // end the server-side session too; ignore failures, we're leaving anyway
+                  const token = localStorage.getItem("token");
+                  const refresh_token = localStorage.getItem("refresh_token");
+                  if (token && refresh_token) {
+                    authApi
+                      .post("/auth/logout", { refresh_token }, { headers: { Authorization: `Bearer ${token}` } })
+                      .catch(() => {});
+                  }
+                  clearTokens();
+                  nav("/");
+                }}
               >
                 Logout
               </button>
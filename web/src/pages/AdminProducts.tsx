@@ -1,5 +1,5 @@
 import { useEffect, useMemo, useState } from "react";
-import { productApi } from "../api";
+import { getPage, productApi } from "../api";
 import toast from "react-hot-toast";
 import { TableSkeleton } from "../components/Loaders";
 
@@ -27,6 +27,8 @@ function resolveImageUrl(imageUrl: string | null | undefined) {
 export default function AdminProducts() {
   const [rows, setRows] = useState<Product[]>([]);
   const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | undefined>();
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const [name, setName] = useState("");
   const [description, setDescription] = useState("");
@@ -42,8 +44,9 @@ export default function AdminProducts() {
   const load = async () => {
     setLoading(true);
     try {
-      const r = await productApi.get("/admin/products");
-      setRows(r.data);
+      const page = await getPage<Product>(productApi, "/admin/products");
+      setRows(page.items);
+      setNextCursor(page.nextCursor);
     } catch (e: any) {
       toast.error(e?.response?.data?.detail || "Admin load failed (login as admin?)");
     } finally {
@@ -51,6 +54,20 @@ export default function AdminProducts() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await getPage<Product>(productApi, "/admin/products", {}, nextCursor);
+      setRows((prev) => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (e: any) {
+      toast.error(e?.response?.data?.detail || "Admin load failed (login as admin?)");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     load();
   }, []);
@@ -299,6 +316,14 @@ export default function AdminProducts() {
                 )}
               </tbody>
             </table>
+
+            {nextCursor && (
+              <div className="mt-4 flex justify-center">
+                <button className="candy-btn-outline" onClick={loadMore} disabled={loadingMore}>
+                  {loadingMore ? "Loading…" : "Load more"}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>
@@ -1,6 +1,6 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { Link } from "react-router-dom";
-import { productApi } from "../api";
+import { getPage, productApi } from "../api";
 import toast from "react-hot-toast";
 import { ProductGridSkeleton } from "../components/Loaders";
 
@@ -51,6 +51,11 @@ function writeCart(items: CartItem[]) {
 export default function Home() {
   const [products, setProducts] = useState<Product[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | undefined>();
+  const [loadingMore, setLoadingMore] = useState(false);
+  // bumped per query so a late page from an older query is dropped
+  const generation = useRef(0);
+  const [query, setQuery] = useState("");
   const [cartCount, setCartCount] = useState(0);
 
   const refreshCartCount = () => {
@@ -70,13 +75,47 @@ export default function Home() {
     return () => window.removeEventListener("storage", onStorage);
   }, []);
 
+  const listing = (q: string): [string, Record<string, string>] =>
+    q ? ["/products/search", { q }] : ["/products", {}];
+
+  // First page of the catalog when idle, of the ranked search while typing; more on demand
   useEffect(() => {
-    productApi
-      .get("/products")
-      .then((res) => setProducts(res.data))
-      .catch((e) => toast.error(e?.response?.data?.detail || "Failed to load products"))
-      .finally(() => setLoading(false));
-  }, []);
+    const q = query.trim();
+    const gen = ++generation.current;
+    setNextCursor(undefined);
+    const timer = setTimeout(
+      () => {
+        const [url, params] = listing(q);
+        getPage<Product>(productApi, url, params)
+          .then((page) => {
+            if (gen !== generation.current) return;
+            setProducts(page.items);
+            setNextCursor(page.nextCursor);
+          })
+          .catch((e) => toast.error(e?.response?.data?.detail || "Failed to load products"))
+          .finally(() => setLoading(false));
+      },
+      q ? 250 : 0
+    );
+    return () => clearTimeout(timer);
+  }, [query]);
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    const gen = generation.current;
+    const [url, params] = listing(query.trim());
+    setLoadingMore(true);
+    try {
+      const page = await getPage<Product>(productApi, url, params, nextCursor);
+      if (gen !== generation.current) return;
+      setProducts((rows) => [...rows, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch (e: any) {
+      toast.error(e?.response?.data?.detail || "Failed to load products");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   const addToCart = (p: Product) => {
     const cart = readCart();
@@ -124,6 +163,15 @@ export default function Home() {
         </div>
       </section>
 
+      <input
+        className="candy-input"
+        type="search"
+        placeholder="Search products…"
+        value={query}
+        maxLength={200}
+        onChange={(e) => setQuery(e.target.value)}
+      />
+
       {loading ? (
         <ProductGridSkeleton />
       ) : (
@@ -191,6 +239,14 @@ export default function Home() {
           })}
         </section>
       )}
+
+      {!loading && nextCursor && (
+        <div className="flex justify-center">
+          <button className="candy-btn-outline" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? "Loading…" : "Load more"}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
\ No newline at end of file
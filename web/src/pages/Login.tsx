@@ -1,5 +1,5 @@
 import { useState } from "react";
-import { authApi } from "../api";
+import { authApi, storeTokens } from "../api";
 import toast from "react-hot-toast";
 
 export default function Login() {
@@ -9,7 +9,7 @@ export default function Login() {
   const submit = async () => {
     try {
       const res = await authApi.post("/auth/login", { email, password });
-      localStorage.setItem("token", res.data.access_token);
+      storeTokens(res.data);
       toast.success("Logged in ✨");
       window.location.href = "/";
     } catch (e: any) {
@@ -1,7 +1,7 @@
 import { useEffect, useMemo, useState } from "react";
 import { useParams, useNavigate, Link } from "react-router-dom";
 import toast from "react-hot-toast";
-import { orderApi, paymentApi } from "../api";
+import { clearTokens, orderApi, paymentApi } from "../api";
 
 type Order = {
   id: number;
@@ -58,7 +58,7 @@ export default function Payment() {
 
   const handleAuthError = () => {
     toast.error("Session expired. Please login again.");
-    localStorage.removeItem("token");
+    clearTokens();
     nav("/login");
   };
 
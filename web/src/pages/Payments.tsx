@@ -1,7 +1,7 @@
 import { useEffect, useState } from "react";
 import toast from "react-hot-toast";
 import { Link, useNavigate } from "react-router-dom";
-import { paymentApi } from "../api";
+import { clearTokens, paymentApi } from "../api";
 
 type Payment = {
   id: number;
@@ -18,7 +18,7 @@ export default function Payments() {
 
   const handleAuthError = () => {
     toast.error("Session expired. Please login again.");
-    localStorage.removeItem("token");
+    clearTokens();
     nav("/login");
   };
 